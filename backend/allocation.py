@@ -0,0 +1,210 @@
+import time
+import logging
+
+import numpy as np
+
+from time_utils import date_to_day, day_to_date
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Statuses the batch allocator decides on (requests that are not approved yet)
+UNDECIDED_STATUSES = ('pending', 'waitlisted')
+
+# Longest date range one plan may cover
+MAX_ALLOCATION_DAYS = 180
+
+# Points a relocated request loses, so a request only moves for a real gain
+# in capacity fit (or because it would not be scheduled at all otherwise)
+RELOCATION_PENALTY = 5.0
+
+
+def merged_intervals(intervals):
+    """Sorted, disjoint (starts, ends) arrays covering the given (start, end) pairs"""
+    starts, ends = [], []
+    for start, end in sorted(intervals):
+        if starts and start <= ends[-1]:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+def overlaps_any(starts, ends, busy_starts, busy_ends):
+    """Boolean array: does [starts[i], ends[i]) overlap any of the disjoint sorted busy intervals?"""
+    if busy_starts.size == 0:
+        return np.zeros(starts.shape, dtype=bool)
+    # The last busy interval starting before `end` has the largest end of those that do
+    last = np.searchsorted(busy_starts, ends, side='left') - 1
+    return (last >= 0) & (busy_ends[np.maximum(last, 0)] > starts)
+
+
+def weighted_interval_schedule(starts, ends, weights):
+    """
+    Maximum-weight set of pairwise non-overlapping intervals (classic DP over
+    intervals sorted by end). Returns the chosen positions in the input arrays.
+    """
+    n = len(starts)
+    if n == 0:
+        return []
+    order = np.lexsort((starts, ends))
+    starts, ends, weights = starts[order], ends[order], weights[order]
+    # previous[j]: number of intervals ending at or before starts[j] (all compatible with j)
+    previous = np.searchsorted(ends, starts, side='right').tolist()
+    weights = weights.tolist()
+
+    best = [0.0] * (n + 1)
+    for j in range(n):
+        take = weights[j] + best[previous[j]]
+        best[j + 1] = take if take > best[j] else best[j]
+
+    chosen = []
+    j = n
+    while j > 0:
+        if weights[j - 1] + best[previous[j - 1]] > best[j - 1]:
+            chosen.append(int(order[j - 1]))
+            j = previous[j - 1]
+        else:
+            j -= 1
+    return chosen
+
+
+class BatchAllocator:
+    """
+    Plans approvals for all undecided (pending or waitlisted) requests in a
+    date range at once, maximizing the total priority score approved.
+
+    A request scheduled in another lab scores as if it had asked for that lab:
+    its capacity points are recomputed with the scorer's capacity curve and
+    RELOCATION_PENALTY is subtracted. Classes and every active reservation
+    that is not a request of the plan are fixed (the same rule
+    BookingEngine.apply_allocation checks); requests are only moved to
+    labs with room for all participants.
+
+    Days are independent. Within a day, labs are filled smallest first, each
+    with an exact weighted interval scheduling pass over the requests not yet
+    placed, so small groups settle in small labs and large labs stay free for
+    large groups. Without relocation every request can only use its own lab
+    and the plan is optimal; with it the lab-by-lab passes are a heuristic
+    (placing requests across labs exactly is NP-hard), but no leftover
+    request fits anywhere without displacing a planned one.
+
+    The plan is applied with BookingEngine.apply_allocation, which re-checks
+    it against the database in one transaction.
+    """
+
+    def __init__(self, interval_index, occupancy_grid, priority_scorer):
+        self.interval_index = interval_index
+        self.occupancy_grid = occupancy_grid
+        self.priority_scorer = priority_scorer
+
+    def plan(self, conn, first_day, last_day, relocate=True):
+        started = time.perf_counter()
+        placeholders = ', '.join('?' for _ in UNDECIDED_STATUSES)
+        rows = conn.execute(
+            f'''SELECT id, lab_number, date, start_time, end_time, start_min, end_min, day_num,
+                       num_participants, priority_score, status, user_email
+                FROM reservations
+                WHERE status IN ({placeholders}) AND day_num BETWEEN ? AND ?
+                  AND start_min IS NOT NULL AND end_min > start_min
+                ORDER BY day_num, id''',
+            UNDECIDED_STATUSES + (first_day, last_day)
+        ).fetchall()
+
+        labs = list(self.occupancy_grid.labs)
+        lab_rows = {lab['lab_number']: i for i, lab in enumerate(labs)}
+        capacities = np.array([lab['capacity'] for lab in labs], dtype=np.float64)
+        # Smallest labs first (stable, so equal capacities keep table order)
+        lab_order = np.argsort(capacities, kind='stable')
+
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(row['day_num'], []).append(row)
+
+        assignments, unassigned = [], []
+        for day, day_rows in by_day.items():
+            placed = self._plan_day(day_to_date(day), day_rows, labs, lab_rows, capacities, lab_order, relocate)
+            for row in day_rows:
+                if row['id'] in placed:
+                    lab, score = placed[row['id']]
+                    assignments.append({
+                        "reservation_id": row['id'],
+                        "lab_number": labs[lab]['lab_number'],
+                        "from_lab": row['lab_number'],
+                        "relocated": labs[lab]['lab_number'] != row['lab_number'],
+                        "date": row['date'],
+                        "start_time": row['start_time'],
+                        "end_time": row['end_time'],
+                        "num_participants": row['num_participants'],
+                        "priority_score": row['priority_score'],
+                        "planned_score": round(score, 2)
+                    })
+                else:
+                    unassigned.append(row['id'])
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Allocation plan: {len(rows)} requests, {len(assignments)} placed in {elapsed_ms:.0f} ms")
+        return {
+            "date_from": day_to_date(first_day),
+            "date_to": day_to_date(last_day),
+            "relocate": relocate,
+            "assignments": assignments,
+            "unassigned": unassigned,
+            "summary": {
+                "requests": len(rows),
+                "assigned": len(assignments),
+                "relocated": sum(1 for a in assignments if a['relocated']),
+                "unassigned": len(unassigned),
+                "total_priority": round(sum(a['planned_score'] for a in assignments), 2),
+                "solve_ms": round(elapsed_ms, 1)
+            }
+        }
+
+    def _plan_day(self, date, rows, labs, lab_rows, capacities, lab_order, relocate):
+        """{reservation id: (lab row, planned score)} for one day's requests"""
+        starts = np.array([row['start_min'] for row in rows], dtype=np.int64)
+        ends = np.array([row['end_min'] for row in rows], dtype=np.int64)
+        participants = np.array([row['num_participants'] for row in rows], dtype=np.float64)
+        scores = np.array([row['priority_score'] or 0 for row in rows], dtype=np.float64)
+        own = np.array([lab_rows.get(row['lab_number'], -1) for row in rows], dtype=np.int64)
+
+        # requests x labs: score with each lab's capacity points in place of the requested lab's
+        fit = self.priority_scorer.capacity_scores(participants[:, None], capacities[None, :])
+        own_fit = np.where(own >= 0, fit[np.arange(len(rows)), np.maximum(own, 0)], 0.0)
+        is_own = own[:, None] == np.arange(len(labs))[None, :]
+        weights = np.where(is_own, scores[:, None], scores[:, None] - own_fit[:, None] + fit - RELOCATION_PENALTY)
+
+        allowed = is_own.copy()
+        if relocate:
+            allowed |= participants[:, None] <= capacities[None, :]
+        allowed &= weights > 0
+
+        placed = {}
+        free = np.ones(len(rows), dtype=bool)
+        planned_ids = {row['id'] for row in rows}
+        for lab in lab_order:
+            candidates = allowed[:, lab] & free
+            if not candidates.any():
+                continue
+            busy_starts, busy_ends = merged_intervals(
+                (busy.start, busy.end)
+                for busy in self.interval_index.busy_intervals(labs[lab]['lab_number'], date)
+                if busy.kind == 'class' or busy.ref_id not in planned_ids
+            )
+            candidates &= ~overlaps_any(starts, ends, busy_starts, busy_ends)
+            positions = np.flatnonzero(candidates)
+            for chosen in weighted_interval_schedule(starts[positions], ends[positions], weights[positions, lab]):
+                i = positions[chosen]
+                placed[rows[i]['id']] = (int(lab), float(weights[i, lab]))
+                free[i] = False
+        return placed
+
+
+def parse_range(date_from, date_to):
+    """(first_day, last_day) of an allocation range; ValueError if invalid or too long"""
+    first_day = date_to_day(date_from)
+    last_day = date_to_day(date_to) if date_to else first_day
+    if not 1 <= last_day - first_day + 1 <= MAX_ALLOCATION_DAYS:
+        raise ValueError(f"Date range must cover 1 to {MAX_ALLOCATION_DAYS} days")
+    return first_day, last_day
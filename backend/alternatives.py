@@ -0,0 +1,126 @@
+import os
+import threading
+from collections import OrderedDict
+import logging
+
+from gap_finder import find_free_windows, MAX_HORIZON_DAYS
+from lab_ranking import LabRanker
+from time_utils import date_to_day, day_to_date
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Alternative time search: days scanned from the requested date, and the
+# window length used when the request has no valid time range
+SUGGESTION_HORIZON_DAYS = 7
+DEFAULT_DURATION_MINUTES = 120
+
+MAX_ALTERNATIVE_LABS = 5
+MAX_ALTERNATIVE_TIMES = 3
+
+ALTERNATIVES_CACHE_SIZE = int(os.environ.get('ALTERNATIVES_CACHE_SIZE', 1024))
+
+
+class AlternativesService:
+    """
+    Alternative labs (free at the requested time, big enough, best fit
+    first; see LabRanker) and, when there are none, the earliest free
+    windows of the requested lab.
+
+    Answers come straight from the in-memory schedule indexes as plain
+    dicts. They are memoized per (lab, date, window, participants, horizon)
+    (and equipment filter) in a bounded LRU and reused until a date they depend on changes (see
+    IntervalIndex.date_versions). Callers must not mutate the result.
+    """
+
+    def __init__(self, interval_index, occupancy_grid, priority_scorer, max_size=ALTERNATIVES_CACHE_SIZE):
+        self.interval_index = interval_index
+        self.occupancy_grid = occupancy_grid
+        self.lab_ranker = LabRanker(priority_scorer)
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def suggest(self, lab_number, date, window, num_participants, search_days=SUGGESTION_HORIZON_DAYS,
+                equipment_ids=()):
+        """
+        {"alternative_labs": [...], "alternative_times": [...]}; window is
+        (start, end) minutes or None. With equipment_ids, only labs having
+        all of them are suggested.
+        """
+        equipment_ids = tuple(sorted(set(equipment_ids)))
+        key = (lab_number, date, tuple(window) if window else None, num_participants, search_days, equipment_ids)
+        # Taken before computing, so a change made meanwhile invalidates the result
+        token = self.interval_index.date_versions(self._dates(date, search_days))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        result = self._compute(lab_number, date, window, num_participants, search_days, equipment_ids)
+        with self._lock:
+            self._entries[key] = (token, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+
+    def info(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+    def _compute(self, lab_number, date, window, num_participants, search_days, equipment_ids):
+        # Labs that can accommodate the participants, have the equipment and
+        # are free (no class or reservation) at the requested time, in one
+        # pass over the occupancy grid, ranked by fit with the request
+        ranked = []
+        if window:
+            selection = self.occupancy_grid.free_mask(date, *window, num_participants, equipment_ids)
+            ranked = self.lab_ranker.rank(selection, lab_number, num_participants, MAX_ALTERNATIVE_LABS,
+                                          equipment_ids)
+
+        alternatives = [{
+            "lab_number": lab['lab_number'],
+            "building": lab['building'],
+            "floor": lab['floor'],
+            "capacity": lab['capacity'],
+            "equipment": lab['equipment'],
+            "is_original": lab['lab_number'] == lab_number,
+            "fit_score": round(fit, 2),
+            "utilization_ratio": round(utilization, 3)
+        } for lab, fit, utilization in ranked]
+
+        # If no alternatives in same slot, suggest the earliest free windows of the
+        # same length for the requested lab (classes and reservations both count)
+        time_alternatives = []
+        if not alternatives:
+            duration = window[1] - window[0] if window else DEFAULT_DURATION_MINUTES
+            try:
+                time_alternatives = find_free_windows(
+                    self.interval_index, [lab_number], date, duration,
+                    k=MAX_ALTERNATIVE_TIMES, days=search_days,
+                    exclude=(lab_number, date) + tuple(window) if window else None
+                )
+            except (TypeError, ValueError):
+                time_alternatives = []
+
+        return {
+            "alternative_labs": alternatives,
+            "alternative_times": time_alternatives[:MAX_ALTERNATIVE_TIMES]
+        }
+
+    @staticmethod
+    def _dates(date, search_days):
+        """Dates a suggestion depends on: the requested date and the time-search horizon"""
+        try:
+            first_day = date_to_day(date)
+            days = max(1, min(int(search_days), MAX_HORIZON_DAYS))
+        except (TypeError, ValueError):
+            return (date,)
+        return tuple(day_to_date(day) for day in range(first_day, first_day + days))
@@ -1,10 +1,26 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import sqlite3
-import json
+import os
 from priority_scorer import PriorityScorer
 from email_service import EmailService
+from user_history import UserHistoryStore
+from db import ConnectionPool
+from migrations import migrate
+from outbox import OutboxWorker
+from interval_index import IntervalIndex
+from occupancy_grid import OccupancyGrid
+from alternatives import AlternativesService, SUGGESTION_HORIZON_DAYS
+from booking_engine import BookingEngine
+from waitlist import Waitlist
+from allocation import BatchAllocator, parse_range
+from equipment import EquipmentVocabulary, parse_equipment
+from availability import build_availability, MAX_AVAILABILITY_DAYS
+from listing import (reservation_filters, page_size, fetch_page, count_estimate,
+                     ADMIN_ORDER, USER_ORDER)
+from export import iter_rows, ndjson_chunks, csv_chunks, gzip_chunks, EXPORT_FORMATS
+from time_utils import time_to_minutes, session_window, date_to_day, day_minutes_to_datetime, SESSION_WINDOWS
 import logging
 
 app = Flask(__name__)
@@ -13,30 +29,159 @@ CORS(app)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize services
-priority_scorer = PriorityScorer()
-email_service = EmailService()
-
 DB_PATH = 'lab_occupancy.db'
 
+# Initialize services (the scorer's NLP model loads off the startup path,
+# see SCORER_MODEL_LOADING / SCORER_MODEL_DIR in priority_scorer.py)
+db_pool = ConnectionPool(DB_PATH)
+user_history = UserHistoryStore(DB_PATH, connect=db_pool.connect)
+priority_scorer = PriorityScorer(history_store=user_history)
+email_service = EmailService()
+# Notifications go through the email_outbox table; set EMAIL_OUTBOX_WORKER=off
+# when a standalone worker (python outbox.py) delivers them instead
+outbox_worker = OutboxWorker(db_pool.connect, email_service)
+interval_index = IntervalIndex()
+occupancy_grid = OccupancyGrid()
+equipment_vocabulary = EquipmentVocabulary()
+waitlist = Waitlist()
+alternatives_service = AlternativesService(interval_index, occupancy_grid, priority_scorer)
+booking_engine = BookingEngine(interval_index, occupancy_grid, waitlist, user_history, alternatives_service)
+batch_allocator = BatchAllocator(interval_index, occupancy_grid, priority_scorer)
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled per-thread connection (WAL, tuned pragmas); close() returns it to the pool
+    return db_pool.connect()
+
+def apply_migrations():
+    conn = get_db_connection()
+    try:
+        migrate(conn)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Schema migrations not applied (run init_db.py first?): {e}")
+    finally:
+        conn.close()
+
+apply_migrations()
+
+def load_schedule_indexes():
+    conn = get_db_connection()
+    try:
+        interval_index.load(conn)
+        occupancy_grid.load(conn)
+        equipment_vocabulary.load(conn)
+        waitlist.load(conn)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"Schedule indexes not loaded (run init_db.py first?): {e}")
+    finally:
+        conn.close()
+
+load_schedule_indexes()
+
+if os.environ.get('EMAIL_OUTBOX_WORKER', 'thread') != 'off':
+    outbox_worker.start()
+
+# Integer mirrors of date/start_time/end_time maintained by triggers (migration 3);
+# internal only, so they are kept out of API responses
+INTERNAL_COLUMNS = ('day_num', 'start_min', 'end_min')
+
+# Furthest ahead (in days) a reservation may be dated; also bounds the
+# schedule indexes, which keep counters for every booked day
+MAX_BOOKING_DAYS_AHEAD = int(os.environ.get('MAX_BOOKING_DAYS_AHEAD', 365))
+
+def public_row(row):
+    return {k: row[k] for k in row.keys() if k not in INTERNAL_COLUMNS}
+
+def requested_window(start_time, end_time, session=None):
+    """(start, end) minutes of a request, falling back to the session window; None if invalid"""
+    try:
+        start, end = time_to_minutes(start_time), time_to_minutes(end_time)
+    except (TypeError, ValueError):
+        return session_window(session)
+    return (start, end) if start < end else None
+
+def requested_equipment(value):
+    """Equipment ids for a filter given as a list or comma-separated names; ValueError if unknown"""
+    names = value if isinstance(value, list) else parse_equipment(value)
+    return equipment_vocabulary.ids(names)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "message": "Backend is running"}), 200
+    return jsonify({
+        "status": "healthy",
+        "message": "Backend is running",
+        "model_ready": priority_scorer.model_ready,
+        "model_status": priority_scorer.model_status,
+        "embedding_cache": priority_scorer.embedding_cache.info(),
+        "embedding_batcher": priority_scorer.embedding_batcher.info(),
+        "email_outbox": outbox_worker.stats(),
+        "smtp_pool": email_service.smtp_pool.info(),
+        "db_pool": db_pool.info(),
+        "alternatives_cache": alternatives_service.info(),
+        "waitlist": waitlist.info()
+    }), 200
 
 @app.route('/api/labs', methods=['GET'])
 def get_labs():
-    """Get all available labs"""
+    """
+    Get all available labs.
+    Query: equipment (comma list; labs having all of it), capacity (minimum)
+    """
+    if 'equipment' in request.args or 'capacity' in request.args:
+        try:
+            equipment_ids = requested_equipment(request.args.get('equipment', ''))
+            min_capacity = int(request.args.get('capacity', 0))
+        except ValueError as e:
+            return jsonify({"error": f"Invalid equipment or capacity: {e}"}), 400
+        return jsonify(occupancy_grid.matching_labs(min_capacity, equipment_ids)), 200
+    
     conn = get_db_connection()
     labs = conn.execute('SELECT * FROM labs WHERE status = "active"').fetchall()
     conn.close()
     
     return jsonify([dict(lab) for lab in labs]), 200
 
+@app.route('/api/equipment', methods=['GET'])
+def get_equipment():
+    """Equipment vocabulary usable in the equipment filters, with the number of labs having each item"""
+    return jsonify(equipment_vocabulary.items()), 200
+
+@app.route('/api/availability', methods=['GET'])
+def get_availability():
+    """
+    Availability of many labs over a date range in one call.
+    Query: start_date, end_date (default: 7 days from start), labs (comma list),
+    capacity (minimum), equipment (comma list; labs having all of it),
+    sessions (comma list of morning/afternoon/evening)
+    """
+    try:
+        first_day = date_to_day(request.args.get('start_date') or datetime.now().date())
+        end_date = request.args.get('end_date')
+        last_day = date_to_day(end_date) if end_date else first_day + 6
+        min_capacity = int(request.args.get('capacity', 0))
+    except ValueError:
+        return jsonify({"error": "Invalid start_date, end_date or capacity"}), 400
+    try:
+        equipment_ids = requested_equipment(request.args.get('equipment', ''))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    num_days = last_day - first_day + 1
+    if not 1 <= num_days <= MAX_AVAILABILITY_DAYS:
+        return jsonify({"error": f"Date range must cover 1 to {MAX_AVAILABILITY_DAYS} days"}), 400
+    
+    sessions = [s for s in request.args.get('sessions', '').split(',') if s] or list(SESSION_WINDOWS)
+    unknown = [s for s in sessions if s not in SESSION_WINDOWS]
+    if unknown:
+        return jsonify({"error": f"Unknown sessions: {', '.join(unknown)}"}), 400
+    
+    lab_filter = {l for l in request.args.get('labs', '').split(',') if l}
+    labs = [
+        lab for lab in occupancy_grid.matching_labs(min_capacity, equipment_ids)
+        if not lab_filter or lab['lab_number'] in lab_filter
+    ]
+    
+    return jsonify(build_availability(interval_index, labs, first_day, num_days, sessions)), 200
+
 @app.route('/api/check-availability', methods=['POST'])
 def check_availability():
     """Check if a lab is available for a specific date and time"""
@@ -47,27 +192,16 @@ def check_availability():
     start_time = data.get('start_time')
     end_time = data.get('end_time')
     
-    conn = get_db_connection()
+    window = requested_window(start_time, end_time, session)
+    if window is None:
+        return jsonify({"error": "Invalid start_time/end_time"}), 400
     
-    # Check timetable (regular classes)
-    timetable_query = '''
-        SELECT * FROM timetables 
-        WHERE room_number = ? AND date = ? AND session = ?
-    '''
-    timetable_conflict = conn.execute(timetable_query, (lab_number, date, session)).fetchone()
-    
-    # Check reservations
-    reservation_query = '''
-        SELECT * FROM reservations 
-        WHERE lab_number = ? AND date = ? AND status IN ('approved', 'pending')
-        AND ((start_time <= ? AND end_time > ?) OR (start_time < ? AND end_time >= ?))
-    '''
-    reservation_conflict = conn.execute(
-        reservation_query, 
-        (lab_number, date, start_time, start_time, end_time, end_time)
-    ).fetchone()
+    # Check timetable (regular classes), then reservations
+    timetable_conflicts = interval_index.overlaps(lab_number, date, *window, kind='class')
+    timetable_conflict = timetable_conflicts[0].details if timetable_conflicts else None
     
-    conn.close()
+    reservation_conflicts = interval_index.overlaps(lab_number, date, *window, kind='reservation')
+    reservation_conflict = reservation_conflicts[0].details if reservation_conflicts else None
     
     if timetable_conflict:
         return jsonify({
@@ -100,82 +234,22 @@ def check_availability():
 
 @app.route('/api/suggest-alternatives', methods=['POST'])
 def suggest_alternatives():
-    """Suggest alternative labs or time slots"""
+    """Suggest alternative labs (optionally only those with all of `equipment`) or time slots"""
     data = request.json
-    requested_lab = data.get('lab_number')
-    date = data.get('date')
-    start_time = data.get('start_time')
-    end_time = data.get('end_time')
-    num_participants = int(data.get('num_participants', 30))
-    
-    conn = get_db_connection()
-    
-    # Get all labs that can accommodate the number of participants
-    labs = conn.execute(
-        'SELECT * FROM labs WHERE capacity >= ? AND status = "active"',
-        (num_participants,)
-    ).fetchall()
-    
-    alternatives = []
-    
-    for lab in labs:
-        # Check if this lab is available at the requested time
-        timetable_conflict = conn.execute(
-            'SELECT * FROM timetables WHERE room_number = ? AND date = ?',
-            (lab['lab_number'], date)
-        ).fetchone()
-        
-        reservation_conflict = conn.execute(
-            '''SELECT * FROM reservations 
-               WHERE lab_number = ? AND date = ? AND status IN ('approved', 'pending')
-               AND ((start_time <= ? AND end_time > ?) OR (start_time < ? AND end_time >= ?))''',
-            (lab['lab_number'], date, start_time, start_time, end_time, end_time)
-        ).fetchone()
-        
-        if not timetable_conflict and not reservation_conflict:
-            alternatives.append({
-                "lab_number": lab['lab_number'],
-                "building": lab['building'],
-                "floor": lab['floor'],
-                "capacity": lab['capacity'],
-                "equipment": lab['equipment'],
-                "is_original": lab['lab_number'] == requested_lab
-            })
-    
-    # If no alternatives in same slot, suggest different time slots for requested lab
-    time_alternatives = []
-    if len(alternatives) == 0:
-        time_slots = [
-            ("09:00", "11:00", "morning"),
-            ("11:00", "13:00", "morning"),
-            ("14:00", "16:00", "afternoon"),
-            ("16:00", "18:00", "afternoon")
-        ]
-        
-        for slot_start, slot_end, session in time_slots:
-            if slot_start == start_time and slot_end == end_time:
-                continue
-            
-            conflict = conn.execute(
-                '''SELECT * FROM reservations 
-                   WHERE lab_number = ? AND date = ? AND status IN ('approved', 'pending')
-                   AND ((start_time <= ? AND end_time > ?) OR (start_time < ? AND end_time >= ?))''',
-                (requested_lab, date, slot_start, slot_start, slot_end, slot_end)
-            ).fetchone()
-            
-            if not conflict:
-                time_alternatives.append({
-                    "start_time": slot_start,
-                    "end_time": slot_end,
-                    "session": session
-                })
-    
-    conn.close()
-    
-    return jsonify({
-        "alternative_labs": alternatives[:5],  # Top 5 alternatives
-        "alternative_times": time_alternatives[:3]  # Top 3 time slots
-    }), 200
+    window = requested_window(data.get('start_time'), data.get('end_time'), data.get('session'))
+    try:
+        search_days = int(data.get('search_days', SUGGESTION_HORIZON_DAYS))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid search_days"}), 400
+    try:
+        equipment_ids = requested_equipment(data.get('equipment') or '')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(alternatives_service.suggest(
+        data.get('lab_number'), data.get('date'), window,
+        int(data.get('num_participants', 30)), search_days, equipment_ids
+    )), 200
 
 @app.route('/api/reserve-lab', methods=['POST'])
 def reserve_lab():
@@ -189,6 +263,16 @@ def reserve_lab():
         if field not in data:
             return jsonify({"error": f"Missing required field: {field}"}), 400
     
+    window = requested_window(data['start_time'], data['end_time'])
+    if window is None:
+        return jsonify({"error": "Invalid start_time/end_time"}), 400
+    try:
+        day = date_to_day(data['date'])
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid date"}), 400
+    if day - date_to_day(datetime.now().date()) > MAX_BOOKING_DAYS_AHEAD:
+        return jsonify({"error": f"Reservations can be made at most {MAX_BOOKING_DAYS_AHEAD} days ahead"}), 400
+    
     # Get lab capacity
     conn = get_db_connection()
     lab = conn.execute('SELECT capacity FROM labs WHERE lab_number = ?', (data['lab_number'],)).fetchone()
@@ -220,14 +304,10 @@ def reserve_lab():
         # Generate explanation
         explanation = priority_scorer.explain(scoring_result)
         
-        # Get alternative suggestions
-        alternatives = []
-        try:
-            # Suggest alternative labs or times
-            alt_response = suggest_alternatives()
-            alternatives = json.loads(alt_response[0].data) if alt_response else {}
-        except:
-            alternatives = {"alternative_labs": [], "alternative_times": []}
+        # Suggest alternative labs or times
+        alternatives = alternatives_service.suggest(
+            data['lab_number'], data['date'], window, int(data['num_participants'])
+        )
         
         conn.close()
         
@@ -252,82 +332,17 @@ def reserve_lab():
     
     priority_score = scoring_result['score']
     
-    # Check if slot is available
-    conflict = conn.execute(
-        '''SELECT * FROM reservations 
-           WHERE lab_number = ? AND date = ? AND status IN ('approved', 'pending')
-           AND ((start_time <= ? AND end_time > ?) OR (start_time < ? AND end_time >= ?))''',
-        (data['lab_number'], data['date'], data['start_time'], 
-         data['start_time'], data['end_time'], data['end_time'])
-    ).fetchone()
-    
-    # Auto-approve if score >= 65 and no conflict
-    status = 'pending'
-    if priority_score >= 65 and not conflict:
-        status = 'approved'
-    elif conflict:
-        # Check if current request has higher priority
-        conflicting_score = conflict['priority_score']
-        if priority_score > conflicting_score + 15:  # Significantly higher priority
-            # Update conflicting reservation to rejected
-            conn.execute(
-                'UPDATE reservations SET status = "rejected" WHERE id = ?',
-                (conflict['id'],)
-            )
-            conn.commit()
-            status = 'approved'
-            
-            # Send rejection email to conflicting user
-            email_service.send_rejection_email(
-                conflict['user_email'],
-                conflict['lab_number'],
-                conflict['date'],
-                conflict['start_time'],
-                conflict['end_time'],
-                "Higher priority request received"
-            )
-    
-    # Insert reservation
-    cursor = conn.execute(
-        '''INSERT INTO reservations 
-           (lab_number, date, start_time, end_time, num_participants, purpose, 
-            description, user_email, user_name, priority_score, status, created_at)
-           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-        (data['lab_number'], data['date'], data['start_time'], data['end_time'],
-         int(data['num_participants']), data['purpose'], data['description'],
-         data['user_email'], data['user_name'], priority_score, status,
-         datetime.now().isoformat())
-    )
-    
-    reservation_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    # Send confirmation email
-    if status == 'approved':
-        email_service.send_approval_email(
-            data['user_email'],
-            data['lab_number'],
-            data['date'],
-            data['start_time'],
-            data['end_time'],
-            reservation_id
-        )
-    else:
-        # Suggest alternatives
-        alternatives_response = suggest_alternatives()
-        alternatives = json.loads(alternatives_response[0].data)
-        
-        email_service.send_pending_email(
-            data['user_email'],
-            data['lab_number'],
-            data['date'],
-            data['start_time'],
-            data['end_time'],
-            alternatives
-        )
+    # Conflict check, preemption, insert and notifications in one transaction
+    try:
+        booking = booking_engine.book(conn, data, window, priority_score, lab_capacity)
+    except ValueError as e:
+        return jsonify({"error": f"Slot not available: {e}"}), 409
+    finally:
+        conn.close()
+    reservation_id, status = booking.reservation_id, booking.status
+    outbox_worker.wake()
     
-    return jsonify({
+    response = {
         "success": True,
         "reservation_id": reservation_id,
         "status": status,
@@ -335,19 +350,15 @@ def reserve_lab():
         "breakdown": scoring_result['breakdown'],
         "flags": scoring_result['flags'],
         "message": f"Reservation {status}. Score: {priority_score}/100"
-    }), 201
+    }
+    if booking.waitlist_position is not None:
+        response["waitlist_position"] = booking.waitlist_position
+    return jsonify(response), 201
 
 @app.route('/api/reservations/<user_email>', methods=['GET'])
 def get_user_reservations(user_email):
-    """Get all reservations for a user"""
-    conn = get_db_connection()
-    reservations = conn.execute(
-        'SELECT * FROM reservations WHERE user_email = ? ORDER BY created_at DESC',
-        (user_email,)
-    ).fetchall()
-    conn.close()
-    
-    return jsonify([dict(r) for r in reservations]), 200
+    """Get a user's reservations, newest first (see list_reservations for paging/filters)"""
+    return list_reservations(['user_email = ?'], [user_email], USER_ORDER, descending=True)
 
 @app.route('/api/reservations/<int:reservation_id>', methods=['PUT'])
 def update_reservation(reservation_id):
@@ -365,7 +376,7 @@ def update_reservation(reservation_id):
         return jsonify({"error": "Reservation not found"}), 404
     
     # Check if modification is allowed (e.g., at least 24 hours before)
-    reservation_datetime = datetime.fromisoformat(f"{reservation['date']} {reservation['start_time']}")
+    reservation_datetime = day_minutes_to_datetime(reservation['day_num'], reservation['start_min'])
     now = datetime.now()
     
     if reservation_datetime - now < timedelta(hours=24):
@@ -378,26 +389,37 @@ def update_reservation(reservation_id):
     allowed_fields = ['start_time', 'end_time', 'num_participants', 'description']
     updates = {k: v for k, v in data.items() if k in allowed_fields}
     
-    if updates:
-        set_clause = ', '.join([f"{k} = ?" for k in updates.keys()])
-        values = list(updates.values()) + [reservation_id]
-        
-        conn.execute(
-            f'UPDATE reservations SET {set_clause}, status = "pending" WHERE id = ?',
-            values
-        )
-        conn.commit()
-        
-        # Send modification email
-        email_service.send_modification_email(
-            reservation['user_email'],
-            reservation['lab_number'],
-            updates
-        )
+    if not updates:
+        conn.close()
+        return jsonify({"success": True, "message": "Reservation updated"}), 200
     
-    conn.close()
+    if requested_window(updates.get('start_time', reservation['start_time']),
+                        updates.get('end_time', reservation['end_time'])) is None:
+        conn.close()
+        return jsonify({"error": "Invalid start_time/end_time"}), 400
+    if 'num_participants' in updates:
+        if not str(updates['num_participants']).isdigit() or int(updates['num_participants']) <= 0:
+            conn.close()
+            return jsonify({"error": "Invalid num_participants"}), 400
+        updates['num_participants'] = int(updates['num_participants'])
+    
+    # Conflict check, status change, promotion and email in one transaction
+    try:
+        booking = booking_engine.update(conn, reservation_id, updates,
+                                        reservation['lab_number'], reservation['date'])
+    except ValueError as e:
+        return jsonify({"error": f"Cannot modify reservation: {e}"}), 409
+    finally:
+        conn.close()
+    if booking is None:
+        return jsonify({"error": "Reservation not found"}), 404
+    outbox_worker.wake()
     
-    return jsonify({"success": True, "message": "Reservation updated"}), 200
+    response = {"success": True, "message": "Reservation updated", "status": booking.status,
+                "promoted": booking.promoted}
+    if booking.waitlist_position is not None:
+        response["waitlist_position"] = booking.waitlist_position
+    return jsonify(response), 200
 
 @app.route('/api/reservations/<int:reservation_id>', methods=['DELETE'])
 def cancel_reservation(reservation_id):
@@ -412,45 +434,99 @@ def cancel_reservation(reservation_id):
         conn.close()
         return jsonify({"error": "Reservation not found"}), 404
     
-    # Update status to cancelled
-    conn.execute(
-        'UPDATE reservations SET status = "cancelled" WHERE id = ?',
-        (reservation_id,)
-    )
-    conn.commit()
+    # Cancel, queue the email and promote waitlisted requests into the freed time
+    promoted = booking_engine.cancel(conn, reservation_id, reservation['lab_number'], reservation['date'])
     conn.close()
+    outbox_worker.wake()
     
-    # Send cancellation email
-    email_service.send_cancellation_email(
-        reservation['user_email'],
-        reservation['lab_number'],
-        reservation['date'],
-        reservation['start_time'],
-        reservation['end_time']
-    )
-    
-    return jsonify({"success": True, "message": "Reservation cancelled"}), 200
+    return jsonify({"success": True, "message": "Reservation cancelled", "promoted": promoted or []}), 200
 
 @app.route('/api/admin/reservations', methods=['GET'])
 def get_all_reservations():
-    """Get all reservations (admin view)"""
-    status_filter = request.args.get('status')
+    """Get all reservations by date (admin view; see list_reservations for paging/filters)"""
+    return list_reservations([], [], ADMIN_ORDER)
+
+def list_reservations(clauses, params, order, descending=False):
+    """
+    Shared reservation listing.
+    Filters: lab_number, status, purpose, date_from, date_to.
+    Without `limit`/`cursor` the full array is returned as before; with them
+    the response is a keyset page: {items, next_cursor, total_estimate, total_is_exact}
+    """
+    try:
+        filter_clauses, filter_params = reservation_filters(request.args)
+        limit = page_size(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid date_from, date_to or limit"}), 400
+    clauses, params = clauses + filter_clauses, params + filter_params
+    cursor = request.args.get('cursor')
     
     conn = get_db_connection()
     
-    if status_filter:
-        reservations = conn.execute(
-            'SELECT * FROM reservations WHERE status = ? ORDER BY date, start_time',
-            (status_filter,)
-        ).fetchall()
-    else:
-        reservations = conn.execute(
-            'SELECT * FROM reservations ORDER BY date, start_time'
-        ).fetchall()
+    if 'limit' not in request.args and not cursor:
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        direction = ' DESC' if descending else ''
+        order_by = ', '.join(column + direction for column in order)
+        reservations = conn.execute(f'SELECT * FROM reservations {where} ORDER BY {order_by}', params).fetchall()
+        conn.close()
+        return jsonify([public_row(r) for r in reservations]), 200
     
+    try:
+        reservations, next_cursor = fetch_page(conn, clauses, params, order, limit, cursor, descending)
+    except ValueError as e:
+        conn.close()
+        return jsonify({"error": str(e)}), 400
+    total, exact = count_estimate(conn, clauses, params)
     conn.close()
     
-    return jsonify([dict(r) for r in reservations]), 200
+    return jsonify({
+        "items": [public_row(r) for r in reservations],
+        "next_cursor": next_cursor,
+        "total_estimate": total,
+        "total_is_exact": exact
+    }), 200
+
+@app.route('/api/admin/reservations/export', methods=['GET'])
+def export_reservations():
+    """
+    Stream reservations in id order as NDJSON (default) or CSV.
+    Query: format=ndjson|csv, gzip=1, after_id (resume after the last id
+    received), plus the listing filters (lab_number, status, purpose, date_from, date_to)
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {export_format}"}), 400
+    try:
+        clauses, params = reservation_filters(request.args)
+        after_id = int(request.args.get('after_id', 0))
+    except ValueError:
+        return jsonify({"error": "Invalid date_from, date_to or after_id"}), 400
+    
+    conn = get_db_connection()
+    columns = [
+        row['name'] for row in conn.execute('PRAGMA table_info(reservations)')
+        if row['name'] not in INTERNAL_COLUMNS
+    ]
+    
+    def generate():
+        try:
+            rows = iter_rows(conn, clauses, params, columns, after_id)
+            chunks = ndjson_chunks(rows, columns) if export_format == 'ndjson' else csv_chunks(rows, columns)
+            if request_gzip:
+                yield from gzip_chunks(chunks)
+            else:
+                for chunk in chunks:
+                    yield chunk.encode('utf-8')
+        finally:
+            conn.close()
+    
+    request_gzip = request.args.get('gzip') in ('1', 'true')
+    headers = {
+        "Content-Disposition": f"attachment; filename=reservations.{export_format}{'.gz' if request_gzip else ''}"
+    }
+    if request_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(generate(), mimetype=EXPORT_FORMATS[export_format], headers=headers)
 
 @app.route('/api/admin/approve-reservation/<int:reservation_id>', methods=['POST'])
 def approve_reservation(reservation_id):
@@ -466,24 +542,68 @@ def approve_reservation(reservation_id):
         conn.close()
         return jsonify({"error": "Reservation not found"}), 404
     
-    conn.execute(
-        'UPDATE reservations SET status = "approved" WHERE id = ?',
-        (reservation_id,)
-    )
-    conn.commit()
+    # Same lab-day lock and conflict check as a new booking
+    try:
+        approved = booking_engine.approve(conn, reservation_id, reservation['lab_number'], reservation['date'])
+    except ValueError as e:
+        return jsonify({"error": f"Cannot approve reservation: {e}"}), 409
+    finally:
+        conn.close()
+    if not approved:
+        return jsonify({"error": "Reservation not found"}), 404
+    outbox_worker.wake()
+    
+    return jsonify({"success": True, "message": "Reservation approved"}), 200
+
+@app.route('/api/admin/allocation/plan', methods=['GET'])
+def plan_allocation():
+    """
+    Plan approvals for every pending or waitlisted request in a date range,
+    maximizing total priority score (see allocation.py). Nothing is changed.
+    Query: date_from, date_to (default: date_from), relocate (default 1:
+    requests may be moved to a better-fitting lab)
+    """
+    try:
+        first_day, last_day = parse_range(request.args.get('date_from') or datetime.now().date(),
+                                          request.args.get('date_to'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date_from or date_to: {e}"}), 400
+    relocate = request.args.get('relocate', '1') not in ('0', 'false')
+    
+    conn = get_db_connection()
+    plan = batch_allocator.plan(conn, first_day, last_day, relocate)
     conn.close()
     
-    # Send approval email
-    email_service.send_approval_email(
-        reservation['user_email'],
-        reservation['lab_number'],
-        reservation['date'],
-        reservation['start_time'],
-        reservation['end_time'],
-        reservation_id
-    )
+    return jsonify(plan), 200
+
+@app.route('/api/admin/allocation/apply', methods=['POST'])
+def apply_allocation():
+    """
+    Apply a plan from /api/admin/allocation/plan in one transaction:
+    assignments are approved (in their planned lab) and unassigned pending
+    requests are waitlisted. Returns 409, changing nothing, if the schedule
+    changed so that the plan no longer fits.
+    """
+    data = request.json or {}
+    try:
+        assignments = [(int(a['reservation_id']), str(a['lab_number'])) for a in data.get('assignments', [])]
+        unassigned = [int(reservation_id) for reservation_id in data.get('unassigned', [])]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({"error": "Invalid plan"}), 400
+    ids = [reservation_id for reservation_id, _ in assignments] + unassigned
+    if len(set(ids)) != len(ids):
+        return jsonify({"error": "A reservation appears more than once in the plan"}), 400
     
-    return jsonify({"success": True, "message": "Reservation approved"}), 200
+    conn = get_db_connection()
+    try:
+        approved, waitlisted = booking_engine.apply_allocation(conn, assignments, unassigned)
+    except ValueError as e:
+        return jsonify({"error": f"Plan no longer applies: {e}"}), 409
+    finally:
+        conn.close()
+    outbox_worker.wake()
+    
+    return jsonify({"success": True, "approved": approved, "waitlisted": waitlisted}), 200
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
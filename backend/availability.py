@@ -0,0 +1,85 @@
+from time_utils import day_to_date, session_window
+
+# Longest date range one availability request may cover
+MAX_AVAILABILITY_DAYS = 92
+
+
+def run_length_encode(values):
+    """[a, a, b, a] -> [[a, 2], [b, 1], [a, 1]]"""
+    runs = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def occupant_summary(busy):
+    """Short description of what occupies a slot (no per-row ids, so repeats can be shared)"""
+    details = busy.details
+    if busy.kind == 'class':
+        return {
+            "type": "class",
+            "class": details['class'],
+            "section": details['section'],
+            "subject": details['subject'],
+            "faculty_name": details['faculty_name']
+        }
+    return {
+        "type": "reservation",
+        "purpose": details['purpose'],
+        "status": details['status'],
+        "reserved_by": details['user_email']
+    }
+
+
+def build_availability(interval_index, labs, first_day, num_days, sessions):
+    """
+    Availability matrix for labs x days x sessions.
+
+    Every cell is either None (free) or an index into the returned
+    `occupants` list, where identical occupant summaries are stored once.
+    Each lab's cells are run-length encoded per session over the days, so
+    a lab that is free all month costs one run per session:
+
+        {"occupants": [[{...}], ...],
+         "labs": [{"lab_number": ..., "sessions": {"morning": [[None, 30]], ...}}]}
+    """
+    windows = {session: session_window(session) for session in sessions}
+    dates = [day_to_date(day) for day in range(first_day, first_day + num_days)]
+
+    occupants = []
+    occupant_ids = {}
+    lab_rows = []
+
+    for lab in labs:
+        cells = {session: [] for session in sessions}
+        for date in dates:
+            for session, (start, end) in windows.items():
+                busy = interval_index.overlaps(lab['lab_number'], date, start, end)
+                if not busy:
+                    cells[session].append(None)
+                    continue
+                summary = [occupant_summary(b) for b in busy]
+                key = repr(summary)
+                if key not in occupant_ids:
+                    occupant_ids[key] = len(occupants)
+                    occupants.append(summary)
+                cells[session].append(occupant_ids[key])
+
+        lab_rows.append({
+            "lab_number": lab['lab_number'],
+            "building": lab['building'],
+            "capacity": lab['capacity'],
+            "sessions": {session: run_length_encode(values) for session, values in cells.items()}
+        })
+
+    return {
+        "start_date": dates[0] if dates else None,
+        "end_date": dates[-1] if dates else None,
+        "days": num_days,
+        "sessions": list(sessions),
+        "occupants": occupants,
+        "labs": lab_rows
+    }
@@ -0,0 +1,134 @@
+"""
+Benchmark the batch allocator against deciding requests one at a time.
+
+Copies lab_occupancy.db to a temporary file, adds random pending requests
+over a date range (default 3000 over 20 days) and compares the total
+priority score approved by:
+  - arrival order: approve each request if its lab is still free (what
+    approving the pending list top to bottom amounts to)
+  - the allocator without relocation (optimal per lab)
+  - the allocator with relocation to better-fitting labs
+The relocating plan is then applied and the database checked for overlaps.
+
+Usage:
+    python bench_allocation.py [requests] [days]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Only the capacity curve is needed; don't load the NLP model
+os.environ.setdefault('SCORER_MODEL_LOADING', 'disabled')
+
+from alternatives import AlternativesService
+from allocation import BatchAllocator
+from booking_engine import BookingEngine
+from db import ConnectionPool
+from interval_index import IntervalIndex
+from migrations import migrate
+from occupancy_grid import OccupancyGrid
+from priority_scorer import PriorityScorer
+from stress_booking import double_bookings
+from time_utils import date_to_day, day_to_date, minutes_to_time
+from user_history import UserHistoryStore
+from waitlist import Waitlist
+
+SOURCE_DB = 'lab_occupancy.db'
+FIRST_DATE = '2025-10-27'
+
+
+def add_requests(conn, count, days, seed=11):
+    rng = random.Random(seed)
+    labs = [row[0] for row in conn.execute('SELECT lab_number FROM labs WHERE status = "active"')]
+    first_day = date_to_day(FIRST_DATE)
+    rows = []
+    for i in range(count):
+        start = rng.randrange(8 * 60, 18 * 60, 30)
+        end = start + rng.choice((60, 90, 120, 180))
+        rows.append((rng.choice(labs), day_to_date(first_day + rng.randrange(days)),
+                     minutes_to_time(start), minutes_to_time(end), rng.randrange(10, 96),
+                     'workshop', 'bench', f"user{i % 200}@example.com", 'Bench',
+                     round(rng.uniform(40, 95), 2), 'pending'))
+    conn.executemany(
+        '''INSERT INTO reservations (lab_number, date, start_time, end_time, num_participants, purpose,
+           description, user_email, user_name, priority_score, status, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))''', rows)
+    conn.commit()
+
+
+def arrival_order_total(conn, interval_index, first_day, last_day):
+    """Approve pending requests in id order whenever their own lab is still free"""
+    taken = {}
+    total = approved = 0
+    for row in conn.execute(
+        '''SELECT * FROM reservations WHERE status = 'pending' AND day_num BETWEEN ? AND ? ORDER BY id''',
+        (first_day, last_day)
+    ):
+        key = (row['lab_number'], row['date'])
+        if key not in taken:
+            taken[key] = [(busy.start, busy.end) for busy in interval_index.busy_intervals(*key)
+                          if busy.kind == 'class' or busy.details['status'] == 'approved']
+        start, end = row['start_min'], row['end_min']
+        if all(end <= s or e <= start for s, e in taken[key]):
+            taken[key].append((start, end))
+            total += row['priority_score']
+            approved += 1
+    return approved, total
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if not os.path.exists(SOURCE_DB):
+        sys.exit(f"{SOURCE_DB} not found; run init_db.py first")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'allocation.db')
+        shutil.copy(SOURCE_DB, path)
+        pool = ConnectionPool(path)
+        conn = pool.connect()
+        migrate(conn)
+        add_requests(conn, count, days)
+
+        interval_index, occupancy_grid, waitlist = IntervalIndex(), OccupancyGrid(), Waitlist()
+        interval_index.load(conn)
+        occupancy_grid.load(conn)
+        waitlist.load(conn)
+        priority_scorer = PriorityScorer()
+        allocator = BatchAllocator(interval_index, occupancy_grid, priority_scorer)
+        first_day = date_to_day(FIRST_DATE)
+        last_day = first_day + days - 1
+
+        print(f"{count} pending requests over {days} days, {len(occupancy_grid.labs)} labs\n")
+        print(f"{'mode':<28} {'approved':>9} {'relocated':>10} {'total priority':>15} {'seconds':>8}")
+        started = time.perf_counter()
+        approved, total = arrival_order_total(conn, interval_index, first_day, last_day)
+        print(f"{'arrival order':<28} {approved:>9} {0:>10} {total:>15.0f} {time.perf_counter() - started:>8.2f}")
+
+        for relocate in (False, True):
+            started = time.perf_counter()
+            plan = allocator.plan(conn, first_day, last_day, relocate)
+            elapsed = time.perf_counter() - started
+            summary = plan['summary']
+            label = 'plan, relocating' if relocate else 'plan, own labs only'
+            print(f"{label:<28} {summary['assigned']:>9} {summary['relocated']:>10} "
+                  f"{summary['total_priority']:>15.0f} {elapsed:>8.2f}")
+
+        engine = BookingEngine(interval_index, occupancy_grid, waitlist, UserHistoryStore(path, connect=pool.connect),
+                               AlternativesService(interval_index, occupancy_grid, priority_scorer))
+        started = time.perf_counter()
+        engine.apply_allocation(conn, [(a['reservation_id'], a['lab_number']) for a in plan['assignments']],
+                                plan['unassigned'])
+        elapsed = time.perf_counter() - started
+        conn.close()
+        overlaps, _ = double_bookings(path)
+        print(f"\nApplied the relocating plan in {elapsed:.2f}s; overlapping approved reservations: {overlaps}")
+        if overlaps:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
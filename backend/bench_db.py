@@ -0,0 +1,189 @@
+"""
+Benchmark reads during writes through Flask's threaded development server,
+which serves every request on a new thread: a fresh rollback-journal
+connection per request (the old get_db_connection) against the WAL
+connection pool.
+
+Several client threads request the hot lookups from app.py over HTTP while
+one client keeps posting reservations that are inserted and committed.
+Each mode gets its own temporary copy of the seeded database and its own
+server. The pool's connection count shows whether connections outlive the
+request threads.
+
+Usage:
+    python bench_db.py [seconds] [readers]
+"""
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+from db import ConnectionPool
+
+SOURCE_DB = 'lab_occupancy.db'
+USERS = [f"user{i}@example.com" for i in range(50)]
+
+
+def seed(path):
+    if os.path.exists(SOURCE_DB):
+        shutil.copy(SOURCE_DB, path)
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA journal_mode = DELETE')
+    else:
+        conn = sqlite3.connect(path)
+        conn.execute('''CREATE TABLE reservations (id INTEGER PRIMARY KEY AUTOINCREMENT, lab_number TEXT NOT NULL,
+            date TEXT NOT NULL, start_time TEXT NOT NULL, end_time TEXT NOT NULL,
+            num_participants INTEGER NOT NULL, purpose TEXT NOT NULL, description TEXT,
+            user_email TEXT NOT NULL, user_name TEXT NOT NULL, priority_score REAL DEFAULT 0,
+            status TEXT DEFAULT 'pending', created_at TEXT NOT NULL, updated_at TEXT)''')
+    rng = random.Random(3)
+    conn.executemany(
+        '''INSERT INTO reservations (lab_number, date, start_time, end_time, num_participants, purpose,
+           description, user_email, user_name, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        [(f"L{rng.randrange(50)}", f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}", '10:00', '12:00',
+          20, 'workshop', 'seed', rng.choice(USERS), 'User', 'approved', '2026-01-01') for _ in range(20000)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def fresh_connection(path):
+    def connect():
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return connect
+
+
+def make_app(connect):
+    """Minimal Flask app serving app.py's hot lookups and a reservation insert"""
+    app = Flask(__name__)
+
+    @app.route('/read')
+    def read():
+        rng = random.Random()
+        conn = connect()
+        try:
+            rows = conn.execute(
+                'SELECT * FROM reservations WHERE user_email = ? ORDER BY created_at DESC',
+                (rng.choice(USERS),)
+            ).fetchall()
+            conn.execute('SELECT * FROM reservations WHERE id = ?', (rng.randrange(1, 20000),)).fetchone()
+        except sqlite3.OperationalError as e:
+            return jsonify({"error": str(e)}), 503
+        finally:
+            conn.close()
+        return jsonify({"rows": len(rows)})
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        conn = connect()
+        try:
+            conn.execute(
+                '''INSERT INTO reservations (lab_number, date, start_time, end_time, num_participants, purpose,
+                   description, user_email, user_name, status, created_at)
+                   VALUES ('L1', '2026-06-01', '10:00', '11:00', 10, 'meeting', 'bench', ?, 'User', 'pending', ?)''',
+                (request.json['user_email'], time.time())
+            )
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            return jsonify({"error": str(e)}), 503
+        finally:
+            conn.close()
+        return jsonify({"success": True})
+
+    return app
+
+
+def run(connect, seconds, readers):
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # one line per request otherwise
+    server = make_server('127.0.0.1', 0, make_app(connect), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def call(req):
+        try:
+            urllib.request.urlopen(req, timeout=30).read()
+            return True
+        except (urllib.error.URLError, OSError):
+            return False
+
+    def reader():
+        done = errors = 0
+        while not stop.is_set():
+            if call(f"{base}/read"):
+                done += 1
+            else:
+                errors += 1
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    def writer():
+        done = errors = 0
+        while not stop.is_set():
+            body = json.dumps({"user_email": USERS[done % len(USERS)]}).encode()
+            req = urllib.request.Request(f"{base}/write", data=body, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+            if call(req):
+                done += 1
+            else:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    server.shutdown()
+    server.server_close()
+    return {k: v / seconds if k != 'errors' else v for k, v in counts.items()}
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for mode in ('fresh connection, rollback journal', 'pooled, WAL'):
+            path = os.path.join(tmp, f"{len(results)}.db")
+            seed(path)
+            if len(results) == 0:
+                result = run(fresh_connection(path), seconds, readers)
+                result['opened'] = round((result['reads'] + result['writes']) * seconds)
+            else:
+                pool = ConnectionPool(path)
+                result = run(pool.connect, seconds, readers)
+                result['opened'] = pool.opened
+                pool.close_all()
+            results[mode] = result
+
+    print(f"{readers} reader clients + 1 writer client over HTTP, {seconds:.0f}s per mode\n")
+    print(f"{'mode':<36} {'reads/s':>9} {'writes/s':>9} {'errors':>7} {'connections':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<36} {r['reads']:>9.0f} {r['writes']:>9.0f} {r['errors']:>7} {r['opened']:>12}")
+
+
+if __name__ == '__main__':
+    main()
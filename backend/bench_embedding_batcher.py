@@ -0,0 +1,99 @@
+"""
+Benchmark embedding requests from concurrent submitters: one encode call
+per text (the scorer before micro-batching) against EmbeddingBatcher.
+
+The encoder is a stand-in for the DistilBERT forward pass, so the numbers
+don't depend on a model download: each call costs `pass_ms` plus
+`text_ms` per text, and calls run one at a time, as on a CPU host where
+every forward pass already uses all cores. 1, 8 and 64 submitter threads
+each embed distinct texts in a loop for `seconds`; throughput and p50/p99
+latency per text are reported for each mode.
+
+Usage:
+    python bench_embedding_batcher.py [seconds] [pass_ms] [text_ms] [max_batch_size] [max_wait_ms]
+"""
+import statistics
+import sys
+import threading
+import time
+
+import numpy as np
+
+from embedding_batcher import EmbeddingBatcher
+
+CONCURRENCY = (1, 8, 64)
+
+
+class StandInEncoder:
+    """encode(texts) -> (len(texts), 768) zeros after pass_ms + text_ms per text; one call at a time"""
+
+    def __init__(self, pass_ms, text_ms):
+        self.pass_seconds = pass_ms / 1000.0
+        self.text_seconds = text_ms / 1000.0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            time.sleep(self.pass_seconds + self.text_seconds * len(texts))
+        return np.zeros((len(texts), 768), dtype=np.float32)
+
+
+def run(embed, submitters, seconds):
+    """Latencies (seconds) of the texts `submitters` threads finish embedding within `seconds`"""
+    stop = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def submitter(number):
+        mine = []
+        i = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            embed(f"Workshop {number}-{i} on embedded systems for second year students")
+            finished = time.perf_counter()
+            # Calls still in flight at the deadline would inflate throughput
+            if finished <= deadline:
+                mine.append(finished - started)
+            i += 1
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=submitter, args=(n,)) for n in range(submitters)]
+    for t in threads:
+        t.start()
+    time.sleep(max(0.0, deadline - time.perf_counter()))
+    stop.set()
+    for t in threads:
+        t.join()
+    return latencies
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pass_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    text_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 1
+    max_batch_size = int(sys.argv[4]) if len(sys.argv) > 4 else 16
+    max_wait_ms = float(sys.argv[5]) if len(sys.argv) > 5 else 2
+
+    print(f"Stand-in encoder: {pass_ms:.0f} ms per pass + {text_ms:.0f} ms per text; "
+          f"batcher: {max_batch_size} texts / {max_wait_ms:.0f} ms; {seconds:.0f}s per run\n")
+    print(f"{'submitters':>10} {'mode':<18} {'texts/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+    for submitters in CONCURRENCY:
+        encoder = StandInEncoder(pass_ms, text_ms)
+        latencies = run(lambda text: encoder([text])[0], submitters, seconds)
+        rows = [('one call per text', latencies, 1.0)]
+
+        encoder = StandInEncoder(pass_ms, text_ms)
+        batcher = EmbeddingBatcher(encoder, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        latencies = run(lambda text: batcher.submit(text).result(), submitters, seconds)
+        rows.append(('EmbeddingBatcher', latencies, batcher.info()['avg_batch_size']))
+
+        for mode, latencies, batch in rows:
+            p50 = statistics.median(latencies) * 1000
+            p99 = np.percentile(latencies, 99) * 1000
+            print(f"{submitters:>10} {mode:<18} {len(latencies) / seconds:>8.0f} {p50:>8.1f} {p99:>8.1f} {batch:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark the occupancy grid against the per-lab SQL loop that
+suggest_alternatives used to run.
+
+Builds a synthetic database (default 500 labs x 180 days) in a temporary
+file, then times "which labs with capacity >= N are free for [start, end)
+on date D" both ways over the same random queries and checks they agree.
+
+Usage:
+    python bench_occupancy.py [num_labs] [num_days] [num_queries]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from migrations import migrate
+from occupancy_grid import OccupancyGrid
+from time_utils import minutes_to_time, session_window
+
+SESSIONS = ('morning', 'afternoon', 'evening')
+
+
+def build_database(path, num_labs, num_days, seed=7):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE labs (id INTEGER PRIMARY KEY AUTOINCREMENT, lab_number TEXT UNIQUE NOT NULL,
+            building TEXT NOT NULL, floor INTEGER NOT NULL, capacity INTEGER NOT NULL,
+            equipment TEXT, status TEXT DEFAULT 'active');
+        CREATE TABLE timetables (id INTEGER PRIMARY KEY AUTOINCREMENT, room_number TEXT NOT NULL,
+            date TEXT NOT NULL, session TEXT NOT NULL, class TEXT NOT NULL, section TEXT NOT NULL,
+            batch TEXT NOT NULL, subject TEXT NOT NULL, faculty_name TEXT NOT NULL,
+            start_time TEXT, end_time TEXT);
+        CREATE TABLE reservations (id INTEGER PRIMARY KEY AUTOINCREMENT, lab_number TEXT NOT NULL,
+            date TEXT NOT NULL, start_time TEXT NOT NULL, end_time TEXT NOT NULL,
+            num_participants INTEGER NOT NULL, purpose TEXT NOT NULL, description TEXT,
+            user_email TEXT NOT NULL, user_name TEXT NOT NULL, priority_score REAL DEFAULT 0,
+            status TEXT DEFAULT 'pending', created_at TEXT NOT NULL, updated_at TEXT);
+    ''')
+
+    labs = [(f"L{i:04d}", f"Block {i % 10}", i % 5, rng.choice((30, 40, 50, 60, 80, 120)), 'Computers')
+            for i in range(num_labs)]
+    conn.executemany('INSERT INTO labs (lab_number, building, floor, capacity, equipment) VALUES (?, ?, ?, ?, ?)', labs)
+
+    first = date(2025, 1, 6)
+    classes, reservations = [], []
+    for lab_number, *_ in labs:
+        for d in range(num_days):
+            day = (first + timedelta(days=d)).isoformat()
+            for session in SESSIONS:
+                if rng.random() < 0.35:
+                    start, end = session_window(session)
+                    start += rng.choice((0, 60))
+                    classes.append((lab_number, day, session, 'CSE', 'A', '2023', 'Subject', 'Faculty',
+                                    minutes_to_time(start), minutes_to_time(min(end, start + 120))))
+            if rng.random() < 0.3:
+                start = rng.randrange(8 * 60, 18 * 60, 30)
+                reservations.append((lab_number, day, minutes_to_time(start), minutes_to_time(start + 90),
+                                     20, 'workshop', 'user@example.com', 'User',
+                                     rng.choice(('approved', 'pending', 'rejected')), 'now'))
+    conn.executemany('''INSERT INTO timetables (room_number, date, session, class, section, batch, subject,
+                        faculty_name, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', classes)
+    conn.executemany('''INSERT INTO reservations (lab_number, date, start_time, end_time, num_participants,
+                        purpose, user_email, user_name, status, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                     reservations)
+    conn.commit()
+    # Derived tables the grid reads (equipment bitmasks)
+    migrate(conn)
+    conn.close()
+    return first, len(classes), len(reservations)
+
+
+def free_labs_sql(conn, day, start_time, end_time, num_participants):
+    """The previous suggest_alternatives loop: one labs query plus two queries per lab"""
+    labs = conn.execute(
+        'SELECT * FROM labs WHERE capacity >= ? AND status = "active"', (num_participants,)
+    ).fetchall()
+    free = []
+    for lab in labs:
+        class_conflict = conn.execute(
+            '''SELECT 1 FROM timetables WHERE room_number = ? AND date = ?
+               AND start_time < ? AND end_time > ?''',
+            (lab['lab_number'], day, end_time, start_time)
+        ).fetchone()
+        reservation_conflict = conn.execute(
+            '''SELECT 1 FROM reservations WHERE lab_number = ? AND date = ? AND status IN ('approved', 'pending')
+               AND start_time < ? AND end_time > ?''',
+            (lab['lab_number'], day, end_time, start_time)
+        ).fetchone()
+        if not class_conflict and not reservation_conflict:
+            free.append(lab['lab_number'])
+    return free
+
+
+def main():
+    num_labs = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    num_days = int(sys.argv[2]) if len(sys.argv) > 2 else 180
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        first, num_classes, num_reservations = build_database(path, num_labs, num_days)
+        print(f"📄 {num_labs} labs x {num_days} days: {num_classes} classes, {num_reservations} reservations")
+
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+
+        grid = OccupancyGrid()
+        start = time.perf_counter()
+        grid.load(conn)
+        print(f"Grid build: {(time.perf_counter() - start) * 1000:.0f} ms, {sum(c.nbytes for c in grid.days.values()) / 2**20:.1f} MB")
+
+        rng = random.Random(11)
+        queries = []
+        for _ in range(num_queries):
+            day = (first + timedelta(days=rng.randrange(num_days))).isoformat()
+            start_minutes = rng.randrange(8 * 60, 18 * 60, 60)
+            queries.append((day, start_minutes, start_minutes + 120, rng.choice((20, 40, 60))))
+
+        start = time.perf_counter()
+        sql_results = [free_labs_sql(conn, d, minutes_to_time(s), minutes_to_time(e), n) for d, s, e, n in queries]
+        sql_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+        start = time.perf_counter()
+        grid_results = [[lab['lab_number'] for lab in grid.free_labs(d, s, e, n)] for d, s, e, n in queries]
+        grid_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+        conn.close()
+
+    mismatches = sum(sorted(a) != sorted(b) for a, b in zip(sql_results, grid_results))
+    print(f"SQL loop:  {sql_ms:8.2f} ms/query")
+    print(f"Grid:      {grid_ms:8.2f} ms/query  ({sql_ms / grid_ms:.0f}x)")
+    print(f"Mismatching answers: {mismatches}/{num_queries}")
+
+
+if __name__ == '__main__':
+    main()
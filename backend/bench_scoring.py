@@ -0,0 +1,112 @@
+"""
+Benchmark priority scoring one request at a time (calculate_priority in a
+loop) against calculate_priority_batch over the same rows, and the
+columns path (calculate_priority_columns) the batch dicts are built from.
+
+Rows are random requests whose descriptions repeat the way bulk
+re-evaluations do (templates with course codes, participants, dates).
+The NLP model is not loaded and per-call logging is switched off, so
+both sides pay only for the scoring itself. Every batch result is
+asserted identical to the scalar result for its row, value and type
+(compared as JSON, so 0 and 0.0 differ); scalar results are compared as
+they are produced rather than kept, so 1M rows fit in memory.
+
+Usage:
+    python bench_scoring.py [rows ...]      (default: 10000 1000000)
+"""
+import json
+import logging
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from priority_scorer import PriorityScorer, ROLE_SCORES, PROOF_SCORES, URGENCY_BASE
+
+TEMPLATES = [
+    "Mid-term practical examination for {code} with lab exercises",
+    "Lecture on {topic} for {code}, third year students",
+    "Hands-on {topic} workshop for members of the coding club",
+    "Research group meeting on {topic} experiments",
+    "Very important urgent meeting for {topic}, must have lab urgently",
+    "Project review for {code} on {day}",
+]
+TOPICS = ['machine learning', 'databases', 'PCB design', 'cloud computing', 'networks', 'compilers']
+PURPOSES = ['exam', 'lecture', 'workshop', 'research', 'meeting', 'event']
+# The scorer's keys plus one it doesn't know, to exercise the defaults
+URGENCIES = list(URGENCY_BASE) + ['critical']
+ROLES = list(ROLE_SCORES) + ['club']
+PROOFS = list(PROOF_SCORES) + [None, 'screenshot']
+
+
+def make_rows(count, seed=5):
+    rng = random.Random(seed)
+    today = date.today()
+    rows = {name: [] for name in ('purposes', 'descriptions', 'num_participants', 'lab_capacities',
+                                  'urgencies', 'booking_dates', 'has_proofs', 'proof_types', 'user_roles')}
+    for _ in range(count):
+        day = today + timedelta(days=rng.randrange(0, 60))
+        rows['purposes'].append(rng.choice(PURPOSES))
+        rows['descriptions'].append(rng.choice(TEMPLATES).format(
+            code=f"CS{rng.randrange(100, 400)}", topic=rng.choice(TOPICS), day=day.strftime('%B %d')))
+        rows['num_participants'].append(rng.randrange(5, 130))
+        rows['lab_capacities'].append(rng.choice((30, 40, 60, 80, 120)))
+        rows['urgencies'].append(rng.choice(URGENCIES))
+        rows['booking_dates'].append(day.isoformat())
+        rows['has_proofs'].append(rng.random() < 0.3)
+        rows['proof_types'].append(rng.choice(PROOFS))
+        rows['user_roles'].append(rng.choice(ROLES))
+    return rows
+
+
+def scalar_results(scorer, rows):
+    for i in range(len(rows['purposes'])):
+        yield scorer.calculate_priority(
+            purpose=rows['purposes'][i],
+            description=rows['descriptions'][i],
+            num_participants=rows['num_participants'][i],
+            lab_capacity=rows['lab_capacities'][i],
+            urgency=rows['urgencies'][i],
+            booking_date=rows['booking_dates'][i],
+            has_proof=rows['has_proofs'][i],
+            proof_type=rows['proof_types'][i],
+            user_role=rows['user_roles'][i]
+        )
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]
+    logging.disable(logging.INFO)
+    scorer = PriorityScorer(load_mode='disabled')
+
+    print(f"{'rows':>9} {'distinct texts':>15} {'scalar s':>9} {'batch s':>8} {'speedup':>8} "
+          f"{'columns s':>10} {'speedup':>8}")
+    for count in sizes:
+        rows = make_rows(count)
+
+        started = time.perf_counter()
+        batch = scorer.calculate_priority_batch(**rows)
+        batch_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scorer.calculate_priority_columns(**rows)
+        columns_seconds = time.perf_counter() - started
+
+        # Timed separately from the comparison below
+        started = time.perf_counter()
+        for _ in scalar_results(scorer, rows):
+            pass
+        scalar_seconds = time.perf_counter() - started
+
+        for i, result in enumerate(scalar_results(scorer, rows)):
+            assert json.dumps(batch[i]) == json.dumps(result), f"row {i}: batch {batch[i]} != scalar {result}"
+
+        distinct = len(set(rows['descriptions']))
+        print(f"{count:>9} {distinct:>15} {scalar_seconds:>9.2f} {batch_seconds:>8.2f} "
+              f"{scalar_seconds / batch_seconds:>7.2f}x {columns_seconds:>10.2f} "
+              f"{scalar_seconds / columns_seconds:>7.2f}x")
+        del batch, rows
+
+
+if __name__ == '__main__':
+    main()
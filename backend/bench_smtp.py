@@ -0,0 +1,112 @@
+"""
+Benchmark email delivery: a new SMTP session per message (the old
+send_email) against pooled sessions and send_batch.
+
+Runs a local stub SMTP server that accepts every message. It delays its
+greeting by `handshake_ms` to stand in for the TCP + STARTTLS + AUTH cost
+of a real relay (what pooling saves) and each DATA reply by `data_ms` (what
+concurrent sessions overlap).
+
+Usage:
+    python bench_smtp.py [messages] [handshake_ms] [data_ms] [concurrency]
+"""
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP to accept mail: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+    handshake_seconds = 0.0
+    data_seconds = 0.0
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        time.sleep(self.handshake_seconds)
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250-stub')
+                self.reply('250 8BITMIME')
+            elif command == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                time.sleep(self.data_seconds)
+                self.server.received += 1
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    received = 0
+
+
+def send_fresh_sessions(service, messages):
+    """The previous send_email: connect, send and quit for every message"""
+    for recipient, subject, body in messages:
+        with smtplib.SMTP(service.smtp_server, service.smtp_port) as server:
+            server.send_message(service.build_message(recipient, subject, body))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    handshake_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 50
+    data_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    concurrency = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+
+    StubSMTPHandler.handshake_seconds = handshake_ms / 1000
+    StubSMTPHandler.data_seconds = data_ms / 1000
+    server = StubSMTPServer(('127.0.0.1', 0), StubSMTPHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Point the service at the stub before importing it (pool size is read at import)
+    os.environ.update({
+        'EMAIL_TESTING_MODE': '0', 'SMTP_STARTTLS': '0', 'SMTP_PASSWORD': '',
+        'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': str(server.server_address[1]),
+        'SMTP_POOL_SIZE': str(concurrency),
+    })
+    from email_service import EmailService
+
+    messages = [(f"user{i}@example.com", f"Reservation #{i}", f"<p>Reservation {i} approved</p>")
+                for i in range(count)]
+
+    modes = {
+        'fresh session per message': lambda service: send_fresh_sessions(service, messages),
+        'pooled, one at a time': lambda service: [service.send_email(*m) for m in messages],
+        f'send_batch, concurrency {concurrency}': lambda service: service.send_batch(messages),
+    }
+
+    print(f"{count} messages, {handshake_ms:.0f} ms session setup, {data_ms:.0f} ms per message\n")
+    print(f"{'mode':<32} {'seconds':>8} {'msgs/s':>8} {'sessions':>9}")
+    for mode, run in modes.items():
+        service = EmailService()
+        received = server.received
+        started = time.perf_counter()
+        run(service)
+        elapsed = time.perf_counter() - started
+        assert server.received - received == count, "stub did not receive every message"
+        sessions = service.smtp_pool.opened if mode != 'fresh session per message' else count
+        print(f"{mode:<32} {elapsed:>8.2f} {count / elapsed:>8.0f} {sessions:>9}")
+        service.smtp_pool.close()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
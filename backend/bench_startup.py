@@ -0,0 +1,73 @@
+"""
+Measure app startup latency in each scorer model load mode.
+
+Every run is a fresh interpreter (SCORER_MODEL_LOADING set, outbox worker
+off) that times `import app` and then the first GET /api/health through
+Flask's test client, and reports the model status health returned. The
+model loaded column is how long after the start the model was ready
+(background keeps loading after health answers; lazy loads on the first
+scoring request, so it is not waited for). Median of the runs per mode.
+
+Run from backend/ so app.py finds lab_occupancy.db.
+
+Usage:
+    python bench_startup.py [runs] [mode ...]     (default: 3 runs of eager background lazy)
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/api/health')
+answered = time.perf_counter()
+health = response.get_json()
+scorer = app.priority_scorer
+if scorer.load_mode == 'background':
+    scorer.load_model()  # waits for the warm-up thread's load
+ready = time.perf_counter() if scorer.model_status in ('ready', 'failed') else None
+print(json.dumps({
+    "import": imported - started,
+    "health": answered - imported,
+    "status": health["model_status"],
+    "ready": ready - started if ready is not None else None,
+    "final": scorer.model_status
+}))
+'''
+
+
+def measure(mode):
+    env = dict(os.environ, SCORER_MODEL_LOADING=mode, EMAIL_OUTBOX_WORKER='off')
+    result = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"{mode} run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    modes = sys.argv[2:] or ['eager', 'background', 'lazy']
+    if not os.path.exists('lab_occupancy.db'):
+        sys.exit("lab_occupancy.db not found; run init_db.py first")
+
+    print(f"Median of {runs} fresh interpreters per mode\n")
+    print(f"{'mode':<11} {'import s':>9} {'health s':>9} {'to health s':>12} {'model at health':>16} {'model loaded s':>15}")
+    for mode in modes:
+        samples = [measure(mode) for _ in range(runs)]
+        imported = statistics.median(s['import'] for s in samples)
+        health = statistics.median(s['health'] for s in samples)
+        total = statistics.median(s['import'] + s['health'] for s in samples)
+        ready = [s['ready'] for s in samples if s['ready'] is not None]
+        loaded = f"{statistics.median(ready):.2f}" if ready else '-'
+        if samples[-1]['final'] == 'failed':
+            loaded += ' (failed)'
+        print(f"{mode:<11} {imported:>9.2f} {health:>9.3f} {total:>12.2f} {samples[-1]['status']:>16} {loaded:>15}")
+
+
+if __name__ == '__main__':
+    main()
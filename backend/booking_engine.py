@@ -0,0 +1,469 @@
+"""
+Transactional booking.
+
+A booking (conflict check, optional preemption, insert, user stats and
+queued notifications) runs as one BEGIN IMMEDIATE transaction: the write
+lock is taken before the conflict check, so no other writer, in this
+process or another, can commit between the check and the insert.
+
+Within a process, bookings are also serialized per (lab, date). Requests
+for the same lab-day queue on an in-process lock instead of polling
+SQLite's busy timeout, and hold it until the schedule indexes are synced,
+so the next one checks against an up-to-date index; other lab-days don't
+wait on that lock.
+
+A request overlapping a timetable class is refused (ValueError); one
+that overlaps bookings it cannot preempt is waitlisted. When a
+booking is cancelled or preempted, the best waitlisted requests that now
+fit are promoted in the same transaction. Modifications and admin
+approvals take the same lock and get the same conflict check.
+
+A batch allocation plan (see allocation.py) spans many lab-days; it takes
+their locks in sorted order before BEGIN IMMEDIATE, like a single booking
+takes its one lock, so the two cannot deadlock.
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager, ExitStack
+from datetime import datetime
+import logging
+
+from interval_index import ACTIVE_STATUSES
+from outbox import enqueue
+from time_utils import date_to_day, time_to_minutes, minutes_to_time
+from waitlist import WAITLIST_STATUS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Auto-approve at or above this score when the slot is free
+AUTO_APPROVE_SCORE = 65
+# A request preempts conflicting bookings only if it beats every one of them by this much
+PREEMPT_MARGIN = 15
+
+# waitlist_position is 1-based and taken under the lab-day lock; None unless waitlisted
+Booking = namedtuple('Booking', 'reservation_id status preempted promoted waitlist_position')
+
+
+class KeyedLocks:
+    """One lock per key, created on demand and dropped once nobody holds or waits for it"""
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders + waiters]
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class BookingEngine:
+    """
+    Books and cancels reservations against the database and keeps the
+    in-memory schedule indexes (interval index, occupancy grid and
+    waitlist) in step.
+    """
+
+    def __init__(self, interval_index, occupancy_grid, waitlist, user_history, alternatives_service):
+        self.interval_index = interval_index
+        self.occupancy_grid = occupancy_grid
+        self.waitlist = waitlist
+        self.user_history = user_history
+        self.alternatives_service = alternatives_service
+        self._locks = KeyedLocks()
+
+    def sync(self, conn, reservation_id):
+        """Bring the in-memory schedule indexes up to date after a write"""
+        self.interval_index.sync_reservation(conn, reservation_id)
+        self.occupancy_grid.sync_reservation(conn, reservation_id)
+
+    def verify(self, conn, lab_number, date):
+        """Check the indexes for one lab-day against SQL, rebuilding them on mismatch"""
+        if not self.interval_index.verify(conn, lab_number, date):
+            self.occupancy_grid.rebuild_lab_day(conn, lab_number, date)
+        self.waitlist.verify(conn, lab_number, date)
+
+    def lock(self, lab_number, date):
+        """Context manager serializing writes to one lab-day within this process"""
+        return self._locks.hold((lab_number, date))
+
+    def book(self, conn, request, window, priority_score, lab_capacity):
+        """
+        Decide and store a scored reservation request in one transaction.
+        `request` holds the validated reservation fields, `window` its
+        (start, end) minutes. conn must not have a transaction open.
+        Returns a Booking; notifications are queued in the same transaction.
+        Raises ValueError, storing nothing, if the window overlaps a class.
+        """
+        return self._transaction(conn, [(request['lab_number'], request['date'])], lambda touched: self._book(
+            conn, request, window, priority_score, lab_capacity, touched))
+
+    def cancel(self, conn, reservation_id, lab_number, date):
+        """
+        Cancel a reservation and promote waitlisted requests into the freed
+        time. conn must not have a transaction open. Returns the promoted ids,
+        or None if the reservation does not exist.
+        """
+        return self._transaction(conn, [(lab_number, date)], lambda touched: self._cancel(
+            conn, reservation_id, touched))
+
+    def update(self, conn, reservation_id, updates, lab_number, date):
+        """
+        Change a reservation's fields (`updates`, already validated) in one
+        transaction. It goes back to pending review, or to the waitlist if
+        its new time overlaps another booking; waitlisted requests are
+        promoted into time it gave up. conn must not have a transaction
+        open. Returns a Booking, or None if the reservation does not exist;
+        raises ValueError, changing nothing, if it can no longer be modified
+        or its new time overlaps a class.
+        """
+        return self._transaction(conn, [(lab_number, date)], lambda touched: self._update(
+            conn, reservation_id, updates, (lab_number, date), touched))
+
+    def approve(self, conn, reservation_id, lab_number, date):
+        """
+        Approve a reservation regardless of its score. conn must not have a
+        transaction open. Returns False if the reservation does not exist;
+        raises ValueError, changing nothing, if it overlaps a class or
+        another booking (which has to be rejected or cancelled first) or
+        was cancelled.
+        """
+        return self._transaction(conn, [(lab_number, date)], lambda touched: self._approve(
+            conn, reservation_id, (lab_number, date), touched))
+
+    def apply_allocation(self, conn, assignments, waitlisted):
+        """
+        Apply a batch allocation plan in one transaction: approve each
+        (reservation_id, lab_number) assignment, moving it to that lab, and
+        waitlist the `waitlisted` ids that are still pending. Raises
+        ValueError, changing nothing, if the plan no longer fits the
+        schedule. Returns (approved ids, newly waitlisted ids).
+        """
+        ids = [reservation_id for reservation_id, _ in assignments] + list(waitlisted)
+        placeholders = ', '.join('?' for _ in ids)
+        current = {row['id']: (row['lab_number'], row['date']) for row in conn.execute(
+            f'SELECT id, lab_number, date FROM reservations WHERE id IN ({placeholders})', ids)} if ids else {}
+        keys = set(current.values())
+        keys.update((lab_number, current[reservation_id][1])
+                    for reservation_id, lab_number in assignments if reservation_id in current)
+        return self._transaction(conn, sorted(keys), lambda touched: self._apply_allocation(
+            conn, assignments, waitlisted, current, touched))
+
+    def _transaction(self, conn, keys, body):
+        """Run body(touched) in BEGIN IMMEDIATE under the (lab, date) locks, then sync the touched ids"""
+        with ExitStack() as stack:
+            for lab_number, date in keys:
+                stack.enter_context(self.lock(lab_number, date))
+            conn.execute('BEGIN IMMEDIATE')
+            touched = []
+            try:
+                result = body(touched)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                for reservation_id in touched:
+                    self.sync(conn, reservation_id)
+                for lab_number, date in keys:
+                    self.waitlist.rebuild(conn, lab_number, date)
+                raise
+            for reservation_id in touched:
+                self.sync(conn, reservation_id)
+            return result
+
+    def _book(self, conn, request, window, priority_score, lab_capacity, touched):
+        lab_number, date = request['lab_number'], request['date']
+
+        # Under the write lock, so the index is checked against the committed state
+        self.verify(conn, lab_number, date)
+        self._check_classes(lab_number, date, *window)
+        conflicts = [busy.details for busy in
+                     self.interval_index.overlaps(lab_number, date, *window, kind='reservation')]
+
+        # Auto-approve if the score is high enough and there is no conflict;
+        # with conflicts, approve only by preempting all of them, else waitlist
+        status = 'pending'
+        preempted = []
+        if not conflicts:
+            if priority_score >= AUTO_APPROVE_SCORE:
+                status = 'approved'
+        elif priority_score > max(c['priority_score'] for c in conflicts) + PREEMPT_MARGIN:
+            # Significantly higher priority than every conflict: reject them all
+            for conflict in conflicts:
+                conn.execute('UPDATE reservations SET status = "rejected" WHERE id = ?', (conflict['id'],))
+                enqueue(conn, 'rejection', conflict['user_email'], {
+                    "lab_number": conflict['lab_number'],
+                    "date": conflict['date'],
+                    "start_time": conflict['start_time'],
+                    "end_time": conflict['end_time'],
+                    "reason": "Higher priority request received"
+                }, reservation_id=conflict['id'])
+                touched.append(conflict['id'])
+                preempted.append(conflict['id'])
+            status = 'approved'
+        else:
+            status = WAITLIST_STATUS
+
+        num_participants = int(request['num_participants'])
+        cursor = conn.execute(
+            '''INSERT INTO reservations
+               (lab_number, date, start_time, end_time, num_participants, purpose,
+                description, user_email, user_name, priority_score, status, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (lab_number, date, request['start_time'], request['end_time'],
+             num_participants, request['purpose'], request['description'],
+             request['user_email'], request['user_name'], priority_score, status,
+             datetime.now().isoformat())
+        )
+        reservation_id = cursor.lastrowid
+        touched.append(reservation_id)
+
+        self.user_history.record_booking(conn, request['user_email'], num_participants, lab_capacity)
+        if status == 'approved':
+            self.user_history.record_approval(conn, request['user_email'])
+
+        slot = {
+            "lab_number": lab_number,
+            "date": date,
+            "start_time": request['start_time'],
+            "end_time": request['end_time']
+        }
+        # Sync now: alternatives and promotion must see the new reservation
+        # (this connection sees its own uncommitted writes)
+        for ref_id in touched:
+            self.sync(conn, ref_id)
+        self._notify(conn, reservation_id, status, request['user_email'], slot, window, num_participants)
+        waitlist_position = None
+        if status == WAITLIST_STATUS:
+            self.waitlist.add(conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone())
+            waitlist_position = self.waitlist.ranked(lab_number, date).index(reservation_id) + 1
+
+        # Preempted bookings may have covered more than the new one needs
+        promoted = self._promote(conn, lab_number, date, touched) if preempted else []
+        return Booking(reservation_id, status, preempted, promoted, waitlist_position)
+
+    def _cancel(self, conn, reservation_id, touched):
+        reservation = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+        if not reservation:
+            return None
+
+        conn.execute('UPDATE reservations SET status = "cancelled" WHERE id = ?', (reservation_id,))
+        if reservation['status'] != 'cancelled':
+            self.user_history.record_cancellation(conn, reservation['user_email'])
+        enqueue(conn, 'cancellation', reservation['user_email'], {
+            "lab_number": reservation['lab_number'],
+            "date": reservation['date'],
+            "start_time": reservation['start_time'],
+            "end_time": reservation['end_time']
+        }, reservation_id=reservation_id)
+        touched.append(reservation_id)
+        self.waitlist.remove(reservation_id)
+
+        if reservation['status'] not in ACTIVE_STATUSES:
+            return []
+        self.sync(conn, reservation_id)
+        # Under the write lock: promotion must check against the committed
+        # state, including bookings other processes made since our last sync
+        self.verify(conn, reservation['lab_number'], reservation['date'])
+        return self._promote(conn, reservation['lab_number'], reservation['date'], touched)
+
+    def _locked_row(self, conn, reservation_id, locked):
+        """The reservation row, checked to still be on the locked lab-day; None if missing"""
+        row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+        if row is not None and (row['lab_number'], row['date']) != locked:
+            raise ValueError(f"Reservation {reservation_id} was moved to another lab or date")
+        if row is not None and row['status'] == 'cancelled':
+            raise ValueError(f"Reservation {reservation_id} is cancelled")
+        return row
+
+    def _check_classes(self, lab_number, date, start, end):
+        """Raise ValueError if [start, end) overlaps a timetable class; classes can't be preempted"""
+        for busy in self.interval_index.overlaps(lab_number, date, start, end, kind='class'):
+            raise ValueError(f"{lab_number} has a scheduled class ({busy.details['subject']}, "
+                             f"{minutes_to_time(busy.start)}-{minutes_to_time(busy.end)}) on {date}")
+
+    def _conflicts(self, conn, lab_number, date, start, end, reservation_id):
+        """Ids of other active reservations overlapping [start, end), checked as _book does"""
+        self.verify(conn, lab_number, date)
+        self._check_classes(lab_number, date, start, end)
+        return [busy.ref_id for busy in self.interval_index.overlaps(lab_number, date, start, end, kind='reservation')
+                if busy.ref_id != reservation_id]
+
+    def _update(self, conn, reservation_id, updates, locked, touched):
+        row = self._locked_row(conn, reservation_id, locked)
+        if row is None:
+            return None
+        lab_number, date = locked
+        fields = dict(row, **updates)
+        try:
+            start, end = time_to_minutes(fields['start_time']), time_to_minutes(fields['end_time'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Reservation {reservation_id} has no valid time range")
+        if start >= end:
+            raise ValueError("start_time must be before end_time")
+
+        conflicts = self._conflicts(conn, lab_number, date, start, end, reservation_id)
+        # Modified bookings go back to pending review, unless they now clash
+        status = WAITLIST_STATUS if conflicts else 'pending'
+        set_clause = ', '.join(f"{column} = ?" for column in updates)
+        conn.execute(f'UPDATE reservations SET {set_clause}, status = ? WHERE id = ?',
+                     list(updates.values()) + [status, reservation_id])
+        enqueue(conn, 'modification', row['user_email'], {
+            "lab_number": lab_number,
+            "updates": updates
+        }, reservation_id=reservation_id)
+        touched.append(reservation_id)
+        self.sync(conn, reservation_id)
+
+        # Rebuilt rather than re-added: the heap may hold the old times
+        waitlist_position = None
+        if WAITLIST_STATUS in (status, row['status']):
+            self.waitlist.rebuild(conn, lab_number, date)
+        if status == WAITLIST_STATUS:
+            waitlist_position = self.waitlist.ranked(lab_number, date).index(reservation_id) + 1
+
+        # The old time may have covered more than the new one
+        promoted = self._promote(conn, lab_number, date, touched) if row['status'] in ACTIVE_STATUSES else []
+        return Booking(reservation_id, status, [], promoted, waitlist_position)
+
+    def _approve(self, conn, reservation_id, locked, touched):
+        row = self._locked_row(conn, reservation_id, locked)
+        if row is None:
+            return False
+        if row['start_min'] is None:
+            raise ValueError(f"Reservation {reservation_id} has no valid time range")
+        lab_number, date = locked
+        conflicts = self._conflicts(conn, lab_number, date, row['start_min'], row['end_min'], reservation_id)
+        if conflicts:
+            raise ValueError(f"Overlaps reservation(s) {', '.join(map(str, conflicts))}")
+
+        conn.execute('UPDATE reservations SET status = "approved" WHERE id = ?', (reservation_id,))
+        if row['status'] != 'approved':
+            self.user_history.record_approval(conn, row['user_email'])
+        self.waitlist.remove(reservation_id)
+        touched.append(reservation_id)
+        slot = {key: row[key] for key in ('lab_number', 'date', 'start_time', 'end_time')}
+        self._notify(conn, reservation_id, 'approved', row['user_email'], slot, None, row['num_participants'])
+        return True
+
+    def _apply_allocation(self, conn, assignments, waitlisted, locked, touched):
+        rows = {}
+        for reservation_id in [reservation_id for reservation_id, _ in assignments] + list(waitlisted):
+            row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+            if row is None or locked.get(reservation_id) != (row['lab_number'], row['date']):
+                raise ValueError(f"Reservation {reservation_id} no longer matches the plan")
+            if row['status'] not in ('pending', WAITLIST_STATUS):
+                raise ValueError(f"Reservation {reservation_id} is already {row['status']}")
+            if row['start_min'] is None:
+                raise ValueError(f"Reservation {reservation_id} has no valid time range")
+            rows[reservation_id] = row
+
+        active_labs = {lab['lab_number'] for lab in self.occupancy_grid.labs}
+        for reservation_id, lab_number in assignments:
+            if lab_number not in active_labs:
+                raise ValueError(f"Lab {lab_number} is not an active lab")
+
+        # Planned intervals per target lab-day: no overlap with each other,
+        # with classes or with any active reservation outside the plan
+        # (approved, or pending but created or moved since the plan was made)
+        targets = {}
+        for reservation_id, lab_number in assignments:
+            row = rows[reservation_id]
+            targets.setdefault((lab_number, row['date']), []).append((row['start_min'], row['end_min'], reservation_id))
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        for (lab_number, date), planned in targets.items():
+            self.verify(conn, lab_number, date)
+            active = conn.execute(
+                f'''SELECT id, start_min, end_min FROM reservations
+                    WHERE lab_number = ? AND day_num = ? AND status IN ({placeholders})
+                      AND start_min IS NOT NULL''',
+                (lab_number, date_to_day(date)) + ACTIVE_STATUSES
+            ).fetchall()
+            fixed = [(busy.start, busy.end, 'a class') for busy in self.interval_index.busy_intervals(lab_number, date)
+                     if busy.kind == 'class']
+            fixed += [(row['start_min'], row['end_min'], f"reservation {row['id']}")
+                      for row in active if row['id'] not in rows]
+            planned.sort()
+            for (start, end, reservation_id), following in zip(planned, planned[1:] + [None]):
+                if following and following[0] < end:
+                    raise ValueError(f"Reservations {reservation_id} and {following[2]} overlap in {lab_number}")
+                for s, e, holder in fixed:
+                    if s < end and start < e:
+                        raise ValueError(f"{lab_number} is no longer free on {date} for reservation "
+                                         f"{reservation_id} ({holder} is there)")
+
+        for reservation_id, lab_number in assignments:
+            row = rows[reservation_id]
+            conn.execute('UPDATE reservations SET lab_number = ?, status = "approved" WHERE id = ?',
+                         (lab_number, reservation_id))
+            self.user_history.record_approval(conn, row['user_email'])
+            self.waitlist.remove(reservation_id)
+            touched.append(reservation_id)
+            slot = {"lab_number": lab_number, "date": row['date'],
+                    "start_time": row['start_time'], "end_time": row['end_time']}
+            self._notify(conn, reservation_id, 'approved', row['user_email'], slot, None, row['num_participants'])
+
+        newly_waitlisted = [reservation_id for reservation_id in waitlisted
+                            if rows[reservation_id]['status'] == 'pending']
+        for reservation_id in newly_waitlisted:
+            conn.execute('UPDATE reservations SET status = ? WHERE id = ?', (WAITLIST_STATUS, reservation_id))
+            touched.append(reservation_id)
+
+        # Alternatives for the waitlist emails must see the approvals
+        for reservation_id in touched:
+            self.sync(conn, reservation_id)
+        for reservation_id in newly_waitlisted:
+            row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+            slot = {key: row[key] for key in ('lab_number', 'date', 'start_time', 'end_time')}
+            self._notify(conn, reservation_id, WAITLIST_STATUS, row['user_email'], slot,
+                         (row['start_min'], row['end_min']), row['num_participants'])
+            self.waitlist.add(row)
+
+        logger.info(f"Applied allocation: {len(assignments)} approved, {len(newly_waitlisted)} waitlisted")
+        return [reservation_id for reservation_id, _ in assignments], newly_waitlisted
+
+    def _promote(self, conn, lab_number, date, touched):
+        """Promote waitlisted requests of a lab-day, best first, while any fits; returns their ids"""
+        self.waitlist.verify(conn, lab_number, date)
+
+        def fits(start, end):
+            return not self.interval_index.any_overlap(lab_number, date, start, end)
+
+        promoted = []
+        while True:
+            reservation_id = self.waitlist.pop_fitting(lab_number, date, fits)
+            if reservation_id is None:
+                return promoted
+            row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+            status = 'approved' if row['priority_score'] >= AUTO_APPROVE_SCORE else 'pending'
+            conn.execute('UPDATE reservations SET status = ? WHERE id = ?', (status, reservation_id))
+            if status == 'approved':
+                self.user_history.record_approval(conn, row['user_email'])
+            touched.append(reservation_id)
+            self.sync(conn, reservation_id)
+
+            slot = {key: row[key] for key in ('lab_number', 'date', 'start_time', 'end_time')}
+            window = (row['start_min'], row['end_min'])
+            self._notify(conn, reservation_id, status, row['user_email'], slot, window, row['num_participants'])
+            logger.info(f"Promoted waitlisted reservation {reservation_id} for {lab_number} on {date} ({status})")
+            promoted.append(reservation_id)
+
+    def _notify(self, conn, reservation_id, status, user_email, slot, window, num_participants):
+        """Queue the email for a reservation's new status"""
+        if status == 'approved':
+            enqueue(conn, 'approval', user_email, dict(slot, reservation_id=reservation_id),
+                    reservation_id=reservation_id)
+        else:
+            alternatives = self.alternatives_service.suggest(
+                slot['lab_number'], slot['date'], window, num_participants)
+            enqueue(conn, status, user_email, dict(slot, alternatives=alternatives),
+                    reservation_id=reservation_id)
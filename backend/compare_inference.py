@@ -0,0 +1,126 @@
+"""
+Compare the scorer's fp32 and int8 inference modes.
+
+Reports per-description latency, resident memory after loading, and drift of
+the semantic similarity / authenticity points relative to fp32.
+
+Usage:
+    python compare_inference.py [corpus.txt]
+
+corpus.txt holds one description per line; by default the descriptions in
+lab_occupancy.db plus a few built-in samples are used. Honors the same
+SCORER_MODEL_DIR / SCORER_TORCH_THREADS settings as the app.
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+DB_PATH = 'lab_occupancy.db'
+
+SAMPLE_DESCRIPTIONS = [
+    "Python programming workshop for beginners",
+    "Mid-term practical examination for Data Structures course CS201 with Dr. Madhuri",
+    "Department faculty meeting to discuss curriculum updates",
+    "Annual technical symposium - CodeFest 2025, students from all branches",
+    "Guest lecture on Cloud Computing by industry expert in Seminar Hall",
+    "Very important urgent meeting, must have lab urgently",
+    "PCB design workshop with hands-on training for ECE members of IEEE chapter",
+    "Coding competition practice session for students on March 12 at 10:00 am",
+]
+
+
+def load_corpus(path=None):
+    if path:
+        with open(path, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    corpus = list(SAMPLE_DESCRIPTIONS)
+    if os.path.exists(DB_PATH):
+        conn = sqlite3.connect(DB_PATH)
+        corpus += [row[0] for row in conn.execute(
+            "SELECT DISTINCT description FROM reservations WHERE description IS NOT NULL AND description != ''"
+        )]
+        conn.close()
+    return list(dict.fromkeys(corpus))
+
+
+def _rss_mb():
+    """Resident set size of this process in MB (None where unsupported)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    except ImportError:
+        return None
+
+
+def measure(precision, corpus):
+    """Run in a fresh process so memory numbers are not shared between modes"""
+    from priority_scorer import PriorityScorer
+    import torch, transformers  # Imported up front so model_rss_mb counts only the model
+
+    rss_before = _rss_mb()
+    scorer = PriorityScorer(load_mode='eager', precision=precision)
+    if not scorer.model_ready:
+        return {"precision": precision, "error": f"model not loaded ({scorer.model_status})"}
+    rss_after = _rss_mb()
+
+    # Bypass the cache and batcher: time one forward pass per description
+    scorer._encode([corpus[0]])
+    latencies = []
+    embeddings = []
+    for text in corpus:
+        start = time.perf_counter()
+        embeddings.append(scorer._encode([text])[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    similarities = (np.vstack(embeddings) @ scorer.reference_embeddings.T).max(axis=1)
+    return {
+        "precision": precision,
+        "rss_mb": rss_after,
+        "model_rss_mb": rss_after - rss_before if rss_after is not None and rss_before is not None else None,
+        "latency_ms_mean": float(np.mean(latencies)),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "similarities": similarities.tolist(),
+        "points": [float(scorer._semantic_points(s)) for s in similarities],
+    }
+
+
+def main():
+    corpus = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"📄 Corpus: {len(corpus)} descriptions")
+
+    ctx = multiprocessing.get_context('spawn')
+    results = {}
+    for precision in ('fp32', 'int8'):
+        with ctx.Pool(1) as pool:
+            results[precision] = pool.apply(measure, (precision, corpus))
+        if 'error' in results[precision]:
+            print(f"❌ {precision}: {results[precision]['error']}")
+            return
+
+    print(f"\n{'mode':<6} {'mean ms':>9} {'p95 ms':>9} {'RSS MB':>9} {'model MB':>9}")
+    for precision, r in results.items():
+        rss = f"{r['rss_mb']:.0f}" if r['rss_mb'] is not None else 'n/a'
+        model_rss = f"{r['model_rss_mb']:.0f}" if r['model_rss_mb'] is not None else 'n/a'
+        print(f"{precision:<6} {r['latency_ms_mean']:>9.2f} {r['latency_ms_p95']:>9.2f} {rss:>9} {model_rss:>9}")
+
+    sim_drift = np.abs(np.array(results['int8']['similarities']) - np.array(results['fp32']['similarities']))
+    point_drift = np.abs(np.array(results['int8']['points']) - np.array(results['fp32']['points']))
+    print(f"\nSimilarity drift:           mean {sim_drift.mean():.4f}  max {sim_drift.max():.4f}")
+    print(f"Authenticity points drift:  mean {point_drift.mean():.4f}  max {point_drift.max():.4f}")
+    print(f"Speedup: {results['fp32']['latency_ms_mean'] / results['int8']['latency_ms_mean']:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
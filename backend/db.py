@@ -0,0 +1,196 @@
+import os
+import queue
+import sqlite3
+import threading
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tunables (env overrides)
+BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 16384))
+MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 256))
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 16))
+POOL_TIMEOUT_S = float(os.environ.get('DB_POOL_TIMEOUT_S', 10))
+
+
+class PooledConnection:
+    """
+    Handle on a connection checked out of the pool.
+
+    Behaves like a sqlite3.Connection for execute/commit/rollback; close()
+    only drops this handle's reference. When the last handle a thread holds
+    is closed, any transaction left open is rolled back and the connection
+    goes back to the pool. A handle that is garbage collected unclosed
+    (e.g. dropped by an exception) is closed then, so it can't drain the pool.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._conn)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived SQLite connections shared by all threads (and
+    reset per process, so forked workers never share a handle), opened with
+    WAL journaling and tuned pragmas.
+
+    A thread checks a connection out for as long as it holds any handle;
+    connect() on a thread that already holds one returns another handle on
+    the same connection, so nested lookups see the caller's transaction
+    instead of waiting on its write lock. Connections are only ever used by
+    the thread that checked them out, which is what makes
+    check_same_thread=False safe. Werkzeug's threaded server starts a
+    thread per request, so connections have to outlive threads to be reused.
+
+    At most DB_POOL_SIZE connections are open; a checkout waits up to
+    DB_POOL_TIMEOUT_S for one to come back, then raises
+    sqlite3.OperationalError.
+
+    WAL lets readers run while a writer commits; synchronous=NORMAL is safe
+    under WAL (a power loss can drop the last commits, never corrupt the
+    file). Repeated SQL strings hit sqlite3's per-connection statement
+    cache, which survives across requests because connections do.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, timeout=POOL_TIMEOUT_S):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._pid = os.getpid()
+        self._journal_checked = False
+        self._lock = threading.Lock()
+        self._reset()
+
+    def connect(self):
+        """Return a handle on this thread's connection, checking one out if needed (close() it when done)"""
+        self._check_pid()
+        thread = threading.get_ident()
+        with self._lock:
+            held = self._owners.get(thread)
+            if held is not None:
+                held[1] += 1
+                return PooledConnection(self, held[0])
+        conn = self._checkout()
+        with self._lock:
+            self._owners[thread] = [conn, 1]
+            self.checkouts += 1
+        return PooledConnection(self, conn)
+
+    def close_all(self):
+        """Close the idle connections (e.g. at worker shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+            with self._lock:
+                self.opened -= 1
+
+    def info(self):
+        with self._lock:
+            return {"size": self.size, "open": self.opened, "in_use": len(self._owners),
+                    "checkouts": self.checkouts}
+
+    def _reset(self):
+        self._idle = queue.LifoQueue()   # most recently used first: its pages are warm
+        self._owners = {}                # thread ident -> [connection, handles]
+        self.opened = 0
+        self.checkouts = 0
+
+    def _check_pid(self):
+        if os.getpid() != self._pid:
+            # Forked worker: never touch the parent's connections
+            with self._lock:
+                self._reset()
+                self._pid = os.getpid()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self.opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection free after {self.timeout}s ({self.size} in use)")
+
+    def _release(self, conn):
+        self._check_pid()
+        thread = threading.get_ident()
+        with self._lock:
+            held = self._owners.get(thread)
+            if held is None or held[0] is not conn:
+                # Closed from another thread (or after a fork): find the holder
+                thread = next((t for t, h in self._owners.items() if h[0] is conn), None)
+                if thread is None:
+                    return
+                held = self._owners[thread]
+            held[1] -= 1
+            if held[1] > 0:
+                return
+            del self._owners[thread]
+        if conn.in_transaction:
+            logger.warning("Rolling back a transaction left open on a pooled connection")
+            conn.rollback()
+        self._idle.put(conn)
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000.0,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA cache_size = {-CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        self._ensure_wal(conn)
+        return conn
+
+    def _ensure_wal(self, conn):
+        # journal_mode=WAL is persistent in the database file; set it once
+        with self._lock:
+            if self._journal_checked:
+                return
+            mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"Could not enable WAL on {self.db_path} (journal_mode={mode})")
+            self._journal_checked = True
@@ -1,56 +1,97 @@
-import smtplib
+import os
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from smtp_pool import SMTPPool
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Digest section (title, heading color, background) per notification kind
+DIGEST_SECTIONS = {
+    'approval': ("✅ Approved", "#10b981", "#f0fdf4"),
+    'pending': ("⏳ Pending Review", "#f59e0b", "#fffbeb"),
+    'waitlisted': ("🕒 Waitlisted", "#8b5cf6", "#f5f3ff"),
+    'rejection': ("⚠️ Not Approved", "#ef4444", "#fef2f2"),
+    'modification': ("✏️ Modified", "#3b82f6", "#eff6ff"),
+    'cancellation': ("🚫 Cancelled", "#64748b", "#f8fafc"),
+}
+
 class EmailService:
     def __init__(self):
         """Initialize email service with SMTP configuration"""
         # For production, use environment variables
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
-        self.sender_email = "lab.reservation@vnrvjiet.edu"  # Replace with actual email
-        self.sender_password = "your_app_password"  # Replace with actual app password
+        self.smtp_server = os.environ.get('SMTP_SERVER', "smtp.gmail.com")
+        self.smtp_port = int(os.environ.get('SMTP_PORT', 587))
+        self.sender_email = os.environ.get('SMTP_SENDER', "lab.reservation@vnrvjiet.edu")  # Replace with actual email
+        self.sender_password = os.environ.get('SMTP_PASSWORD', "your_app_password")  # Replace with actual app password
+        self.use_starttls = os.environ.get('SMTP_STARTTLS', '1') != '0'  # 0 for a local SMTP stand-in
+        self.batch_concurrency = int(os.environ.get('SMTP_BATCH_CONCURRENCY', 4))
+        
+        # Long-lived authenticated sessions, reused across messages
+        self.smtp_pool = SMTPPool(self.smtp_server, self.smtp_port, self.sender_email,
+                                  self.sender_password, self.use_starttls)
         
         # For development/testing, we'll just log emails
-        self.testing_mode = True
+        self.testing_mode = os.environ.get('EMAIL_TESTING_MODE', '1') != '0'
         
     def send_email(self, recipient, subject, body_html):
         """Send email (or log it in testing mode)"""
+        return self.send_batch([(recipient, subject, body_html)])[0]
+    
+    def send_batch(self, messages, concurrency=None):
+        """
+        Send (recipient, subject, html) messages over pooled SMTP sessions,
+        at most `concurrency` at once, each worker pushing its share over one
+        session. Returns one bool per message.
+        """
+        if not messages:
+            return []
         if self.testing_mode:
-            logger.info(f"\n{'='*60}\nEMAIL NOTIFICATION\n{'='*60}")
-            logger.info(f"To: {recipient}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"Body:\n{body_html}")
-            logger.info(f"{'='*60}\n")
-            return True
+            for recipient, subject, body_html in messages:
+                logger.info(f"\n{'='*60}\nEMAIL NOTIFICATION\n{'='*60}")
+                logger.info(f"To: {recipient}")
+                logger.info(f"Subject: {subject}")
+                logger.info(f"Body:\n{body_html}")
+                logger.info(f"{'='*60}\n")
+            return [True] * len(messages)
         
-        try:
-            message = MIMEMultipart("alternative")
-            message["From"] = self.sender_email
-            message["To"] = recipient
-            message["Subject"] = subject
-            
-            html_part = MIMEText(body_html, "html")
-            message.attach(html_part)
-            
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(message)
-            
-            logger.info(f"Email sent successfully to {recipient}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {recipient}: {e}")
-            return False
+        mime_messages = [self.build_message(*message) for message in messages]
+        workers = max(1, min(concurrency or self.batch_concurrency, self.smtp_pool.size, len(mime_messages)))
+        chunk = -(-len(mime_messages) // workers)
+        chunks = [mime_messages[i:i + chunk] for i in range(0, len(mime_messages), chunk)]
+        if len(chunks) == 1:
+            errors = self.smtp_pool.send_many(chunks[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(chunks), thread_name_prefix='smtp') as executor:
+                errors = [error for part in executor.map(self.smtp_pool.send_many, chunks) for error in part]
+        
+        results = []
+        for (recipient, _, _), error in zip(messages, errors):
+            if error is None:
+                logger.info(f"Email sent successfully to {recipient}")
+            else:
+                logger.error(f"Failed to send email to {recipient}: {error}")
+            results.append(error is None)
+        return results
     
-    def send_approval_email(self, user_email, lab_number, date, start_time, end_time, reservation_id):
-        """Send reservation approval confirmation"""
+    def build_message(self, recipient, subject, body_html):
+        message = MIMEMultipart("alternative")
+        message["From"] = self.sender_email
+        message["To"] = recipient
+        message["Subject"] = subject
+        
+        html_part = MIMEText(body_html, "html")
+        message.attach(html_part)
+        return message
+    
+    def message(self, kind, user_email, **payload):
+        """Build a notification by kind ('approval', 'pending', ...) as (recipient, subject, html)"""
+        return getattr(self, f"{kind}_message")(user_email, **payload)
+    
+    def approval_message(self, user_email, lab_number, date, start_time, end_time, reservation_id):
+        """Build the approval confirmation as (recipient, subject, html)"""
         subject = f"✅ Lab Reservation Approved - {lab_number}"
         
         body = f"""
@@ -91,13 +132,55 @@ class EmailService:
         </html>
         """
         
-        return self.send_email(user_email, subject, body)
+        return user_email, subject, body
     
-    def send_pending_email(self, user_email, lab_number, date, start_time, end_time, alternatives):
-        """Send notification for pending reservation with alternatives"""
+    def pending_message(self, user_email, lab_number, date, start_time, end_time, alternatives):
+        """Build the pending notice with alternatives as (recipient, subject, html)"""
         subject = f"⏳ Lab Reservation Pending - {lab_number}"
         
-        # Build alternatives HTML
+        alt_labs_html, alt_times_html = self._alternatives_html(alternatives)
+        
+        body = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; padding: 20px; background-color: #f4f4f4;">
+            <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                <h2 style="color: #f59e0b; text-align: center;">⏳ Reservation Pending Review</h2>
+                
+                <p style="font-size: 16px;">Dear User,</p>
+                
+                <p style="font-size: 16px;">
+                    Your lab reservation request is currently <strong>pending</strong> administrative approval.
+                </p>
+                
+                <div style="background-color: #fffbeb; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p style="margin: 5px 0;"><strong>Requested Lab:</strong> {lab_number}</p>
+                    <p style="margin: 5px 0;"><strong>Date:</strong> {date}</p>
+                    <p style="margin: 5px 0;"><strong>Time:</strong> {start_time} - {end_time}</p>
+                </div>
+                
+                {alt_labs_html}
+                {alt_times_html}
+                
+                <p style="font-size: 14px; color: #666; margin-top: 20px;">
+                    You will receive a confirmation email once your reservation is processed.
+                </p>
+                
+                <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+                
+                <p style="font-size: 12px; color: #999; text-align: center;">
+                    VNRVJIET Lab Reservation System<br>
+                    This is an automated message. Please do not reply.
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        return user_email, subject, body
+    
+    @staticmethod
+    def _alternatives_html(alternatives):
+        """HTML lists of alternative labs and time slots"""
         alt_labs_html = ""
         if alternatives.get('alternative_labs'):
             alt_labs_html = "<h4 style='color: #3b82f6;'>Alternative Labs Available:</h4><ul>"
@@ -111,20 +194,27 @@ class EmailService:
             for alt in alternatives['alternative_times']:
                 alt_times_html += f"<li>{alt['start_time']} - {alt['end_time']} ({alt['session']})</li>"
             alt_times_html += "</ul>"
+        return alt_labs_html, alt_times_html
+    
+    def waitlisted_message(self, user_email, lab_number, date, start_time, end_time, alternatives):
+        """Build the waitlist notice with alternatives as (recipient, subject, html)"""
+        subject = f"🕒 Lab Reservation Waitlisted - {lab_number}"
+        
+        alt_labs_html, alt_times_html = self._alternatives_html(alternatives)
         
         body = f"""
         <html>
         <body style="font-family: Arial, sans-serif; padding: 20px; background-color: #f4f4f4;">
             <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                <h2 style="color: #f59e0b; text-align: center;">⏳ Reservation Pending Review</h2>
+                <h2 style="color: #8b5cf6; text-align: center;">🕒 Reservation Waitlisted</h2>
                 
                 <p style="font-size: 16px;">Dear User,</p>
                 
                 <p style="font-size: 16px;">
-                    Your lab reservation request is currently <strong>pending</strong> administrative approval.
+                    The requested time overlaps an existing booking, so your request has been placed on the <strong>waitlist</strong>.
                 </p>
                 
-                <div style="background-color: #fffbeb; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <div style="background-color: #f5f3ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
                     <p style="margin: 5px 0;"><strong>Requested Lab:</strong> {lab_number}</p>
                     <p style="margin: 5px 0;"><strong>Date:</strong> {date}</p>
                     <p style="margin: 5px 0;"><strong>Time:</strong> {start_time} - {end_time}</p>
@@ -134,7 +224,7 @@ class EmailService:
                 {alt_times_html}
                 
                 <p style="font-size: 14px; color: #666; margin-top: 20px;">
-                    You will receive a confirmation email once your reservation is processed.
+                    If the slot frees up, waitlisted requests are promoted in priority order and you will be notified by email.
                 </p>
                 
                 <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
@@ -148,10 +238,10 @@ class EmailService:
         </html>
         """
         
-        return self.send_email(user_email, subject, body)
+        return user_email, subject, body
     
-    def send_rejection_email(self, user_email, lab_number, date, start_time, end_time, reason):
-        """Send rejection notification"""
+    def rejection_message(self, user_email, lab_number, date, start_time, end_time, reason):
+        """Build the rejection notice as (recipient, subject, html)"""
         subject = f"❌ Lab Reservation Update - {lab_number}"
         
         body = f"""
@@ -187,10 +277,10 @@ class EmailService:
         </html>
         """
         
-        return self.send_email(user_email, subject, body)
+        return user_email, subject, body
     
-    def send_modification_email(self, user_email, lab_number, updates):
-        """Send notification for reservation modification"""
+    def modification_message(self, user_email, lab_number, updates):
+        """Build the modification notice as (recipient, subject, html)"""
         subject = f"✏️ Lab Reservation Modified - {lab_number}"
         
         updates_html = "<ul>"
@@ -229,10 +319,10 @@ class EmailService:
         </html>
         """
         
-        return self.send_email(user_email, subject, body)
+        return user_email, subject, body
     
-    def send_cancellation_email(self, user_email, lab_number, date, start_time, end_time):
-        """Send cancellation confirmation"""
+    def cancellation_message(self, user_email, lab_number, date, start_time, end_time):
+        """Build the cancellation confirmation as (recipient, subject, html)"""
         subject = f"🚫 Lab Reservation Cancelled - {lab_number}"
         
         body = f"""
@@ -268,5 +358,82 @@ class EmailService:
         </html>
         """
         
-        return self.send_email(user_email, subject, body)
-
+        return user_email, subject, body
+    
+    def digest_message(self, user_email, notifications):
+        """Build one message summarizing several (kind, payload) notifications as (recipient, subject, html)"""
+        subject = f"📋 Lab Reservation Updates ({len(notifications)})"
+        
+        sections_html = ""
+        for kind, payload in notifications:
+            title, color, background = DIGEST_SECTIONS[kind]
+            details = f"<p style='margin: 5px 0;'><strong>Lab:</strong> {payload['lab_number']}</p>"
+            if 'date' in payload:
+                details += f"<p style='margin: 5px 0;'><strong>Date:</strong> {payload['date']}</p>"
+                details += f"<p style='margin: 5px 0;'><strong>Time:</strong> {payload['start_time']} - {payload['end_time']}</p>"
+            if payload.get('reservation_id'):
+                details += f"<p style='margin: 5px 0;'><strong>Reservation ID:</strong> #{payload['reservation_id']}</p>"
+            if payload.get('reason'):
+                details += f"<p style='margin: 5px 0;'><strong>Reason:</strong> {payload['reason']}</p>"
+            for key, value in payload.get('updates', {}).items():
+                details += f"<p style='margin: 5px 0;'><strong>{key.replace('_', ' ').title()}:</strong> {value}</p>"
+            alt_labs = (payload.get('alternatives') or {}).get('alternative_labs') or []
+            if alt_labs:
+                details += "<p style='margin: 5px 0;'><strong>Alternative Labs:</strong> " + \
+                    ", ".join(alt['lab_number'] for alt in alt_labs[:3]) + "</p>"
+            
+            sections_html += f"""
+                <div style="background-color: {background}; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <h3 style="color: {color}; margin-top: 0;">{title}</h3>
+                    {details}
+                </div>"""
+        
+        body = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; padding: 20px; background-color: #f4f4f4;">
+            <div style="max-width: 600px; margin: 0 auto; background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+                <h2 style="color: #3b82f6; text-align: center;">📋 Reservation Updates</h2>
+                
+                <p style="font-size: 16px;">Dear User,</p>
+                
+                <p style="font-size: 16px;">
+                    Here is the latest status of your lab reservations:
+                </p>
+                {sections_html}
+                
+                <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+                
+                <p style="font-size: 12px; color: #999; text-align: center;">
+                    VNRVJIET Lab Reservation System<br>
+                    This is an automated message. Please do not reply.
+                </p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        return user_email, subject, body
+    
+    def send_approval_email(self, user_email, lab_number, date, start_time, end_time, reservation_id):
+        """Send reservation approval confirmation"""
+        return self.send_email(*self.approval_message(user_email, lab_number, date, start_time, end_time, reservation_id))
+    
+    def send_pending_email(self, user_email, lab_number, date, start_time, end_time, alternatives):
+        """Send notification for pending reservation with alternatives"""
+        return self.send_email(*self.pending_message(user_email, lab_number, date, start_time, end_time, alternatives))
+    
+    def send_waitlisted_email(self, user_email, lab_number, date, start_time, end_time, alternatives):
+        """Send notification for waitlisted reservation with alternatives"""
+        return self.send_email(*self.waitlisted_message(user_email, lab_number, date, start_time, end_time, alternatives))
+    
+    def send_rejection_email(self, user_email, lab_number, date, start_time, end_time, reason):
+        """Send rejection notification"""
+        return self.send_email(*self.rejection_message(user_email, lab_number, date, start_time, end_time, reason))
+    
+    def send_modification_email(self, user_email, lab_number, updates):
+        """Send notification for reservation modification"""
+        return self.send_email(*self.modification_message(user_email, lab_number, updates))
+    
+    def send_cancellation_email(self, user_email, lab_number, date, start_time, end_time):
+        """Send cancellation confirmation"""
+        return self.send_email(*self.cancellation_message(user_email, lab_number, date, start_time, end_time))
@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching around an encode function.
+
+    Concurrent callers submit texts; a single worker thread collects them
+    for up to max_wait_ms or until max_batch_size texts are waiting, runs one
+    encode_fn(texts) call (one padded forward pass) and resolves each
+    caller's future with its row of the result.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=16, max_wait_ms=2):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, text):
+        """Queue one text; returns a Future resolving to its embedding vector"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, texts, timeout=None):
+        """Blocking helper: embed a list of texts through the shared queue"""
+        futures = [self.submit(text) for text in texts]
+        return np.vstack([future.result(timeout=timeout) for future in futures])
+
+    def info(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize()
+        }
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Identical texts in the same window share one row of the forward pass
+            positions = {}
+            for index, (text, _) in enumerate(batch):
+                positions.setdefault(text, []).append(index)
+
+            try:
+                vectors = self.encode_fn(list(positions))
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for vector, indices in zip(vectors, positions.values()):
+                for index in indices:
+                    batch[index][1].set_result(vector)
+
+            self.batches += 1
+            self.items += len(batch)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form used for cache keys"""
+    return ' '.join((text or '').lower().split())
+
+
+def text_key(text):
+    """Stable cache key for a description (hash of its normalized text)"""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def cache_namespace(model_dir, precision):
+    """
+    Name of the on-disk subdirectory for one model and precision, e.g.
+    'fp32-3f2a9c1d0b7e': vectors from another model or from the int8
+    quantized one must never be served for this one
+    """
+    source = os.path.abspath(model_dir) if os.path.isdir(model_dir) else model_dir
+    return f"{precision}-{hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]}"
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU of description embeddings keyed by text_key(), with an
+    optional on-disk store (one .npy file per key) behind it. The store
+    lives in disk_dir/namespace, so one directory can serve several models.
+
+    Thread-safe; hit/miss counters are exposed through info().
+    """
+
+    def __init__(self, max_size=2048, disk_dir=None, namespace=None):
+        self.max_size = max_size
+        self.namespace = namespace
+        self.disk_dir = os.path.join(disk_dir, namespace) if disk_dir and namespace else disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """Return the cached vector or None (counts a hit or a miss)"""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self._load_from_disk(key)
+        with self._lock:
+            if vector is not None:
+                self.disk_hits += 1
+                self._remember(key, vector)
+            else:
+                self.misses += 1
+        return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._remember(key, vector)
+        if self.disk_dir:
+            try:
+                np.save(self._disk_path(key), vector)
+            except OSError as e:
+                logger.warning(f"Could not persist embedding {key}: {e}")
+
+    def info(self):
+        """Counters for monitoring, e.g. from /api/health"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0
+            }
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def _load_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cached embedding {path}: {e}")
+            return None
@@ -0,0 +1,104 @@
+"""
+Normalized lab equipment.
+
+labs.equipment stays the free-text display list ("Computers, Projector");
+migration 6 normalizes it into an `equipment` vocabulary (one row per
+distinct item, matched case- and whitespace-insensitively) and a
+`lab_equipment` link table. Whoever changes labs.equipment calls
+normalize_lab_equipment() in the same transaction.
+
+In memory, equipment id i is bit i - 1 of a per-lab bitmask stored as
+uint64 words (OccupancyGrid.equipment_bits), so "labs having all of
+{X, Y}" is a bitwise AND and compare over one array.
+"""
+import threading
+import logging
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize(name):
+    """'  Signal  Generators' -> 'signal generators'"""
+    return ' '.join(str(name).lower().split())
+
+
+def parse_equipment(text):
+    """'Computers, Projector' -> ['Computers', 'Projector'] (empty items dropped)"""
+    return [item.strip() for item in (text or '').split(',') if item.strip()]
+
+
+def normalize_lab_equipment(conn):
+    """Add missing vocabulary items and rebuild lab_equipment from labs.equipment"""
+    conn.execute('DELETE FROM lab_equipment')
+    for lab_id, text in conn.execute('SELECT id, equipment FROM labs').fetchall():
+        for label in parse_equipment(text):
+            # Not INSERT OR IGNORE: ids are bit positions, so don't burn any
+            conn.execute('''INSERT INTO equipment (name, label) SELECT ?, ?
+                            WHERE NOT EXISTS (SELECT 1 FROM equipment WHERE name = ?)''',
+                         (normalize(label), label, normalize(label)))
+            conn.execute(
+                '''INSERT OR IGNORE INTO lab_equipment (lab_id, equipment_id)
+                   SELECT ?, id FROM equipment WHERE name = ?''',
+                (lab_id, normalize(label))
+            )
+
+
+def bitmask(equipment_ids, words):
+    """uint64 words with bit (id - 1) set for each id; None if an id needs more than `words` words"""
+    mask = np.zeros(words, dtype=np.uint64)
+    for equipment_id in equipment_ids:
+        word, bit = divmod(equipment_id - 1, 64)
+        if word >= words:
+            return None
+        mask[word] |= np.uint64(1) << np.uint64(bit)
+    return mask
+
+
+def has_all(bits, required):
+    """Boolean array over the rows of `bits` (labs x words): row has every bit of `required`"""
+    return ((bits & required) == required).all(axis=1)
+
+
+def popcount(bits):
+    """Number of set bits in each row of a uint64 (rows x words) array"""
+    return np.unpackbits(np.ascontiguousarray(bits).view(np.uint8), axis=1).sum(axis=1)
+
+
+class EquipmentVocabulary:
+    """Equipment names and ids, for turning request filters into ids"""
+
+    def __init__(self):
+        self._ids = {}     # normalized name -> id
+        self._items = []   # [{"id", "name", "label", "labs"}]
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        items = [dict(row) for row in conn.execute(
+            '''SELECT e.id, e.name, e.label, COUNT(le.lab_id) AS labs
+               FROM equipment e LEFT JOIN lab_equipment le ON le.equipment_id = e.id
+               GROUP BY e.id ORDER BY e.label''')]
+        with self._lock:
+            self._items = items
+            self._ids = {item['name']: item['id'] for item in items}
+        logger.info(f"Equipment vocabulary loaded: {len(items)} items")
+
+    def items(self):
+        with self._lock:
+            return list(self._items)
+
+    def ids(self, names):
+        """Ids of the given names (any case/spacing); ValueError naming the unknown ones"""
+        with self._lock:
+            ids, unknown = [], []
+            for name in names:
+                equipment_id = self._ids.get(normalize(name))
+                if equipment_id is None:
+                    unknown.append(name)
+                else:
+                    ids.append(equipment_id)
+        if unknown:
+            raise ValueError(f"Unknown equipment: {', '.join(unknown)}")
+        return ids
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import zlib
+
+# Rows pulled from the cursor per fetchmany(); memory stays at one batch
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_rows(conn, clauses, params, columns, after_id=0, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield reservation rows as tuples of `columns`, in id order, starting
+    after `after_id`. Reads the cursor in batches instead of fetchall().
+    """
+    where = ' AND '.join(['id > ?'] + list(clauses))
+    cursor = conn.execute(
+        f"SELECT {', '.join(columns)} FROM reservations WHERE {where} ORDER BY id",
+        [after_id] + list(params)
+    )
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield tuple(row)
+
+
+def ndjson_chunks(rows, columns, batch_size=EXPORT_BATCH_SIZE):
+    """One JSON object per line, emitted in chunks of `batch_size` lines"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_chunks(rows, columns, batch_size=EXPORT_BATCH_SIZE):
+    """Header line, then CSV rows in chunks of `batch_size`"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks, level=6):
+    """Stream-compress text chunks into one gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,105 @@
+import heapq
+import logging
+
+from time_utils import time_to_minutes, minutes_to_time, date_to_day, day_to_date, session_for
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hours in which alternative times are suggested
+WORKING_HOURS = ('09:00', '18:00')
+
+# Suggested windows start on this grid (minutes)
+WINDOW_ALIGNMENT = 15
+
+# Upper bound on the number of days one search may scan (about a semester)
+MAX_HORIZON_DAYS = 180
+
+
+def merged_busy(intervals, day_start, day_end):
+    """Union of (start, end) intervals sorted by start, clipped to [day_start, day_end)"""
+    merged = []
+    for start, end in intervals:
+        start, end = max(start, day_start), min(end, day_end)
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_gaps(intervals, day_start, day_end):
+    """Complement of the busy intervals within working hours, as (start, end) pairs"""
+    gaps = []
+    cursor = day_start
+    for start, end in merged_busy(intervals, day_start, day_end):
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < day_end:
+        gaps.append((cursor, day_end))
+    return gaps
+
+
+def windows_in_gap(gap_start, gap_end, duration):
+    """Back-to-back windows of `duration` minutes fitting in a gap, aligned to WINDOW_ALIGNMENT"""
+    start = -(-gap_start // WINDOW_ALIGNMENT) * WINDOW_ALIGNMENT
+    while start + duration <= gap_end:
+        yield start, start + duration
+        start += duration
+
+
+def _lab_windows(interval_index, lab_number, order, date, duration, day_start, day_end):
+    """Free windows of one lab-day as (start, order, end, lab_number), in start order"""
+    busy = [(b.start, b.end) for b in interval_index.busy_intervals(lab_number, date)]
+    for gap_start, gap_end in free_gaps(busy, day_start, day_end):
+        for start, end in windows_in_gap(gap_start, gap_end, duration):
+            yield start, order, end, lab_number
+
+
+def find_free_windows(interval_index, lab_numbers, start_date, duration, k=3, days=1,
+                      working_hours=WORKING_HOURS, exclude=None):
+    """
+    Earliest `k` free windows of `duration` minutes for any of `lab_numbers`,
+    scanning `days` consecutive days from `start_date` within working hours.
+
+    Each day's labs are swept together: their free gaps are cut into windows
+    and merged in (start time, lab order) order, and the scan stops as soon
+    as k windows are found, so the cost is bounded by the first days that
+    have room rather than by the horizon. `exclude` is an optional
+    (lab_number, date, start, end) window to leave out, e.g. the slot that
+    was just requested.
+
+    Returns dicts with lab_number, date, start_time, end_time and session.
+    """
+    day_start, day_end = (time_to_minutes(t) for t in working_hours)
+    first_day = date_to_day(start_date)
+    days = max(1, min(int(days), MAX_HORIZON_DAYS))
+    duration = int(duration)
+    if duration <= 0 or k <= 0:
+        return []
+
+    results = []
+    for day in range(first_day, first_day + days):
+        date = day_to_date(day)
+        per_lab = [
+            _lab_windows(interval_index, lab_number, order, date, duration, day_start, day_end)
+            for order, lab_number in enumerate(lab_numbers)
+        ]
+
+        for start, _, end, lab_number in heapq.merge(*per_lab):
+            if exclude == (lab_number, date, start, end):
+                continue
+            results.append({
+                "lab_number": lab_number,
+                "date": date,
+                "start_time": minutes_to_time(start),
+                "end_time": minutes_to_time(end),
+                "session": session_for(start)
+            })
+            if len(results) >= k:
+                return results
+
+    return results
@@ -1,6 +1,7 @@
 import sqlite3
 from datetime import datetime, timedelta
 import random
+from migrations import migrate
 
 DB_PATH = 'lab_occupancy.db'
 
@@ -13,6 +14,13 @@ def init_database():
     cursor.execute('DROP TABLE IF EXISTS labs')
     cursor.execute('DROP TABLE IF EXISTS timetables')
     cursor.execute('DROP TABLE IF EXISTS reservations')
+    cursor.execute('DROP TABLE IF EXISTS user_stats')
+    cursor.execute('DROP TABLE IF EXISTS email_outbox')
+    cursor.execute('DROP TABLE IF EXISTS lab_equipment')
+    cursor.execute('DROP TABLE IF EXISTS equipment')
+    
+    # Back to the baseline schema; migrations bring it up to date after seeding
+    cursor.execute('PRAGMA user_version = 0')
     
     # Create labs table
     cursor.execute('''
@@ -179,6 +187,10 @@ def init_database():
     print(f"✅ Inserted {len(reservations_data)} reservations")
     
     conn.commit()
+    
+    version = migrate(conn)
+    print(f"✅ Applied migrations (schema version {version})")
+    
     conn.close()
     
     print("\n🎉 Database initialized successfully!")
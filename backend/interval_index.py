@@ -0,0 +1,336 @@
+import random
+import threading
+from collections import namedtuple
+import logging
+
+from time_utils import time_to_minutes, session_window, date_to_day
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reservation statuses that occupy a slot
+ACTIVE_STATUSES = ('approved', 'pending')
+
+# One busy interval [start, end) in minutes since midnight.
+# kind is 'reservation' or 'class'; details is the source row as a dict.
+Busy = namedtuple('Busy', ['start', 'end', 'kind', 'ref_id', 'details'])
+
+
+class _Node:
+    __slots__ = ('busy', 'key', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, busy, key):
+        self.busy = busy
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = busy.end
+
+
+class _Bucket:
+    """
+    Busy intervals of one (lab, date) in a treap ordered by start, each node
+    holding the largest end in its subtree. Insert, remove and "any overlap?"
+    take O(log n) expected; listing overlaps adds O(1) per hit.
+    """
+
+    __slots__ = ('root', 'keys', 'inserted')
+
+    def __init__(self):
+        self.root = None
+        self.keys = {}  # (kind, ref_id) -> node key
+        self.inserted = 0
+
+    @property
+    def entries(self):
+        """All intervals in start order (equal starts in insertion order)"""
+        result = []
+        self._collect(self.root, None, None, result)
+        return result
+
+    def insert(self, busy):
+        # The insertion counter keeps equal starts in arrival order
+        self.inserted += 1
+        key = (busy.start, self.inserted)
+        self.keys[(busy.kind, busy.ref_id)] = key
+        self.root = _insert(self.root, _Node(busy, key))
+
+    def remove(self, kind, ref_id):
+        key = self.keys.pop((kind, ref_id), None)
+        if key is None:
+            return False
+        self.root = _delete(self.root, key)
+        return True
+
+    def any_overlap(self, start, end):
+        node = self.root
+        while node is not None:
+            if node.busy.start < end and node.busy.end > start:
+                return True
+            # If the left subtree reaches past `start` but has no overlap, every
+            # interval there (and so everything to the right) starts at or after `end`
+            if node.left is not None and node.left.max_end > start:
+                node = node.left
+            elif node.busy.start >= end:
+                return False
+            else:
+                node = node.right
+        return False
+
+    def overlaps(self, start, end):
+        result = []
+        self._collect(self.root, start, end, result)
+        return result
+
+    def _collect(self, node, start, end, result):
+        # In order, skipping subtrees that end by `start` and everything from `end` on
+        if node is None or (start is not None and node.max_end <= start):
+            return
+        self._collect(node.left, start, end, result)
+        if end is not None and node.busy.start >= end:
+            return
+        if start is None or node.busy.end > start:
+            result.append(node.busy)
+        self._collect(node.right, start, end, result)
+
+
+def _update(node):
+    node.max_end = node.busy.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+    return node
+
+
+def _split(node, key):
+    """(nodes with keys < key, nodes with keys >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+
+def _merge(left, right):
+    """Join two treaps where every key in `left` is below every key in `right`"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.key)
+        return _update(new)
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    return _update(node)
+
+
+def _delete(node, key):
+    if node is None:
+        return None
+    if node.key == key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _delete(node.left, key)
+    else:
+        node.right = _delete(node.right, key)
+    return _update(node)
+
+
+class IntervalIndex:
+    """
+    In-memory busy-interval index per (lab, date) covering active
+    reservations and timetable classes.
+
+    Overlap uses half-open intervals: [s1, e1) and [s2, e2) overlap iff
+    s1 < e2 and s2 < e1, which also catches requests that enclose an
+    existing booking. "Any overlap?" is one root-to-leaf walk of the
+    lab-day's interval treap.
+
+    The index is loaded at startup and kept current by sync_reservation()
+    after every committed write. verify() compares a bucket with SQL and
+    rebuilds it on mismatch (e.g. writes made by another worker process).
+
+    Every change to a date bumps that date's version (load() bumps them
+    all), so results derived from the schedule can be cached against
+    date_versions().
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._reservation_keys = {}  # reservation id -> (lab, date)
+        self._generation = 0
+        self._date_versions = {}
+        self._lock = threading.RLock()
+
+    def load(self, conn):
+        """(Re)build the whole index from the database"""
+        buckets = {}
+        reservation_keys = {}
+
+        for row in conn.execute('SELECT * FROM timetables'):
+            busy = self._class_busy(row)
+            if busy:
+                buckets.setdefault((row['room_number'], row['date']), _Bucket()).insert(busy)
+
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        for row in conn.execute(f'SELECT * FROM reservations WHERE status IN ({placeholders})', ACTIVE_STATUSES):
+            busy = self._reservation_busy(row)
+            if busy:
+                key = (row['lab_number'], row['date'])
+                buckets.setdefault(key, _Bucket()).insert(busy)
+                reservation_keys[row['id']] = key
+
+        with self._lock:
+            self._buckets = buckets
+            self._reservation_keys = reservation_keys
+            self._generation += 1
+
+        logger.info(f"Interval index loaded: {len(buckets)} lab-days, {len(reservation_keys)} active reservations")
+
+    def any_overlap(self, lab_number, date, start, end, kind=None):
+        """True if anything (optionally only `kind`) overlaps [start, end) minutes"""
+        with self._lock:
+            bucket = self._buckets.get((lab_number, date))
+            if bucket is None:
+                return False
+            if kind is None:
+                return bucket.any_overlap(start, end)
+            return any(busy.kind == kind for busy in bucket.overlaps(start, end))
+
+    def overlaps(self, lab_number, date, start, end, kind=None):
+        """Busy entries overlapping [start, end) minutes, in start order"""
+        with self._lock:
+            bucket = self._buckets.get((lab_number, date))
+            if bucket is None:
+                return []
+            return [busy for busy in bucket.overlaps(start, end) if kind is None or busy.kind == kind]
+
+    def date_versions(self, dates):
+        """Token that changes whenever the schedule of any of `dates` changes"""
+        with self._lock:
+            return (self._generation,) + tuple(self._date_versions.get(date, 0) for date in dates)
+
+    def _touch(self, date):
+        self._date_versions[date] = self._date_versions.get(date, 0) + 1
+
+    def busy_intervals(self, lab_number, date):
+        """All busy entries of a lab on a date, sorted by start"""
+        with self._lock:
+            bucket = self._buckets.get((lab_number, date))
+            return list(bucket.entries) if bucket else []
+
+    def sync_reservation(self, conn, reservation_id):
+        """Re-read one reservation after a committed write and update the index"""
+        row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+
+        with self._lock:
+            old_key = self._reservation_keys.pop(reservation_id, None)
+            if old_key and old_key in self._buckets:
+                self._buckets[old_key].remove('reservation', reservation_id)
+                self._touch(old_key[1])
+
+            if row is None or row['status'] not in ACTIVE_STATUSES:
+                return
+
+            busy = self._reservation_busy(row)
+            if busy:
+                key = (row['lab_number'], row['date'])
+                self._buckets.setdefault(key, _Bucket()).insert(busy)
+                self._reservation_keys[reservation_id] = key
+                self._touch(row['date'])
+
+    def verify(self, conn, lab_number, date):
+        """
+        Check a bucket's reservations against SQL (count and sums of ids,
+        start and end minutes, so a time moved by another process is caught
+        too); rebuild the bucket from SQL if they differ. Returns True if it matched.
+        """
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        expected = tuple(conn.execute(
+            f'''SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(SUM(start_min), 0), COALESCE(SUM(end_min), 0)
+                FROM reservations
+                WHERE lab_number = ? AND day_num = ? AND status IN ({placeholders})''',
+            (lab_number, date_to_day(date)) + ACTIVE_STATUSES
+        ).fetchone())
+
+        with self._lock:
+            bucket = self._buckets.get((lab_number, date))
+            entries = [b for b in bucket.entries if b.kind == 'reservation'] if bucket else []
+            actual = (len(entries), sum(b.ref_id for b in entries),
+                      sum(b.start for b in entries), sum(b.end for b in entries))
+            if actual == expected:
+                return True
+
+        logger.warning(f"Interval index out of sync for {lab_number} on {date}; rebuilding from SQL")
+        self.rebuild_bucket(conn, lab_number, date)
+        return False
+
+    def rebuild_bucket(self, conn, lab_number, date):
+        """Reload one (lab, date) from SQL"""
+        bucket = _Bucket()
+        reservation_ids = []
+        day = date_to_day(date)
+
+        for row in conn.execute(
+            'SELECT * FROM timetables WHERE room_number = ? AND day_num = ?', (lab_number, day)
+        ):
+            busy = self._class_busy(row)
+            if busy:
+                bucket.insert(busy)
+
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        for row in conn.execute(
+            f'SELECT * FROM reservations WHERE lab_number = ? AND day_num = ? AND status IN ({placeholders})',
+            (lab_number, day) + ACTIVE_STATUSES
+        ):
+            busy = self._reservation_busy(row)
+            if busy:
+                bucket.insert(busy)
+                reservation_ids.append(row['id'])
+
+        with self._lock:
+            for reservation_id, key in list(self._reservation_keys.items()):
+                if key == (lab_number, date):
+                    del self._reservation_keys[reservation_id]
+            for reservation_id in reservation_ids:
+                self._reservation_keys[reservation_id] = (lab_number, date)
+            self._buckets[(lab_number, date)] = bucket
+            self._touch(date)
+
+    @staticmethod
+    def _reservation_busy(row):
+        try:
+            start, end = time_to_minutes(row['start_time']), time_to_minutes(row['end_time'])
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping reservation {row['id']} with unparsable times")
+            return None
+        return Busy(start, end, 'reservation', row['id'], dict(row))
+
+    @staticmethod
+    def _class_busy(row):
+        # Classes without explicit times occupy their whole session
+        try:
+            start, end = time_to_minutes(row['start_time']), time_to_minutes(row['end_time'])
+        except (TypeError, ValueError):
+            window = session_window(row['session'])
+            if window is None:
+                return None
+            start, end = window
+        return Busy(start, end, 'class', row['id'], dict(row))
@@ -0,0 +1,88 @@
+import threading
+import logging
+
+import numpy as np
+
+from equipment import bitmask, popcount
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Points added to the capacity score (0-50) for a full equipment match and
+# for being on the requested lab's floor; capacity fit dominates
+EQUIPMENT_WEIGHT = 10.0
+PROXIMITY_WEIGHT = 5.0
+
+
+class _LabArrays:
+    """Per-lab columns of one labs list, built once per OccupancyGrid load"""
+
+    def __init__(self, labs):
+        self.labs = labs
+        self.rows = {lab['lab_number']: i for i, lab in enumerate(labs)}
+        self.capacities = np.array([lab['capacity'] for lab in labs], dtype=np.float64)
+        self.floors = np.array([lab['floor'] or 0 for lab in labs], dtype=np.float64)
+        _, self.buildings = np.unique([lab['building'] or '' for lab in labs], return_inverse=True)
+
+
+class LabRanker:
+    """
+    Ranks free labs for a request by how well they would serve it:
+
+        capacity points the scorer would give (its Gaussian capacity curve
+        over participants / capacity, 0-50)
+      + EQUIPMENT_WEIGHT x share of the wanted equipment present (the
+        equipment asked for, else the requested lab's)
+      + PROXIMITY_WEIGHT x 1 / (1 + floors apart), in the requested lab's building
+
+    All candidates are scored in one pass over NumPy columns (equipment as
+    the grid's bitmasks) and the top K picked with argpartition, so a query
+    costs no per-lab Python work.
+    """
+
+    def __init__(self, priority_scorer):
+        self.priority_scorer = priority_scorer
+        self._arrays = None
+        self._lock = threading.Lock()
+
+    def rank(self, selection, lab_number, num_participants, k, equipment_ids=()):
+        """
+        Best k of the selected labs (an OccupancyGrid LabSelection), best
+        first, as (lab, fit score, utilization ratio) tuples
+        """
+        labs, bits = selection.labs, selection.equipment_bits
+        arrays = self._columns(labs)
+        candidates = np.flatnonzero(selection.mask)
+        if candidates.size == 0 or k <= 0:
+            return []
+
+        capacities = arrays.capacities[candidates]
+        utilization = num_participants / capacities
+        fit = self.priority_scorer.capacity_scores(num_participants, capacities)
+
+        requested = arrays.rows.get(lab_number)
+        wanted = bitmask(equipment_ids, bits.shape[1]) if equipment_ids else None
+        if wanted is None and requested is not None:
+            wanted = bits[requested]
+        wanted_count = popcount(wanted[None, :])[0] if wanted is not None and wanted.size else 0
+        if wanted_count:
+            fit = fit + EQUIPMENT_WEIGHT * popcount(bits[candidates] & wanted) / wanted_count
+
+        if requested is not None:
+            same_building = arrays.buildings[candidates] == arrays.buildings[requested]
+            floors_apart = np.abs(arrays.floors[candidates] - arrays.floors[requested])
+            fit = fit + PROXIMITY_WEIGHT * np.where(same_building, 1 / (1 + floors_apart), 0.0)
+
+        if candidates.size > k:
+            top = np.argpartition(-fit, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        # Best first; ties keep table order
+        top = top[np.lexsort((candidates[top], -fit[top]))]
+        return [(labs[candidates[i]], float(fit[i]), float(utilization[i])) for i in top]
+
+    def _columns(self, labs):
+        with self._lock:
+            if self._arrays is None or self._arrays.labs is not labs:
+                self._arrays = _LabArrays(labs)
+            return self._arrays
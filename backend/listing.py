@@ -0,0 +1,95 @@
+import base64
+import json
+
+from time_utils import date_to_day
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# total_estimate counts at most this many rows, so it never walks the whole table
+COUNT_ESTIMATE_CAP = 10000
+
+# Stable orderings (every one ends in id so ties can't reorder between pages)
+ADMIN_ORDER = ('day_num', 'start_min', 'id')
+USER_ORDER = ('created_at', 'id')
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, size):
+    """Opaque cursor -> list of `size` sort-key values; ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def reservation_filters(args):
+    """
+    WHERE clauses and params from query args: lab_number, status, purpose,
+    date_from and date_to (inclusive ISO dates). Raises ValueError on bad dates.
+    """
+    clauses, params = [], []
+    for column in ('lab_number', 'status', 'purpose'):
+        if args.get(column):
+            clauses.append(f'{column} = ?')
+            params.append(args[column])
+    if args.get('date_from'):
+        clauses.append('day_num >= ?')
+        params.append(date_to_day(args['date_from']))
+    if args.get('date_to'):
+        clauses.append('day_num <= ?')
+        params.append(date_to_day(args['date_to']))
+    return clauses, params
+
+
+def page_size(args):
+    """Requested page size clamped to [1, MAX_PAGE_SIZE]; ValueError if not a number"""
+    return max(1, min(int(args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+
+
+def fetch_page(conn, clauses, params, order, limit, cursor=None, descending=False):
+    """
+    One page of reservations by keyset: rows strictly after the cursor's
+    sort key, so each page is an index range scan however deep it is.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    clauses, params = list(clauses), list(params)
+    if cursor:
+        key = decode_cursor(cursor, len(order))
+        columns = ', '.join(order)
+        marks = ', '.join('?' for _ in order)
+        clauses.append(f"({columns}) {'<' if descending else '>'} ({marks})")
+        params.extend(key)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    direction = ' DESC' if descending else ''
+    order_by = ', '.join(column + direction for column in order)
+    rows = conn.execute(
+        f'SELECT * FROM reservations {where} ORDER BY {order_by} LIMIT ?',
+        params + [limit + 1]
+    ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][column] for column in order)
+    return rows, next_cursor
+
+
+def count_estimate(conn, clauses, params):
+    """
+    Number of matching rows, counted up to COUNT_ESTIMATE_CAP.
+    Returns (count, exact); exact is False when the cap was hit.
+    """
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    count = conn.execute(
+        f'SELECT COUNT(*) FROM (SELECT 1 FROM reservations {where} LIMIT ?)',
+        list(params) + [COUNT_ESTIMATE_CAP + 1]
+    ).fetchone()[0]
+    return min(count, COUNT_ESTIMATE_CAP), count <= COUNT_ESTIMATE_CAP
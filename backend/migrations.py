@@ -0,0 +1,267 @@
+"""
+Versioned, forward-only schema migrations.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Version 0 is
+the baseline created by init_db.py (labs, timetables, reservations); every
+later change is a numbered step in MIGRATIONS, applied in order, each in
+its own transaction together with the version bump. Steps must never drop
+data: add tables, columns and indexes, and backfill them.
+
+Usage:
+    python migrations.py           # apply pending migrations
+    python migrations.py --check   # also verify hot queries use indexes
+"""
+import sqlite3
+import sys
+import logging
+
+from user_history import UserHistoryStore
+from time_utils import SESSION_WINDOWS, time_to_minutes
+from equipment import normalize_lab_equipment
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = 'lab_occupancy.db'
+
+
+def _create_user_stats(conn):
+    """Per-user booking aggregates for fairness scoring, backfilled from reservations"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_email TEXT PRIMARY KEY,
+            total_bookings INTEGER NOT NULL DEFAULT 0,
+            cancellations INTEGER NOT NULL DEFAULT 0,
+            approvals INTEGER NOT NULL DEFAULT 0,
+            high_participant_bookings INTEGER NOT NULL DEFAULT 0,
+            recent_utilization TEXT NOT NULL DEFAULT '',
+            updated_at TEXT
+        )
+    ''')
+    UserHistoryStore(None).rebuild(conn)
+
+
+def _add_query_indexes(conn):
+    """Indexes for the lookups in app.py and the schedule indexes"""
+    # Slot lookups and per-lab-day rebuilds/verification (covering for COUNT/SUM(id))
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_reservations_slot
+                    ON reservations (lab_number, date, status, start_time, end_time)''')
+    # "My reservations": WHERE user_email = ? ORDER BY created_at DESC
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_reservations_user_created
+                    ON reservations (user_email, created_at)''')
+    # Admin listing, filtered by status or not, ORDER BY date, start_time
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_reservations_status_date
+                    ON reservations (status, date, start_time)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_reservations_date
+                    ON reservations (date, start_time)''')
+    # Timetable probes by room and date (and session)
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_timetables_room_date
+                    ON timetables (room_number, date, session)''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_labs_status ON labs (status, capacity)')
+
+
+def _minutes_sql(column):
+    """SQL expression for 'H:MM' / 'HH:MM' text -> minutes since midnight (NULL stays NULL)"""
+    return (f"(CAST(substr({column}, 1, instr({column}, ':') - 1) AS INTEGER) * 60"
+            f" + CAST(substr({column}, instr({column}, ':') + 1, 2) AS INTEGER))")
+
+
+def _session_minutes_sql(session_column, index):
+    """CASE expression giving a session's start (index 0) or end (index 1) minute"""
+    cases = ' '.join(
+        f"WHEN '{session}' THEN {time_to_minutes(window[index])}" for session, window in SESSION_WINDOWS.items()
+    )
+    return f"(CASE {session_column} {cases} END)"
+
+
+# Epoch-day expression shared by backfills and triggers (days since 1970-01-01)
+_DAY_SQL = "CAST(julianday({}) - 2440587.5 AS INTEGER)"
+
+
+def _add_integer_times(conn):
+    """
+    day_num / start_min / end_min integer columns next to the TEXT date and
+    times, backfilled here and kept in sync by triggers on every insert or
+    update of the text columns. Timetable rows without times take their
+    session window.
+    """
+    reservation_values = f'''
+        day_num = {_DAY_SQL.format('date')},
+        start_min = {_minutes_sql('start_time')},
+        end_min = {_minutes_sql('end_time')}'''
+    timetable_values = f'''
+        day_num = {_DAY_SQL.format('date')},
+        start_min = COALESCE({_minutes_sql('start_time')}, {_session_minutes_sql('session', 0)}),
+        end_min = COALESCE({_minutes_sql('end_time')}, {_session_minutes_sql('session', 1)})'''
+
+    for table, values, watched in (
+        ('reservations', reservation_values, 'date, start_time, end_time'),
+        ('timetables', timetable_values, 'date, session, start_time, end_time'),
+    ):
+        for column in ('day_num', 'start_min', 'end_min'):
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+        conn.execute(f'UPDATE {table} SET {values}')
+        conn.execute(f'''CREATE TRIGGER trg_{table}_times_insert AFTER INSERT ON {table}
+                         BEGIN UPDATE {table} SET {values} WHERE id = NEW.id; END''')
+        conn.execute(f'''CREATE TRIGGER trg_{table}_times_update AFTER UPDATE OF {watched} ON {table}
+                         BEGIN UPDATE {table} SET {values} WHERE id = NEW.id; END''')
+
+    # Integer versions of the slot, listing and timetable indexes
+    for name in ('idx_reservations_slot', 'idx_reservations_status_date',
+                 'idx_reservations_date', 'idx_timetables_room_date'):
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.execute('''CREATE INDEX idx_reservations_slot
+                    ON reservations (lab_number, day_num, status, start_min, end_min)''')
+    conn.execute('CREATE INDEX idx_reservations_status_day ON reservations (status, day_num, start_min)')
+    conn.execute('CREATE INDEX idx_reservations_day ON reservations (day_num, start_min)')
+    conn.execute('CREATE INDEX idx_timetables_room_day ON timetables (room_number, day_num, start_min, end_min)')
+
+
+def _create_email_outbox(conn):
+    """Notifications queued in the same transaction as the change that caused them"""
+    conn.execute('''
+        CREATE TABLE email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            reservation_id INTEGER,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            locked_until REAL,
+            last_error TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_email_outbox_due ON email_outbox (status, next_attempt_at)')
+
+
+def _add_outbox_recipient_index(conn):
+    """Per-recipient lookup used to coalesce notifications into one message"""
+    conn.execute('CREATE INDEX idx_email_outbox_recipient ON email_outbox (recipient, status)')
+
+
+def _create_equipment_vocabulary(conn):
+    """Equipment vocabulary and per-lab links, backfilled from the free-text labs.equipment"""
+    conn.execute('''
+        CREATE TABLE equipment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            label TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE lab_equipment (
+            lab_id INTEGER NOT NULL REFERENCES labs (id),
+            equipment_id INTEGER NOT NULL REFERENCES equipment (id),
+            PRIMARY KEY (lab_id, equipment_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX idx_lab_equipment_equipment ON lab_equipment (equipment_id, lab_id)')
+    normalize_lab_equipment(conn)
+
+
+# (version, description, step); append only, never renumber
+MIGRATIONS = [
+    (1, 'user_stats aggregates table', _create_user_stats),
+    (2, 'indexes for hot queries', _add_query_indexes),
+    (3, 'integer day/minute columns', _add_integer_times),
+    (4, 'email outbox', _create_email_outbox),
+    (5, 'email outbox recipient index', _add_outbox_recipient_index),
+    (6, 'equipment vocabulary', _create_equipment_vocabulary),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Queries that must be answered from an index; (label, sql, params)
+HOT_QUERIES = [
+    ('lab by number', 'SELECT capacity FROM labs WHERE lab_number = ?', ('E401',)),
+    ('active labs', 'SELECT * FROM labs WHERE status = "active"', ()),
+    ('reservation by id', 'SELECT * FROM reservations WHERE id = ?', (1,)),
+    ('user reservations', 'SELECT * FROM reservations WHERE user_email = ? ORDER BY created_at DESC', ('a@b',)),
+    ('admin by status', 'SELECT * FROM reservations WHERE status = ? ORDER BY day_num, start_min', ('pending',)),
+    ('admin all', 'SELECT * FROM reservations ORDER BY day_num, start_min', ()),
+    ('slot verify', '''SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(SUM(start_min), 0),
+                              COALESCE(SUM(end_min), 0) FROM reservations
+                       WHERE lab_number = ? AND day_num = ? AND status IN ('approved', 'pending')''',
+     ('E401', 20089)),
+    ('slot reservations', '''SELECT * FROM reservations
+                             WHERE lab_number = ? AND day_num = ? AND status IN ('approved', 'pending')''',
+     ('E401', 20089)),
+    ('slot overlap', '''SELECT * FROM reservations
+                        WHERE lab_number = ? AND day_num = ? AND status IN ('approved', 'pending')
+                        AND start_min < ? AND end_min > ?''',
+     ('E401', 20089, 720, 600)),
+    ('slot waitlist', '''SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(SUM(start_min), 0),
+                                COALESCE(SUM(end_min), 0) FROM reservations
+                         WHERE lab_number = ? AND day_num = ? AND status = ?''', ('E401', 20089, 'waitlisted')),
+    ('labs with equipment', 'SELECT lab_id FROM lab_equipment WHERE equipment_id = ?', (1,)),
+    ('slot classes', 'SELECT * FROM timetables WHERE room_number = ? AND day_num = ?', ('E401', 20089)),
+    ('admin page', '''SELECT * FROM reservations WHERE (day_num, start_min, id) > (?, ?, ?)
+                      ORDER BY day_num, start_min, id LIMIT ?''', (20089, 600, 1, 51)),
+    ('user page', '''SELECT * FROM reservations WHERE user_email = ? AND (created_at, id) < (?, ?)
+                     ORDER BY created_at DESC, id DESC LIMIT ?''', ('a@b', '2026-01-01', 1, 51)),
+    ('user stats', 'SELECT * FROM user_stats WHERE user_email = ?', ('a@b',)),
+    ('outbox due', '''SELECT * FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ?
+                      ORDER BY next_attempt_at, id LIMIT ?''', (0.0, 50)),
+    ('outbox recipient', "SELECT * FROM email_outbox WHERE recipient = ? AND status = 'pending' ORDER BY id",
+     ('a@b',)),
+    ('outbox recent', 'SELECT 1 FROM email_outbox WHERE recipient = ? AND created_at > ? LIMIT 1', ('a@b', '')),
+]
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration; returns the resulting schema version"""
+    version = current_version(conn)
+    for target, description, step in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute('BEGIN')
+        try:
+            step(conn)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {target} ({description}) failed; schema left at version {version}")
+            raise
+        version = target
+        logger.info(f"Applied migration {target}: {description}")
+    return version
+
+
+def full_scans(conn):
+    """
+    Hot queries whose plan scans a whole table without an index.
+    Returns [(label, plan detail)]; empty means every query is index-backed.
+    ("SCAN ... USING INDEX" for the unfiltered admin listing is an ordered
+    index walk, which is the best that query can do.)
+    """
+    problems = []
+    for label, sql, params in HOT_QUERIES:
+        for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params):
+            detail = row[3]
+            if detail.startswith('SCAN') and 'USING' not in detail:
+                problems.append((label, detail))
+            elif 'USE TEMP B-TREE' in detail:
+                problems.append((label, detail))
+    return problems
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect(DB_PATH)
+    print(f"Schema version {current_version(conn)} -> {migrate(conn)}")
+    if '--check' in sys.argv:
+        problems = full_scans(conn)
+        for label, detail in problems:
+            print(f"❌ {label}: {detail}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
+    conn.close()
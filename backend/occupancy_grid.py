@@ -0,0 +1,256 @@
+import threading
+from collections import namedtuple
+import logging
+
+import numpy as np
+
+from equipment import bitmask, has_all
+from time_utils import time_to_minutes, date_to_day, session_window
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TICK_MINUTES = 15
+TICKS_PER_DAY = 24 * 60 // TICK_MINUTES
+
+# Reservation statuses that occupy a slot (same as the interval index)
+ACTIVE_STATUSES = ('approved', 'pending')
+
+# Labs matching a query: the labs list, their equipment bitmasks (labs x
+# uint64 words, see equipment.py) and a boolean mask over the labs
+LabSelection = namedtuple('LabSelection', 'labs equipment_bits mask')
+
+
+def to_ticks(start, end):
+    """
+    [start, end) minutes -> [first, last) ticks covering it.
+
+    Partial ticks count as whole ones, so the grid is conservative: a slot
+    it reports free is free, but two bookings that meet inside a tick (e.g.
+    10:00-10:10 and 10:10-11:00) look like they overlap.
+    """
+    return start // TICK_MINUTES, -(-end // TICK_MINUTES)
+
+
+class OccupancyGrid:
+    """
+    Campus-wide occupancy counters shaped labs x days x 15-minute ticks.
+
+    Each cell counts the classes and active reservations covering it, so
+    removing one booking is a decrement rather than a rebuild. "Which labs
+    with capacity >= N are free for [start, end) on date D" is one slice,
+    one any() reduction and a capacity mask.
+
+    Days are stored sparsely: each day with any booking has its own
+    labs x ticks array in a dict, created when a write first lands on it,
+    so a far-off date costs one day's counters rather than every day in
+    between. Labs are the active rows of `labs`, with
+    their capacities and equipment bitmasks as arrays alongside, so
+    capacity and equipment filters are masks too.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.labs = []
+        self._lab_rows = {}
+        self.capacities = np.zeros(0, dtype=np.int32)
+        self.equipment_bits = np.zeros((0, 0), dtype=np.uint64)
+        self.days = {}  # day number -> labs x ticks counters
+        self._reservations = {}  # reservation id -> (row, day, first tick, last tick)
+
+    def load(self, conn):
+        """(Re)build the grid from the database"""
+        labs = [dict(row) for row in conn.execute('SELECT * FROM labs WHERE status = "active" ORDER BY id')]
+        lab_rows = {lab['lab_number']: i for i, lab in enumerate(labs)}
+        equipment_bits = self._equipment_bits(conn, labs)
+
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        classes = conn.execute('SELECT room_number, date, session, start_time, end_time FROM timetables').fetchall()
+        reservations = conn.execute(
+            f'SELECT id, lab_number, date, start_time, end_time FROM reservations WHERE status IN ({placeholders})',
+            ACTIVE_STATUSES
+        ).fetchall()
+
+        cells = []
+        for row in classes:
+            cell = self._cell(lab_rows, row['room_number'], row['date'], row['start_time'], row['end_time'], row['session'])
+            if cell:
+                cells.append((None, cell))
+        for row in reservations:
+            cell = self._cell(lab_rows, row['lab_number'], row['date'], row['start_time'], row['end_time'])
+            if cell:
+                cells.append((row['id'], cell))
+
+        days = {}
+        reservation_cells = {}
+        for reservation_id, (row, day, first, last) in cells:
+            if day not in days:
+                days[day] = np.zeros((len(labs), TICKS_PER_DAY), dtype=np.uint16)
+            days[day][row, first:last] += 1
+            if reservation_id is not None:
+                reservation_cells[reservation_id] = (row, day, first, last)
+
+        with self._lock:
+            self.labs = labs
+            self._lab_rows = lab_rows
+            self.capacities = np.array([lab['capacity'] for lab in labs], dtype=np.int32)
+            self.equipment_bits = equipment_bits
+            self.days = days
+            self._reservations = reservation_cells
+
+        logger.info(f"Occupancy grid loaded: {len(labs)} labs x {len(days)} days x {TICKS_PER_DAY} ticks")
+
+    def free_labs(self, date, start, end, min_capacity=0, equipment_ids=()):
+        """
+        Active labs with capacity >= min_capacity, all the given equipment
+        and nothing booked in [start, end) minutes
+        """
+        selection = self.free_mask(date, start, end, min_capacity, equipment_ids)
+        return [selection.labs[i] for i in np.flatnonzero(selection.mask)]
+
+    def matching_labs(self, min_capacity=0, equipment_ids=()):
+        """Active labs with capacity >= min_capacity and all the given equipment, in table order"""
+        selection = self.lab_mask(min_capacity, equipment_ids)
+        return [selection.labs[i] for i in np.flatnonzero(selection.mask)]
+
+    def lab_mask(self, min_capacity=0, equipment_ids=()):
+        """LabSelection of the active labs with capacity >= min_capacity and all the given equipment"""
+        with self._lock:
+            return LabSelection(self.labs, self.equipment_bits, self._static_mask(min_capacity, equipment_ids))
+
+    def free_mask(self, date, start, end, min_capacity=0, equipment_ids=()):
+        """LabSelection of free_labs, for callers that rank the labs as arrays"""
+        first, last = to_ticks(start, end)
+        with self._lock:
+            mask = self._static_mask(min_capacity, equipment_ids)
+            try:
+                counts = self.days.get(date_to_day(date))
+            except (TypeError, ValueError):
+                mask[:] = False
+            else:
+                if counts is not None:
+                    mask &= ~counts[:, first:last].any(axis=1)
+            return LabSelection(self.labs, self.equipment_bits, mask)
+
+    def _static_mask(self, min_capacity, equipment_ids):
+        mask = self.capacities >= min_capacity
+        if equipment_ids:
+            required = bitmask(equipment_ids, self.equipment_bits.shape[1])
+            if required is None:
+                # An item newer than the loaded bitmasks: no loaded lab has it
+                return np.zeros(len(self.labs), dtype=bool)
+            mask &= has_all(self.equipment_bits, required)
+        return mask
+
+    def is_free(self, lab_number, date, start, end):
+        first, last = to_ticks(start, end)
+        try:
+            day = date_to_day(date)
+        except (TypeError, ValueError):
+            return False
+
+        with self._lock:
+            row = self._lab_rows.get(lab_number)
+            if row is None:
+                return False
+            counts = self.days.get(day)
+            return counts is None or not counts[row, first:last].any()
+
+    def sync_reservation(self, conn, reservation_id):
+        """Re-read one reservation after a committed write and update the counters"""
+        row = conn.execute('SELECT * FROM reservations WHERE id = ?', (reservation_id,)).fetchone()
+
+        with self._lock:
+            old = self._reservations.pop(reservation_id, None)
+            if old:
+                self._add(old, -1)
+
+            if row is None or row['status'] not in ACTIVE_STATUSES:
+                return
+
+            cell = self._cell(self._lab_rows, row['lab_number'], row['date'], row['start_time'], row['end_time'])
+            if cell:
+                self._add(cell, 1)
+                self._reservations[reservation_id] = cell
+
+    def rebuild_lab_day(self, conn, lab_number, date):
+        """Reload the counters of one (lab, date) from SQL"""
+        placeholders = ', '.join('?' for _ in ACTIVE_STATUSES)
+        day = date_to_day(date)
+        classes = conn.execute(
+            'SELECT * FROM timetables WHERE room_number = ? AND day_num = ?', (lab_number, day)
+        ).fetchall()
+        reservations = conn.execute(
+            f'SELECT * FROM reservations WHERE lab_number = ? AND day_num = ? AND status IN ({placeholders})',
+            (lab_number, day) + ACTIVE_STATUSES
+        ).fetchall()
+
+        with self._lock:
+            row = self._lab_rows.get(lab_number)
+            if row is None:
+                return
+            self._day(day)[row, :] = 0
+            for reservation_id, cell in list(self._reservations.items()):
+                if cell[0] == row and cell[1] == day:
+                    del self._reservations[reservation_id]
+
+            for entry in classes:
+                cell = self._cell(self._lab_rows, lab_number, date, entry['start_time'], entry['end_time'], entry['session'])
+                if cell:
+                    self._add(cell, 1)
+            for entry in reservations:
+                cell = self._cell(self._lab_rows, lab_number, date, entry['start_time'], entry['end_time'])
+                if cell:
+                    self._add(cell, 1)
+                    self._reservations[entry['id']] = cell
+
+    @staticmethod
+    def _equipment_bits(conn, labs):
+        """labs x words uint64 array with bit (equipment id - 1) set for the equipment each lab has"""
+        links = conn.execute('SELECT lab_id, equipment_id FROM lab_equipment').fetchall()
+        rows = {lab['id']: i for i, lab in enumerate(labs)}
+        words = -(-max((link['equipment_id'] for link in links), default=0) // 64)
+        bits = np.zeros((len(labs), words), dtype=np.uint64)
+        for link in links:
+            row = rows.get(link['lab_id'])
+            if row is not None:
+                word, bit = divmod(link['equipment_id'] - 1, 64)
+                bits[row, word] |= np.uint64(1) << np.uint64(bit)
+        return bits
+
+    def _add(self, cell, delta):
+        row, day, first, last = cell
+        view = self._day(day)[row, first:last]
+        if delta < 0:
+            view -= -delta
+        else:
+            view += delta
+
+    def _day(self, day):
+        """Counters of one day, created empty on first use"""
+        counts = self.days.get(day)
+        if counts is None:
+            counts = self.days[day] = np.zeros((len(self.labs), TICKS_PER_DAY), dtype=np.uint16)
+        return counts
+
+    @staticmethod
+    def _cell(lab_rows, lab_number, date, start_time, end_time, session=None):
+        """(lab row, day, first tick, last tick) for a booking, or None if it can't be placed"""
+        row = lab_rows.get(lab_number)
+        if row is None:
+            return None
+        try:
+            day = date_to_day(date)
+        except (TypeError, ValueError):
+            return None
+        try:
+            start, end = time_to_minutes(start_time), time_to_minutes(end_time)
+        except (TypeError, ValueError):
+            window = session_window(session)
+            if window is None:
+                return None
+            start, end = window
+        first, last = to_ticks(start, end)
+        if first >= last:
+            return None
+        return row, day, first, min(last, TICKS_PER_DAY)
@@ -0,0 +1,280 @@
+"""
+Durable email outbox.
+
+Request handlers call enqueue() on their own connection, so a notification
+is committed (or rolled back) together with the reservation change that
+caused it. OutboxWorker delivers due rows in the background with
+exponential backoff and moves a row to 'dead' after MAX_ATTEMPTS failures.
+
+A recipient's first notification is due at once; notifications that follow
+it within COALESCE_WINDOW_SECONDS are held for the window and then delivered
+together: only the latest state of each reservation is sent (pending ->
+approved sends just the approval, the pending row becomes 'superseded'),
+and several reservations for one recipient go out as a single digest.
+Older rows of a reservation that are backing off after a failed send are
+folded into its newer row rather than sent after it.
+
+Run `python outbox.py` for a standalone worker (set EMAIL_OUTBOX_WORKER=off
+for the app processes in that case).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Notification kinds map to EmailService.<kind>_message(user_email, **payload)
+NOTIFICATION_KINDS = ('approval', 'pending', 'waitlisted', 'rejection', 'modification', 'cancellation')
+
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+BASE_DELAY_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BASE_DELAY', 30))
+MAX_DELAY_SECONDS = float(os.environ.get('EMAIL_OUTBOX_MAX_DELAY', 3600))
+POLL_INTERVAL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+# How long a follow-up notification waits for others to the same recipient (0 sends at once)
+COALESCE_WINDOW_SECONDS = float(os.environ.get('EMAIL_COALESCE_WINDOW', 30))
+BATCH_SIZE = 50
+
+# A claimed row not finished within this time (crashed worker) is retried
+LEASE_SECONDS = 300
+
+
+def enqueue(conn, kind, user_email, payload, reservation_id=None):
+    """
+    Queue a notification on the caller's connection (the caller commits).
+    payload holds the keyword arguments of EmailService.<kind>_message
+    after user_email.
+    
+    It is due at once unless the recipient already had a notification
+    queued within the coalesce window; then it waits out the window so
+    the follow-ups leave as one message.
+    """
+    if kind not in NOTIFICATION_KINDS:
+        raise ValueError(f"Unknown notification kind: {kind}")
+    now = datetime.now()
+    next_attempt_at = time.time()
+    if COALESCE_WINDOW_SECONDS > 0:
+        recent = conn.execute(
+            'SELECT 1 FROM email_outbox WHERE recipient = ? AND created_at > ? LIMIT 1',
+            (user_email, (now - timedelta(seconds=COALESCE_WINDOW_SECONDS)).isoformat())
+        ).fetchone()
+        if recent:
+            next_attempt_at += COALESCE_WINDOW_SECONDS
+    conn.execute(
+        '''INSERT INTO email_outbox (kind, recipient, reservation_id, payload, next_attempt_at, created_at)
+           VALUES (?, ?, ?, ?, ?, ?)''',
+        (kind, user_email, reservation_id, json.dumps(payload), next_attempt_at, now.isoformat())
+    )
+
+
+def coalesce(rows):
+    """
+    Collapse one recipient's outbox rows (in id order) into the notifications
+    to send. Per reservation only the latest row counts, with the updates of
+    all its modification rows merged. Returns ([(kind, payload)], superseded rows).
+    """
+    groups = {}
+    for row in rows:
+        key = row['reservation_id'] if row['reservation_id'] is not None else ('row', row['id'])
+        groups.setdefault(key, []).append(row)
+
+    notifications, superseded = [], []
+    for group in groups.values():
+        latest = group[-1]
+        payload = json.loads(latest['payload'])
+        if latest['kind'] == 'modification':
+            updates = {}
+            for row in group:
+                if row['kind'] == 'modification':
+                    updates.update(json.loads(row['payload'])['updates'])
+            payload['updates'] = updates
+        notifications.append((latest['kind'], payload))
+        superseded.extend(group[:-1])
+    return notifications, superseded
+
+
+def backoff_delay(attempts):
+    """Seconds to wait after the n-th failed attempt"""
+    return min(BASE_DELAY_SECONDS * 2 ** (attempts - 1), MAX_DELAY_SECONDS)
+
+
+class OutboxWorker:
+    """
+    Background delivery loop over email_outbox.
+
+    Rows are claimed with a conditional UPDATE (pending -> sending), so
+    several workers can share one database without double-sending; a row
+    whose claim lease expires goes back to pending.
+    """
+
+    def __init__(self, connect, email_service, poll_interval=POLL_INTERVAL_SECONDS):
+        self.connect = connect
+        self.email_service = email_service
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """Deliver now instead of at the next poll (call after committing new rows)"""
+        self._wake.set()
+
+    def run_once(self):
+        """Deliver to every recipient with a due row; returns the number of rows processed"""
+        conn = self.connect()
+        try:
+            now = time.time()
+            conn.execute(
+                "UPDATE email_outbox SET status = 'pending' WHERE status = 'sending' AND locked_until < ?",
+                (now,)
+            )
+            conn.commit()
+
+            due = conn.execute(
+                '''SELECT * FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ?
+                   ORDER BY next_attempt_at, id LIMIT ?''',
+                (now, BATCH_SIZE)
+            ).fetchall()
+
+            # Each due recipient's other fresh rows join its message, so one
+            # recipient's notifications leave together as soon as the oldest is due
+            groups = []
+            for recipient in dict.fromkeys(row['recipient'] for row in due):
+                rows = conn.execute(
+                    "SELECT * FROM email_outbox WHERE recipient = ? AND status = 'pending' ORDER BY id",
+                    (recipient,)
+                ).fetchall()
+                claimed = [row for row in self._sendable(rows, now) if self._claim(conn, row['id'])]
+                if claimed:
+                    groups.append(claimed)
+
+            self._deliver(conn, groups)
+            return sum(len(group) for group in groups)
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self.connect()
+        try:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall())
+        finally:
+            conn.close()
+        return {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'superseded', 'dead')}
+
+    def _sendable(self, rows, now):
+        """
+        The recipient's due and fresh rows, plus every other pending row of
+        their reservations: an older row still backing off is superseded by
+        the newer one instead of being sent after it with a stale status.
+        """
+        ready = {row['id'] for row in rows if row['next_attempt_at'] <= now or row['attempts'] == 0}
+        reservations = {row['reservation_id'] for row in rows
+                        if row['id'] in ready and row['reservation_id'] is not None}
+        return [row for row in rows if row['id'] in ready or row['reservation_id'] in reservations]
+
+    def _claim(self, conn, outbox_id):
+        cursor = conn.execute(
+            "UPDATE email_outbox SET status = 'sending', locked_until = ? WHERE id = ? AND status = 'pending'",
+            (time.time() + LEASE_SECONDS, outbox_id)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def _deliver(self, conn, groups):
+        """
+        Render one message per recipient group (a digest when several
+        reservations remain after coalescing) and send them as one batch over
+        pooled SMTP sessions. A failed group is retried whole.
+        """
+        errors, messages, sendable, superseded_ids = {}, [], [], set()
+        for index, rows in enumerate(groups):
+            try:
+                notifications, superseded = coalesce(rows)
+                superseded_ids.update(row['id'] for row in superseded)
+                recipient = rows[0]['recipient']
+                if len(notifications) == 1:
+                    kind, payload = notifications[0]
+                    messages.append(self.email_service.message(kind, recipient, **payload))
+                else:
+                    messages.append(self.email_service.digest_message(recipient, notifications))
+                sendable.append(index)
+            except Exception as e:
+                errors[index] = str(e)
+
+        for index, sent in zip(sendable, self.email_service.send_batch(messages)):
+            if not sent:
+                errors[index] = 'send failed'
+
+        for index, rows in enumerate(groups):
+            if index in errors:
+                for row in rows:
+                    self._finish(conn, row, errors[index])
+            else:
+                for row in rows:
+                    self._finish(conn, row, None, 'superseded' if row['id'] in superseded_ids else 'sent')
+
+    def _finish(self, conn, row, error, delivered_status='sent'):
+        attempts = row['attempts'] + 1
+        if error is None:
+            conn.execute(
+                "UPDATE email_outbox SET status = ?, attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                (delivered_status, attempts, datetime.now().isoformat(), row['id'])
+            )
+        elif attempts >= MAX_ATTEMPTS:
+            logger.error(f"Dead-lettering {row['kind']} email #{row['id']} to {row['recipient']}: {error}")
+            conn.execute(
+                "UPDATE email_outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                (attempts, error, row['id'])
+            )
+        else:
+            delay = backoff_delay(attempts)
+            logger.warning(f"{row['kind']} email #{row['id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            conn.execute(
+                "UPDATE email_outbox SET status = 'pending', attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                (attempts, error, time.time() + delay, row['id'])
+            )
+        conn.commit()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                self.email_service.smtp_pool.keepalive()
+            except Exception as e:
+                logger.error(f"Outbox worker pass failed: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+if __name__ == '__main__':
+    from db import ConnectionPool
+    from email_service import EmailService
+    from migrations import migrate, DB_PATH
+
+    pool = ConnectionPool(DB_PATH)
+    conn = pool.connect()
+    migrate(conn)
+    conn.close()
+
+    worker = OutboxWorker(pool.connect, EmailService())
+    logger.info("Outbox worker running (Ctrl+C to stop)")
+    try:
+        worker._run()
+    except KeyboardInterrupt:
+        pass
@@ -1,26 +1,134 @@
-import torch
-from transformers import AutoTokenizer, AutoModel
 import numpy as np
 from datetime import datetime, timedelta
 import logging
-import re
+import os
 import math
+import itertools
+import threading
+from text_features import (
+    DescriptionFeatureExtractor, GENERIC_PHRASES, URGENCY_CONTEXT_KEYWORDS, STUFFING_KEYWORDS
+)
+from embedding_cache import EmbeddingCache, cache_namespace, normalize_text, text_key
+from embedding_batcher import EmbeddingBatcher
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Hub id or local directory holding the tokenizer/model artifacts
+DEFAULT_MODEL_DIR = "distilbert-base-uncased"
+
+# When the DistilBERT model is loaded:
+#   eager      - during __init__ (blocks startup, the old behaviour)
+#   background - in a warm-up thread started by __init__
+#   lazy       - on first call to get_model()
+#   disabled   - never, rule-based scoring only
+MODEL_LOAD_MODES = ('eager', 'background', 'lazy', 'disabled')
+
+# Inference precision: fp32 (default) or int8 (dynamic quantization of Linear layers)
+INFERENCE_PRECISIONS = ('fp32', 'int8')
+
+# Reference "priority" concepts for the DistilBERT authenticity signal,
+# embedded once when the model loads
+REFERENCE_TEXTS = [
+    "urgent emergency critical deadline important",
+    "exam assessment evaluation test examination",
+    "conference presentation seminar workshop important meeting"
+]
+
+# Authenticity points available from semantic similarity (within the 25 cap)
+SEMANTIC_MAX_POINTS = 3
+
+# Scoring tables shared by calculate_priority and calculate_priority_batch
+ROLE_SCORES = {
+    'faculty': 5,
+    'admin': 5,
+    'phd': 4,
+    'postgrad': 3,
+    'student': 2
+}
+
+PROOF_SCORES = {
+    'faculty_approval': 12,
+    'official_letter': 10,
+    'department_email': 9,
+    'event_registration': 8,
+    'course_syllabus': 7,
+    'admin_approval': 12
+}
+
+URGENCY_BASE = {
+    'high': 7,
+    'medium': 4,
+    'normal': 2,
+    'low': 0
+}
+
+ACADEMIC_PURPOSES = ('exam', 'lecture', 'research')
+HIGH_PRIORITY_PURPOSES = ('exam', 'emergency', 'lecture')
+
+# Flag names in the order _detect_fraud_flags reports them
+FRAUD_FLAGS = ('GENERIC_DESCRIPTION', 'NO_PROOF_ACADEMIC', 'WASTEFUL_UTILIZATION',
+               'KEYWORD_STUFFING', 'REPETITIVE_CLAIMS')
+
+
+def _round_column(values, digits):
+    """round() each value as calculate_priority does (once per distinct value), as float64"""
+    distinct, inverse = np.unique(values, return_inverse=True)
+    rounded = np.array([round(v, digits) for v in distinct.tolist()], dtype=np.float64)
+    return rounded[inverse]
+
+
 class PriorityScorer:
-    def __init__(self):
-        """Initialize NLP model for authenticity detection"""
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained("distilbert-base-uncased")
-            self.model = AutoModel.from_pretrained("distilbert-base-uncased")
-            self.model.eval()
-            logger.info("DistilBERT model loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load DistilBERT: {e}. Using rule-based scoring only.")
-            self.tokenizer = None
-            self.model = None
+    def __init__(self, model_dir=None, load_mode=None, history_store=None,
+                 precision=None, torch_threads=None):
+        """
+        Initialize scoring thresholds and schedule the NLP model load.
+        
+        Args:
+            model_dir: Hub id or local artifact directory (env SCORER_MODEL_DIR)
+            load_mode: One of MODEL_LOAD_MODES (env SCORER_MODEL_LOADING, default background)
+            history_store: UserHistoryStore used for fairness scoring (None = no history)
+            precision: One of INFERENCE_PRECISIONS (env SCORER_PRECISION, default fp32)
+            torch_threads: Cap on torch intra-op threads (env SCORER_TORCH_THREADS)
+        """
+        self.model_dir = model_dir or os.environ.get('SCORER_MODEL_DIR', DEFAULT_MODEL_DIR)
+        self.load_mode = (load_mode or os.environ.get('SCORER_MODEL_LOADING', 'background')).lower()
+        if self.load_mode not in MODEL_LOAD_MODES:
+            logger.warning(f"Unknown model load mode '{self.load_mode}', falling back to lazy")
+            self.load_mode = 'lazy'
+        
+        self.precision = (precision or os.environ.get('SCORER_PRECISION', 'fp32')).lower()
+        if self.precision not in INFERENCE_PRECISIONS:
+            logger.warning(f"Unknown inference precision '{self.precision}', using fp32")
+            self.precision = 'fp32'
+        threads = torch_threads or os.environ.get('SCORER_TORCH_THREADS')
+        self.torch_threads = int(threads) if threads else None
+        
+        # torch/transformers are imported by load_model(), never at module import
+        self.tokenizer = None
+        self.model = None
+        self.model_status = 'disabled' if self.load_mode == 'disabled' else 'not_loaded'
+        self._model_lock = threading.Lock()
+        self._warmup_thread = None
+        
+        # Precompiled single-pass description analysis shared by all components
+        self.feature_extractor = DescriptionFeatureExtractor()
+        
+        # Description embeddings are cached (on disk per model and precision);
+        # reference vectors are built at load
+        self.embedding_cache = EmbeddingCache(
+            max_size=int(os.environ.get('SCORER_EMBEDDING_CACHE_SIZE', 2048)),
+            disk_dir=os.environ.get('SCORER_EMBEDDING_CACHE_DIR') or None,
+            namespace=cache_namespace(self.model_dir, self.precision)
+        )
+        self.reference_embeddings = None
+        
+        # Cache misses from concurrent requests share forward passes
+        self.embedding_batcher = EmbeddingBatcher(
+            self._encode,
+            max_batch_size=int(os.environ.get('SCORER_BATCH_MAX_SIZE', 16)),
+            max_wait_ms=float(os.environ.get('SCORER_BATCH_MAX_WAIT_MS', 2))
+        )
         
         # Capacity utilization thresholds
         self.OPTIMAL_UTILIZATION_MIN = 0.85  # 85% capacity
@@ -29,8 +137,157 @@ class PriorityScorer:
         self.ACCEPTABLE_UTILIZATION_MAX = 1.05  # 105% capacity (slight overbook)
         self.MAX_UTILIZATION = 1.20  # 120% = auto-reject
         
-        # User behavior tracking (in production, use database)
-        self.user_history = {}  # user_email -> {bookings: [], cancellations: []}
+        # User behavior aggregates, persisted in SQLite (see user_history.py)
+        self.user_history = history_store
+        
+        if self.load_mode == 'eager':
+            self.load_model()
+        elif self.load_mode == 'background':
+            self.warm_up()
+    
+    @property
+    def model_ready(self):
+        """True once the tokenizer and model are loaded and usable"""
+        return self.model_status == 'ready'
+    
+    def load_model(self):
+        """
+        Load the DistilBERT tokenizer and model (blocking, thread-safe).
+        
+        A local artifact directory is read with local_files_only so offline
+        hosts never wait on the hub. Failures are logged once and the scorer
+        keeps running rule-based.
+        """
+        if self.model_status in ('ready', 'failed', 'disabled'):
+            return self.model
+        
+        with self._model_lock:
+            if self.model_status in ('ready', 'failed', 'disabled'):
+                return self.model
+            
+            self.model_status = 'loading'
+            try:
+                import torch
+                from transformers import AutoTokenizer, AutoModel
+                
+                if self.torch_threads:
+                    torch.set_num_threads(self.torch_threads)
+                
+                local_only = os.path.isdir(self.model_dir)
+                self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir, local_files_only=local_only)
+                model = AutoModel.from_pretrained(self.model_dir, local_files_only=local_only)
+                model.eval()
+                if self.precision == 'int8':
+                    # Weights of every Linear layer stored as int8, activations quantized on the fly
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self.model = model
+                self.reference_embeddings = self._encode(REFERENCE_TEXTS)
+                self.model_status = 'ready'
+                logger.info(f"DistilBERT model loaded successfully from {self.model_dir} ({self.precision})")
+            except Exception as e:
+                logger.warning(f"Failed to load DistilBERT: {e}. Using rule-based scoring only.")
+                self.tokenizer = None
+                self.model = None
+                self.reference_embeddings = None
+                self.model_status = 'failed'
+        
+        return self.model
+    
+    def warm_up(self):
+        """Start loading the model in a daemon thread; returns immediately"""
+        if self.model_status != 'not_loaded' or self._warmup_thread is not None:
+            return self._warmup_thread
+        
+        self._warmup_thread = threading.Thread(
+            target=self.load_model, name='scorer-model-warmup', daemon=True
+        )
+        self._warmup_thread.start()
+        return self._warmup_thread
+    
+    def get_model(self, wait=True):
+        """
+        Return (tokenizer, model), loading on first use.
+        
+        With wait=False this never blocks: it starts a background load if
+        needed and returns (None, None) until the model is ready.
+        """
+        if not wait and self.model_status in ('not_loaded', 'loading'):
+            self.warm_up()
+            return None, None
+        
+        self.load_model()
+        return self.tokenizer, self.model
+    
+    def _encode(self, texts):
+        """Mean-pooled, L2-normalized embeddings for a list of texts in one forward pass"""
+        import torch
+        
+        inputs = self.tokenizer(texts, return_tensors="pt", truncation=True, max_length=512, padding=True)
+        with torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        
+        # Average over real tokens only, so padding in a batch doesn't shift the vectors
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        pooled = ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).numpy().astype(np.float32)
+        
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.maximum(norms, 1e-12)
+    
+    def embed_descriptions(self, descriptions, wait=False):
+        """
+        Normalized embeddings for descriptions, served from the cache where possible.
+        Cache misses are encoded together in a single forward pass.
+        
+        Returns: (N, hidden_size) array, or None while the model is unavailable
+        """
+        _, model = self.get_model(wait=wait)
+        if model is None:
+            return None
+        
+        keys = [text_key(d) for d in descriptions]
+        vectors = {key: self.embedding_cache.get(key) for key in dict.fromkeys(keys)}
+        
+        missing = {}
+        for description, key in zip(descriptions, keys):
+            if vectors[key] is None:
+                missing.setdefault(key, normalize_text(description))
+        
+        if missing:
+            for key, vector in zip(missing, self._encode_missing(list(missing.values()))):
+                self.embedding_cache.put(key, vector)
+                vectors[key] = vector
+        
+        return np.vstack([vectors[key] for key in keys])
+    
+    def _encode_missing(self, texts):
+        """
+        Small requests join the shared micro-batching queue; large ones
+        (batch scoring) are already batched and are encoded in chunks directly.
+        """
+        chunk = self.embedding_batcher.max_batch_size
+        if len(texts) < chunk:
+            return self.embedding_batcher.encode(texts)
+        return np.vstack([self._encode(texts[i:i + chunk]) for i in range(0, len(texts), chunk)])
+    
+    def semantic_similarity(self, descriptions, wait=False):
+        """
+        Highest cosine similarity of each description to the reference texts,
+        computed as one matrix product against all references.
+        
+        Returns: Array of N similarities, or None while the model is unavailable
+        """
+        embeddings = self.embed_descriptions(descriptions, wait=wait)
+        if embeddings is None:
+            return None
+        return self._max_similarity(embeddings)
+    
+    def _max_similarity(self, embeddings):
+        """Highest similarity of each embedding row to the reference embeddings"""
+        return (embeddings @ self.reference_embeddings.T).max(axis=1)
+    
+    def _semantic_points(self, similarity):
+        """Map similarity (0-1) to 0-SEMANTIC_MAX_POINTS, emphasizing high similarities"""
+        return SEMANTIC_MAX_POINTS / (1 + np.exp(-10 * (similarity - 0.5)))
     
     def calculate_priority(self, purpose, description, num_participants, lab_capacity, 
                           urgency='normal', user_email=None, booking_date=None, 
@@ -58,22 +315,29 @@ class PriorityScorer:
         if utilization_ratio > self.MAX_UTILIZATION:
             return {
                 "accepted": False,
-                "score": 0,
+                "score": 0.0,
                 "breakdown": {},
                 "flags": ["CAPACITY_EXCEEDED"],
                 "message": f"Participants ({num_participants}) exceed maximum allowed ({int(lab_capacity * self.MAX_UTILIZATION)})"
             }
         
+        # Scan the description once; every component reads this record
+        features = self.feature_extractor.extract(description)
+        
         # 1. Capacity Match Score (50 points)
         capacity_score = self._calculate_capacity_score(num_participants, lab_capacity)
         
+        # DistilBERT signal; None (rule-based only) until the model is ready
+        similarity = self.semantic_similarity([description])
+        semantic_similarity = None if similarity is None else float(similarity[0])
+        
         # 2. Authenticity & Verification Score (25 points)
         authenticity_score = self._calculate_authenticity_score(
-            purpose, description, has_proof, proof_type, user_role
+            purpose, description, has_proof, proof_type, user_role, features, semantic_similarity
         )
         
         # 3. Timing & Urgency Score (15 points)
-        timing_score = self._calculate_timing_score(urgency, booking_date, description)
+        timing_score = self._calculate_timing_score(urgency, booking_date, description, features)
         
         # 4. Fairness & Past Usage Score (10 points)
         fairness_score = self._calculate_fairness_score(user_email, num_participants)
@@ -82,7 +346,7 @@ class PriorityScorer:
         total_score = capacity_score + authenticity_score + timing_score + fairness_score
         
         # Detect fraud flags
-        flags = self._detect_fraud_flags(description, purpose, utilization_ratio, has_proof)
+        flags = self._detect_fraud_flags(description, purpose, utilization_ratio, has_proof, features)
         
         # Apply penalties for suspicious behavior
         if flags:
@@ -93,23 +357,263 @@ class PriorityScorer:
         accepted = total_score >= 50 and utilization_ratio <= self.ACCEPTABLE_UTILIZATION_MAX
         
         breakdown = {
-            "capacity_score": round(capacity_score, 2),
-            "authenticity_score": round(authenticity_score, 2),
-            "timing_score": round(timing_score, 2),
-            "fairness_score": round(fairness_score, 2),
+            "capacity_score": round(float(capacity_score), 2),
+            "authenticity_score": round(float(authenticity_score), 2),
+            "timing_score": round(float(timing_score), 2),
+            "fairness_score": round(float(fairness_score), 2),
             "fraud_penalty": len(flags) * 5 if flags else 0,
-            "utilization_ratio": round(utilization_ratio, 3)
+            "utilization_ratio": round(float(utilization_ratio), 3)
         }
+        if semantic_similarity is not None:
+            breakdown["semantic_similarity"] = round(semantic_similarity, 3)
         
         logger.info(f"Fair scoring - Total: {total_score:.1f} | Breakdown: {breakdown} | Flags: {flags}")
         
         return {
             "accepted": accepted,
-            "score": round(total_score, 2),
+            "score": round(float(total_score), 2),
             "breakdown": breakdown,
             "flags": flags
         }
     
+    def calculate_priority_batch(self, purposes, descriptions, num_participants, lab_capacities,
+                                 urgencies=None, user_emails=None, booking_dates=None,
+                                 has_proofs=None, proof_types=None, user_roles=None):
+        """
+        Score many requests at once (nightly re-evaluation, bulk imports).
+        
+        Takes one column per calculate_priority argument; optional columns
+        default to the scalar defaults. Each row's result is identical to
+        calculate_priority() for the same inputs, value and type (the
+        semantic term, when the model is ready, uses the same cached
+        embedding and the same per-row arithmetic). Callers that don't need
+        per-row dicts should use calculate_priority_columns().
+        
+        Returns: List of result dicts, one per row, in input order
+        """
+        num_participants, lab_capacities = list(num_participants), list(lab_capacities)
+        columns = self.calculate_priority_columns(
+            purposes, descriptions, num_participants, lab_capacities, urgencies, user_emails,
+            booking_dates, has_proofs, proof_types, user_roles
+        )
+        n = len(columns['score'])
+        if n == 0:
+            return []
+        
+        # Each distinct flag combination is named once; rows get their own list
+        flag_codes = (columns['flags'] << np.arange(len(FRAUD_FLAGS))).sum(axis=1)
+        flag_names = {code: [name for bit, name in enumerate(FRAUD_FLAGS) if code >> bit & 1]
+                      for code in np.unique(flag_codes).tolist()}
+        
+        rows = zip(
+            columns['accepted'].tolist(), columns['score'].tolist(), columns['capacity_score'].tolist(),
+            columns['authenticity_score'].tolist(), columns['timing_score'].tolist(),
+            columns['fairness_score'].tolist(), columns['fraud_penalty'].tolist(),
+            columns['utilization_ratio'].tolist(), flag_codes.tolist()
+        )
+        results = [
+            {
+                "accepted": ok,
+                "score": score,
+                "breakdown": {
+                    "capacity_score": cap,
+                    "authenticity_score": auth,
+                    "timing_score": tim,
+                    "fairness_score": fair,
+                    "fraud_penalty": penalty,
+                    "utilization_ratio": util
+                },
+                "flags": list(flag_names[code])
+            }
+            for ok, score, cap, auth, tim, fair, penalty, util, code in rows
+        ]
+        
+        if columns['semantic_similarity'] is not None:
+            for result, similarity in zip(results, columns['semantic_similarity'].tolist()):
+                result['breakdown']['semantic_similarity'] = similarity
+        
+        # Auto-rejected rows carry no breakdown, as in calculate_priority
+        for i in np.flatnonzero(columns['exceeded']).tolist():
+            results[i] = {
+                "accepted": False,
+                "score": 0.0,
+                "breakdown": {},
+                "flags": ["CAPACITY_EXCEEDED"],
+                "message": f"Participants ({num_participants[i]}) exceed maximum allowed ({int(lab_capacities[i] * self.MAX_UTILIZATION)})"
+            }
+        
+        return results
+    
+    def calculate_priority_columns(self, purposes, descriptions, num_participants, lab_capacities,
+                                   urgencies=None, user_emails=None, booking_dates=None,
+                                   has_proofs=None, proof_types=None, user_roles=None):
+        """
+        calculate_priority_batch as NumPy columns, with no per-row Python objects.
+        
+        Returns: Dict of arrays, one entry per row:
+            accepted, exceeded (auto-rejected over MAX_UTILIZATION): bool
+            score, capacity_score, authenticity_score, timing_score,
+            fairness_score, utilization_ratio: float64, rounded as
+            calculate_priority reports them
+            fraud_penalty: int64
+            semantic_similarity: float64 (rounded to 3 places), or None
+            while the model is unavailable
+            flags: bool (rows x len(FRAUD_FLAGS)), in FRAUD_FLAGS order
+        Exceeded rows keep their computed components; their score is 0.
+        """
+        n = len(purposes)
+        
+        def column(values, default):
+            return [default] * n if values is None else list(values)
+        
+        purposes = list(purposes)
+        descriptions = [d or '' for d in descriptions]
+        urgencies = column(urgencies, 'normal')
+        user_emails = column(user_emails, None)
+        booking_dates = column(booking_dates, None)
+        has_proofs = column(has_proofs, False)
+        proof_types = column(proof_types, None)
+        user_roles = column(user_roles, 'student')
+        
+        participants = np.asarray(num_participants, dtype=np.float64).reshape(n)
+        capacities = np.asarray(list(lab_capacities), dtype=np.float64).reshape(n)
+        utilization = participants / capacities
+        
+        # Text signals are computed once per distinct description and gathered back
+        text_ids = {text: i for i, text in enumerate(dict.fromkeys(descriptions))}
+        text_inverse = np.fromiter(map(text_ids.__getitem__, descriptions), dtype=np.int64, count=n)
+        features = [self.feature_extractor.extract(t) for t in text_ids]
+        stripped_lengths = np.array([f.stripped_length for f in features], dtype=np.int64)[text_inverse]
+        
+        # Table lookups and membership tests run as map() over the C-level methods
+        def lookup(values, table, default):
+            return np.fromiter(map(table.get, values, itertools.repeat(default, n)), dtype=np.float64, count=n)
+        
+        def member(values, choices):
+            return np.fromiter(map(choices.__contains__, values), dtype=bool, count=n)
+        
+        # 1. Capacity Match Score (50 points)
+        capacity = self._capacity_scores_array(utilization)
+        
+        # 2. Authenticity & Verification Score (25 points)
+        proof_mask = np.fromiter(map(bool, has_proofs), dtype=bool, count=n)
+        academic = member(purposes, ACADEMIC_PURPOSES)
+        high_priority = member(purposes, HIGH_PRIORITY_PURPOSES)
+        role_points = lookup(user_roles, ROLE_SCORES, 2)
+        proof_points = lookup(proof_types, PROOF_SCORES, 5)
+        detail = np.array([self._analyze_description_details(None, f) for f in features],
+                          dtype=np.float64)[text_inverse]
+        authenticity = role_points + np.where(proof_mask, proof_points, np.where(academic, -5.0, 0.0))
+        authenticity = authenticity + detail
+        similarity = None
+        embeddings = self.embed_descriptions(list(text_ids)) if text_ids else None
+        if embeddings is not None:
+            # One row at a time, exactly as calculate_priority computes it
+            # (a single matrix product over all rows may round differently)
+            text_similarity = [float(self._max_similarity(embeddings[i:i + 1])[0]) for i in range(len(text_ids))]
+            text_points = [float(self._semantic_points(s)) for s in text_similarity]
+            similarity = np.array(text_similarity, dtype=np.float64)[text_inverse]
+            authenticity = authenticity + np.array(text_points, dtype=np.float64)[text_inverse]
+        authenticity = np.clip(authenticity, 0, 25)
+        
+        # 3. Timing & Urgency Score (15 points)
+        now = datetime.now()
+        days_by_date = {}
+        for booking_date in booking_dates:
+            if booking_date and booking_date not in days_by_date:
+                try:
+                    event_date = datetime.fromisoformat(booking_date) if isinstance(booking_date, str) else booking_date
+                    days_by_date[booking_date] = (event_date - now).days
+                except:
+                    days_by_date[booking_date] = None
+        days_until = np.fromiter(
+            (days_by_date[d] if d and days_by_date[d] is not None else np.iinfo(np.int64).max
+             for d in booking_dates),
+            dtype=np.int64, count=n
+        )
+        proximity = np.select([days_until <= 2, days_until <= 7, days_until <= 14], [8.0, 6.0, 4.0], 2.0)
+        
+        urgency_points = lookup(urgencies, URGENCY_BASE, 2)
+        claims_urgency = member(urgencies, ('high', 'medium'))
+        has_context = np.array([not f.keywords.isdisjoint(URGENCY_CONTEXT_KEYWORDS) for f in features],
+                               dtype=bool)[text_inverse]
+        urgency_points = np.where(claims_urgency & ~has_context, urgency_points * 0.3, urgency_points)
+        timing = np.clip(proximity + urgency_points, 0, 15)
+        
+        # 4. Fairness & Past Usage Score (10 points) - one lookup per distinct user
+        fairness_by_user = {}
+        for email in user_emails:
+            if email not in fairness_by_user:
+                fairness_by_user[email] = self._calculate_fairness_score(email, None)
+        fairness = np.fromiter((fairness_by_user[e] for e in user_emails), dtype=np.float64, count=n)
+        
+        # Fraud flags as boolean columns, in FRAUD_FLAGS (_detect_fraud_flags) order
+        stuffing_counts = np.array([len(f.keywords & STUFFING_KEYWORDS) for f in features],
+                                   dtype=np.int64)[text_inverse]
+        repetitive = np.array([max(f.claim_counts.values()) > 2 for f in features], dtype=bool)[text_inverse]
+        flags = np.column_stack([
+            high_priority & (stripped_lengths < 30),
+            academic & ~proof_mask,
+            utilization < 0.25,
+            (stuffing_counts >= 3) & (stripped_lengths < 50),
+            repetitive,
+        ]) if n else np.zeros((0, len(FRAUD_FLAGS)), dtype=bool)
+        flag_counts = flags.sum(axis=1, dtype=np.int64)
+        
+        total = capacity + authenticity + timing + fairness
+        total = np.where(flag_counts > 0, np.maximum(0, total - flag_counts * 5), total)
+        accepted = (total >= 50) & (utilization <= self.ACCEPTABLE_UTILIZATION_MAX)
+        exceeded = utilization > self.MAX_UTILIZATION
+        
+        if n:
+            logger.info(f"Fair scoring (batch) - {n} rows | Accepted: {int((accepted & ~exceeded).sum())}")
+        
+        return {
+            "accepted": accepted & ~exceeded,
+            "exceeded": exceeded,
+            "score": np.where(exceeded, 0.0, _round_column(total, 2)),
+            "capacity_score": _round_column(capacity, 2),
+            "authenticity_score": _round_column(authenticity, 2),
+            "timing_score": _round_column(timing, 2),
+            "fairness_score": _round_column(fairness, 2),
+            "fraud_penalty": flag_counts * 5,
+            "utilization_ratio": _round_column(utilization, 3),
+            "semantic_similarity": None if similarity is None else _round_column(similarity, 3),
+            "flags": flags
+        }
+    
+    def _capacity_scores_array(self, utilization):
+        """
+        Vectorized _calculate_capacity_score over an array of utilization ratios.
+        
+        math.exp is evaluated once per distinct distance (NumPy's exp may differ
+        from libm in the last bit); everything else is elementwise NumPy.
+        """
+        utilization = np.asarray(utilization, dtype=np.float64)
+        optimal = (utilization >= self.OPTIMAL_UTILIZATION_MIN) & (utilization <= self.OPTIMAL_UTILIZATION_MAX)
+        optimal_center = (self.OPTIMAL_UTILIZATION_MIN + self.OPTIMAL_UTILIZATION_MAX) / 2
+        distance = np.abs(utilization - optimal_center)
+        
+        sigma = 0.3
+        unique_distances, inverse = np.unique(distance, return_inverse=True)
+        curve = np.array([math.exp(-(d ** 2) / (2 * sigma ** 2)) for d in unique_distances.tolist()])
+        gaussian = 50 * curve[inverse.reshape(distance.shape)] if curve.size else np.zeros_like(distance)
+        
+        gaussian = np.where(utilization < 0.30, gaussian * 0.5, gaussian)
+        gaussian = np.where((utilization > 1.00) & (utilization <= 1.05), gaussian * 0.85, gaussian)
+        gaussian = np.where((utilization > 1.05) & (utilization <= 1.20), gaussian * 0.4, gaussian)
+        
+        return np.where(optimal, 50.0, np.clip(gaussian, 0, 50))
+    
+    def capacity_scores(self, num_participants, lab_capacities):
+        """
+        Capacity points (0-50) of _calculate_capacity_score for arrays of
+        participant counts and lab capacities, broadcast against each other
+        (e.g. requests as a column against labs as a row).
+        """
+        utilization = np.asarray(num_participants, dtype=np.float64) / np.asarray(lab_capacities, dtype=np.float64)
+        return self._capacity_scores_array(utilization)
+    
     def _calculate_capacity_score(self, num_participants, lab_capacity):
         """
         Calculate score based on capacity utilization (50 points max).
@@ -152,7 +656,8 @@ class PriorityScorer:
         
         return max(0, min(50, gaussian_score))
     
-    def _calculate_authenticity_score(self, purpose, description, has_proof, proof_type, user_role):
+    def _calculate_authenticity_score(self, purpose, description, has_proof, proof_type, user_role,
+                                      features=None, semantic_similarity=None):
         """
         Calculate authenticity score (25 points max).
         
@@ -162,75 +667,51 @@ class PriorityScorer:
         score = 0
         
         # Base score from role (0-5 points)
-        role_scores = {
-            'faculty': 5,
-            'admin': 5,
-            'phd': 4,
-            'postgrad': 3,
-            'student': 2
-        }
-        score += role_scores.get(user_role, 2)
+        score += ROLE_SCORES.get(user_role, 2)
         
         # Proof verification (0-12 points) - MOST IMPORTANT
         if has_proof:
-            proof_scores = {
-                'faculty_approval': 12,
-                'official_letter': 10,
-                'department_email': 9,
-                'event_registration': 8,
-                'course_syllabus': 7,
-                'admin_approval': 12
-            }
-            score += proof_scores.get(proof_type, 5)
+            score += PROOF_SCORES.get(proof_type, 5)
         else:
             # No proof for academic purposes = penalty
-            if purpose in ['exam', 'lecture', 'research']:
+            if purpose in ACADEMIC_PURPOSES:
                 score -= 5  # Heavy penalty for claiming academic use without proof
         
         # Description detail quality (0-8 points)
-        detail_score = self._analyze_description_details(description)
+        detail_score = self._analyze_description_details(description, features)
         score += detail_score
         
+        # Semantic similarity to priority concepts (0-3 points, when the model is ready)
+        if semantic_similarity is not None:
+            score += float(self._semantic_points(semantic_similarity))
+        
         return max(0, min(25, score))
     
-    def _analyze_description_details(self, description):
+    def _analyze_description_details(self, description, features=None):
         """
         Analyze description for concrete details (8 points max).
         Looks for specific information, not just generic claims.
         """
-        if not description or len(description.strip()) < 20:
+        if features is None:
+            features = self.feature_extractor.extract(description)
+        
+        if features.stripped_length < 20:
             return 0
         
         score = 0
-        description_lower = description.lower()
         
         # Check for specific details (each adds points)
-        detail_patterns = {
-            'date_mention': r'\b(january|february|march|april|may|june|july|august|september|october|november|december|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b',
-            'time_mention': r'\b(\d{1,2}:\d{2}|am|pm|morning|afternoon|evening)\b',
-            'faculty_name': r'\b(dr\.|prof\.|professor|dr |faculty)\s+[a-z]+\b',
-            'course_code': r'\b([a-z]{2,4}\s*\d{3,4}|course\s+\d+)\b',
-            'venue_mention': r'\b(room|hall|auditorium|lab|building|block|floor)\s+[a-z0-9]+\b',
-            'participant_list': r'\b(students?|participants?|attendees?|members?)\s+(from|of|in)\b',
-        }
-        
-        for pattern_name, pattern in detail_patterns.items():
-            if re.search(pattern, description_lower):
-                score += 1.5
+        for _ in features.detail_matches:
+            score += 1.5
         
         # Penalty for generic/vague descriptions
-        generic_phrases = [
-            'very important', 'urgent meeting', 'important event',
-            'necessary', 'required', 'must have', 'need urgently'
-        ]
-        
-        generic_count = sum(1 for phrase in generic_phrases if phrase in description_lower)
+        generic_count = len(features.keywords & GENERIC_PHRASES)
         if generic_count > 2:
             score -= 2  # Penalty for too many generic urgency claims
         
         return max(0, min(8, score))
     
-    def _calculate_timing_score(self, urgency, booking_date, description):
+    def _calculate_timing_score(self, urgency, booking_date, description, features=None):
         """
         Calculate timing score (15 points max).
         Real urgency based on actual event proximity, not just labels.
@@ -258,18 +739,13 @@ class PriorityScorer:
             score += 2  # No date provided
         
         # Urgency level (0-7 points) - but only if justified
-        urgency_base = {
-            'high': 7,
-            'medium': 4,
-            'normal': 2,
-            'low': 0
-        }
-        urgency_score = urgency_base.get(urgency, 2)
+        urgency_score = URGENCY_BASE.get(urgency, 2)
         
         # Check if urgency is justified by description
         if urgency in ['high', 'medium']:
-            urgency_keywords = ['deadline', 'urgent', 'critical', 'emergency', 'tomorrow', 'today']
-            has_urgency_context = any(kw in description.lower() for kw in urgency_keywords)
+            if features is None:
+                features = self.feature_extractor.extract(description)
+            has_urgency_context = not features.keywords.isdisjoint(URGENCY_CONTEXT_KEYWORDS)
             
             if not has_urgency_context:
                 urgency_score *= 0.3  # Reduce if claiming urgency without context
@@ -285,14 +761,13 @@ class PriorityScorer:
         """
         score = 10  # Start with full score
         
-        if not user_email or user_email not in self.user_history:
+        history = self.user_history.get(user_email) if user_email and self.user_history else None
+        if not history:
             return score  # New user, give benefit of doubt
         
-        history = self.user_history[user_email]
-        
         # Penalty for frequent cancellations
-        total_bookings = len(history.get('bookings', []))
-        cancellations = len(history.get('cancellations', []))
+        total_bookings = history['total_bookings']
+        cancellations = history['cancellations']
         
         if total_bookings > 0:
             cancellation_rate = cancellations / total_bookings
@@ -302,32 +777,34 @@ class PriorityScorer:
                 score -= 1.5
         
         # Penalty for pattern of overbooking (booking more than needed)
-        past_bookings = history.get('bookings', [])
-        if len(past_bookings) >= 3:
-            avg_utilization = np.mean([b.get('utilization', 1.0) for b in past_bookings[-5:]])
+        recent_utilization = history['recent_utilization']
+        if total_bookings >= 3 and recent_utilization:
+            avg_utilization = sum(recent_utilization) / len(recent_utilization)
             if avg_utilization < 0.5:  # Consistently under-utilizing
                 score -= 2
         
         # Penalty for frequent high-participant bookings (potential gaming)
-        high_count_bookings = [b for b in past_bookings if b.get('participants', 0) > 50]
-        if len(high_count_bookings) > len(past_bookings) * 0.7:  # >70% are high count
+        if history['high_participant_bookings'] > total_bookings * 0.7:  # >70% are high count
             score -= 2
         
         return max(0, score)
     
-    def _detect_fraud_flags(self, description, purpose, utilization_ratio, has_proof):
+    def _detect_fraud_flags(self, description, purpose, utilization_ratio, has_proof, features=None):
         """
         Detect suspicious patterns that indicate gaming/fraud.
         Returns list of flag names.
         """
+        if features is None:
+            features = self.feature_extractor.extract(description)
+        
         flags = []
         
         # Flag 1: Generic description with high-priority purpose
-        if purpose in ['exam', 'emergency', 'lecture'] and len(description.strip()) < 30:
+        if purpose in HIGH_PRIORITY_PURPOSES and features.stripped_length < 30:
             flags.append("GENERIC_DESCRIPTION")
         
         # Flag 2: No proof for academic purpose
-        if purpose in ['exam', 'lecture', 'research'] and not has_proof:
+        if purpose in ACADEMIC_PURPOSES and not has_proof:
             flags.append("NO_PROOF_ACADEMIC")
         
         # Flag 3: Extremely low utilization (<25%)
@@ -335,14 +812,13 @@ class PriorityScorer:
             flags.append("WASTEFUL_UTILIZATION")
         
         # Flag 4: Description filled with urgency keywords but no details
-        urgency_keywords = ['urgent', 'emergency', 'critical', 'immediately', 'asap', 'important']
-        urgency_count = sum(1 for kw in urgency_keywords if kw in description.lower())
+        urgency_count = len(features.keywords & STUFFING_KEYWORDS)
         
-        if urgency_count >= 3 and len(description.strip()) < 50:
+        if urgency_count >= 3 and features.stripped_length < 50:
             flags.append("KEYWORD_STUFFING")
         
         # Flag 5: Repetitive generic phrases
-        if description.count('important') > 2 or description.count('urgent') > 2:
+        if features.claim_counts['important'] > 2 or features.claim_counts['urgent'] > 2:
             flags.append("REPETITIVE_CLAIMS")
         
         return flags
@@ -0,0 +1,159 @@
+"""
+Pool of long-lived, authenticated SMTP sessions.
+
+Opening a session costs a TCP connect, EHLO, STARTTLS and AUTH; a pooled
+session pays that once and then sends any number of messages. Sessions
+idle for more than NOOP_AFTER seconds are checked with NOOP before reuse,
+sessions idle for more than MAX_IDLE seconds are closed, and a send that
+finds the server gone reconnects once and retries.
+"""
+import os
+import smtplib
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+SMTP_TIMEOUT_SECONDS = float(os.environ.get('SMTP_TIMEOUT', 30))
+NOOP_AFTER_SECONDS = float(os.environ.get('SMTP_NOOP_AFTER', 30))
+MAX_IDLE_SECONDS = float(os.environ.get('SMTP_MAX_IDLE', 240))
+
+# Errors worth one reconnect-and-retry
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def _session_usable(error):
+    """Whether a session can be reused after `error` (the server answered and is not closing)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code != 421
+
+
+class SMTPPool:
+    """At most `size` concurrent sessions; idle ones are reused most-recent first"""
+
+    def __init__(self, host, port, username=None, password=None, use_starttls=True,
+                 size=SMTP_POOL_SIZE, timeout=SMTP_TIMEOUT_SECONDS, smtp_class=smtplib.SMTP):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_starttls = use_starttls
+        self.size = size
+        self.timeout = timeout
+        self.smtp_class = smtp_class
+        self._idle = []  # [(session, last_used)], most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self.opened = 0
+        self.reconnects = 0
+
+    def send(self, message):
+        """Send one message; raises on failure"""
+        error = self.send_many([message])[0]
+        if error is not None:
+            raise error
+
+    def send_many(self, messages):
+        """
+        Send messages in order over a single session. Returns one entry per
+        message: None when sent, else the exception that stopped it.
+        """
+        with self._slots:
+            session = self._checkout()
+            results = []
+            for message in messages:
+                try:
+                    if session is None:
+                        session = self._open()
+                    try:
+                        session.send_message(message)
+                    except _CONNECTION_ERRORS as e:
+                        # The server dropped the session: reconnect once and retry
+                        logger.info(f"SMTP session lost ({e}), reconnecting")
+                        self._close(session)
+                        session = None
+                        with self._lock:
+                            self.reconnects += 1
+                        session = self._open()
+                        session.send_message(message)
+                    results.append(None)
+                except Exception as e:
+                    results.append(e)
+                    if session is not None and not _session_usable(e):
+                        self._close(session)
+                        session = None
+            if session is not None:
+                with self._lock:
+                    self._idle.append((session, time.monotonic()))
+            return results
+
+    def keepalive(self):
+        """NOOP sessions idle past NOOP_AFTER and close those past MAX_IDLE (call periodically)"""
+        now = time.monotonic()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        kept = []
+        for session, last_used in idle:
+            if now - last_used > MAX_IDLE_SECONDS or (now - last_used > NOOP_AFTER_SECONDS and not self._alive(session)):
+                self._close(session)
+            else:
+                kept.append((session, now if now - last_used > NOOP_AFTER_SECONDS else last_used))
+        with self._lock:
+            self._idle = kept + self._idle
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session, _ in idle:
+            self._close(session)
+
+    def info(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"size": self.size, "idle": idle, "opened": self.opened, "reconnects": self.reconnects}
+
+    def _open(self):
+        session = self.smtp_class(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_starttls:
+                session.starttls()
+            if self.password:
+                session.login(self.username, self.password)
+        except Exception:
+            self._close(session)
+            raise
+        with self._lock:
+            self.opened += 1
+        return session
+
+    def _checkout(self):
+        """An idle session that is still usable, or None (opened on first send)"""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                session, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if idle_for > MAX_IDLE_SECONDS or (idle_for > NOOP_AFTER_SECONDS and not self._alive(session)):
+                self._close(session)
+                continue
+            return session
+
+    @staticmethod
+    def _alive(session):
+        try:
+            return session.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(session):
+        try:
+            session.quit()
+        except (smtplib.SMTPException, OSError):
+            session.close()
@@ -0,0 +1,202 @@
+"""
+Stress test for BookingEngine: many concurrent bookings for a few
+lab-days, then a check that no two approved reservations overlap.
+
+Threads (optionally in several processes, to exercise BEGIN IMMEDIATE
+across processes as well as the in-process locks) book random 1-2 hour
+slots with random scores and cancel some of their bookings, so requests
+are approved, waitlisted, preempt each other and get promoted from the
+waitlist. Any overlap between approved
+rows is a bug. The previous check-then-insert sequence is run the same
+way for comparison.
+
+A last run always uses several processes and cancels often, with scores
+too close to preempt, so cancellations keep promoting waitlisted requests
+while other processes' indexes are behind.
+
+Usage:
+    python stress_booking.py [bookings] [threads] [processes]
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import logging
+
+from alternatives import AlternativesService
+from booking_engine import BookingEngine, AUTO_APPROVE_SCORE, PREEMPT_MARGIN
+from db import ConnectionPool
+from interval_index import IntervalIndex
+from migrations import migrate
+from occupancy_grid import OccupancyGrid
+from priority_scorer import PriorityScorer
+from user_history import UserHistoryStore
+from waitlist import Waitlist
+
+SOURCE_DB = 'lab_occupancy.db'
+LAB_DAYS = [(lab, date) for lab in ('E401', 'E402', 'E403') for date in ('2027-03-01', '2027-03-02')]
+# Share of operations that cancel one of the thread's earlier bookings (engine mode)
+CANCEL_RATE = 0.1
+# Cancel-heavy run: cancel rate and minimum process count. Scores stay
+# within PREEMPT_MARGIN above AUTO_APPROVE_SCORE, so free slots and
+# promotions are approved and conflicts are waitlisted, never preempted.
+CANCEL_HEAVY_RATE = 0.4
+CANCEL_HEAVY_PROCESSES = 3
+
+# Out-of-sync rebuilds are expected when other processes write
+logging.getLogger('interval_index').setLevel(logging.ERROR)
+logging.getLogger('waitlist').setLevel(logging.ERROR)
+logging.getLogger('booking_engine').setLevel(logging.ERROR)
+logging.getLogger('outbox').setLevel(logging.ERROR)
+
+
+def random_request(rng, index, cancel_heavy=False):
+    lab_number, date = rng.choice(LAB_DAYS)
+    start = rng.randrange(9 * 60, 16 * 60, 30)
+    end = start + rng.choice((60, 90, 120))
+    return {
+        "lab_number": lab_number, "date": date,
+        "start_time": f"{start // 60:02d}:{start % 60:02d}", "end_time": f"{end // 60:02d}:{end % 60:02d}",
+        "num_participants": 40, "purpose": "workshop", "description": "stress",
+        "user_email": f"user{index % 50}@example.com", "user_name": "Stress",
+    }, (start, end), (rng.uniform(AUTO_APPROVE_SCORE, AUTO_APPROVE_SCORE + PREEMPT_MARGIN) if cancel_heavy
+                      else rng.uniform(AUTO_APPROVE_SCORE - 5, 100))
+
+
+def book_previous(engine, conn, request, window, score, lab_capacity):
+    """The sequence reserve_lab used before: check, then insert and commit (no locks)"""
+    engine.verify(conn, request['lab_number'], request['date'])
+    conflict = engine.interval_index.any_overlap(request['lab_number'], request['date'], *window, kind='reservation')
+    status = 'approved' if not conflict else 'pending'
+    cursor = conn.execute(
+        '''INSERT INTO reservations (lab_number, date, start_time, end_time, num_participants, purpose,
+           description, user_email, user_name, priority_score, status, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))''',
+        (request['lab_number'], request['date'], request['start_time'], request['end_time'],
+         request['num_participants'], request['purpose'], request['description'],
+         request['user_email'], request['user_name'], score, status)
+    )
+    conn.commit()
+    engine.sync(conn, cursor.lastrowid)
+
+
+def run_process(path, mode, bookings, threads, seed, results):
+    pool = ConnectionPool(path)
+    interval_index, occupancy_grid, waitlist = IntervalIndex(), OccupancyGrid(), Waitlist()
+    conn = pool.connect()
+    interval_index.load(conn)
+    occupancy_grid.load(conn)
+    waitlist.load(conn)
+    capacities = dict(conn.execute('SELECT lab_number, capacity FROM labs').fetchall())
+    conn.close()
+    engine = BookingEngine(interval_index, occupancy_grid, waitlist, UserHistoryStore(path, connect=pool.connect),
+                           AlternativesService(interval_index, occupancy_grid, PriorityScorer(load_mode='disabled')))
+
+    errors = []
+    cancel_rate = CANCEL_HEAVY_RATE if mode == 'cancels' else CANCEL_RATE
+
+    def worker(worker_seed, count):
+        rng = random.Random(worker_seed)
+        booked = []
+        for i in range(count):
+            request, window, score = random_request(rng, i, mode == 'cancels')
+            conn = pool.connect()
+            try:
+                if mode != 'previous' and booked and rng.random() < cancel_rate:
+                    engine.cancel(conn, *booked.pop(rng.randrange(len(booked))))
+                elif mode != 'previous':
+                    booking = engine.book(conn, request, window, score, capacities[request['lab_number']])
+                    booked.append((booking.reservation_id, request['lab_number'], request['date']))
+                else:
+                    book_previous(engine, conn, request, window, score, capacities[request['lab_number']])
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            finally:
+                conn.close()
+
+    per_thread = bookings // threads
+    workers = [threading.Thread(target=worker, args=(seed * 1000 + t, per_thread)) for t in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    results.put((per_thread * threads, len(errors)))
+
+
+def double_bookings(path):
+    conn = sqlite3.connect(path)
+    count = conn.execute('''
+        SELECT COUNT(*) FROM reservations a JOIN reservations b
+          ON a.lab_number = b.lab_number AND a.day_num = b.day_num AND a.id < b.id
+        WHERE a.status = 'approved' AND b.status = 'approved'
+          AND a.start_min < b.end_min AND b.start_min < a.end_min
+    ''').fetchone()[0]
+    approved = conn.execute(
+        "SELECT COUNT(*) FROM reservations WHERE status = 'approved' AND description = 'stress'"
+    ).fetchone()[0]
+    conn.close()
+    return count, approved
+
+
+def run(mode, path, bookings, threads, processes):
+    results = multiprocessing.Queue()
+    started = time.perf_counter()
+    if processes == 1:
+        run_process(path, mode, bookings, threads, 1, results)
+    else:
+        children = [multiprocessing.Process(target=run_process,
+                                            args=(path, mode, bookings // processes, threads, p + 1, results))
+                    for p in range(processes)]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+    elapsed = time.perf_counter() - started
+    done = errors = 0
+    for _ in range(processes):
+        d, e = results.get()
+        done, errors = done + d, errors + e
+    overlaps, approved = double_bookings(path)
+    return done, errors, elapsed, approved, overlaps
+
+
+def main():
+    bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    if not os.path.exists(SOURCE_DB):
+        sys.exit(f"{SOURCE_DB} not found; run init_db.py first")
+
+    print(f"{bookings} bookings, {threads} threads x {processes} process(es), {len(LAB_DAYS)} lab-days\n")
+    print(f"{'mode':<28} {'bookings/s':>10} {'approved':>9} {'errors':>7} {'double-booked':>14}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, label, mode_processes in (
+            ('previous', 'check, then insert', processes),
+            ('engine', 'BookingEngine', processes),
+            ('cancels', f"cancel-heavy, {max(processes, CANCEL_HEAVY_PROCESSES)} processes",
+             max(processes, CANCEL_HEAVY_PROCESSES)),
+        ):
+            path = os.path.join(tmp, f"{mode}.db")
+            shutil.copy(SOURCE_DB, path)
+            conn = sqlite3.connect(path)
+            migrate(conn)
+            conn.close()
+
+            done, errors, elapsed, approved, overlaps = run(mode, path, bookings, threads, mode_processes)
+            print(f"{label:<28} {done / elapsed:>10.0f} {approved:>9} {errors:>7} {overlaps:>14}")
+            failed = failed or (mode != 'previous' and (overlaps or errors))
+
+    if failed:
+        print("\n❌ BookingEngine produced double bookings or errors")
+        sys.exit(1)
+    print("\n✅ No double bookings with BookingEngine")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import re
+from collections import namedtuple
+
+# Concrete details that make a description credible (1.5 points each)
+DETAIL_PATTERNS = {
+    'date_mention': re.compile(r'\b(january|february|march|april|may|june|july|august|september|october|november|december|\d{1,2}[/-]\d{1,2}[/-]\d{2,4})\b'),
+    'time_mention': re.compile(r'\b(\d{1,2}:\d{2}|am|pm|morning|afternoon|evening)\b'),
+    'faculty_name': re.compile(r'\b(dr\.|prof\.|professor|dr |faculty)\s+[a-z]+\b'),
+    'course_code': re.compile(r'\b([a-z]{2,4}\s*\d{3,4}|course\s+\d+)\b'),
+    'venue_mention': re.compile(r'\b(room|hall|auditorium|lab|building|block|floor)\s+[a-z0-9]+\b'),
+    'participant_list': re.compile(r'\b(students?|participants?|attendees?|members?)\s+(from|of|in)\b'),
+}
+
+# Literal triggers for each detail pattern: (words, digit_companions).
+# A pattern can only match if one of the words occurs, or if the text has a
+# digit together with one of the companions (None = a digit alone is enough).
+# The regex is run only when its trigger fires.
+DETAIL_TRIGGERS = {
+    'date_mention': (('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+                      'september', 'october', 'november', 'december'), ('/', '-')),
+    'time_mention': (('am', 'pm', 'morning', 'afternoon', 'evening'), (':',)),
+    'faculty_name': (('dr', 'prof', 'faculty'), ()),
+    'course_code': ((), None),
+    'venue_mention': (('room', 'hall', 'auditorium', 'lab', 'building', 'block', 'floor'), ()),
+    'participant_list': (('student', 'participant', 'attendee', 'member'), ()),
+}
+
+_DIGIT = re.compile(r'\d')
+
+# Vague urgency claims (penalised when more than two appear)
+GENERIC_PHRASES = frozenset([
+    'very important', 'urgent meeting', 'important event',
+    'necessary', 'required', 'must have', 'need urgently'
+])
+
+# Words that justify a high/medium urgency label
+URGENCY_CONTEXT_KEYWORDS = frozenset(['deadline', 'urgent', 'critical', 'emergency', 'tomorrow', 'today'])
+
+# Words counted for the KEYWORD_STUFFING flag
+STUFFING_KEYWORDS = frozenset(['urgent', 'emergency', 'critical', 'immediately', 'asap', 'important'])
+
+# Words counted case-sensitively for the REPETITIVE_CLAIMS flag
+REPEATED_CLAIM_KEYWORDS = ('important', 'urgent')
+
+DescriptionFeatures = namedtuple('DescriptionFeatures', [
+    'stripped_length',  # len(description.strip())
+    'detail_matches',   # frozenset of DETAIL_PATTERNS names found
+    'keywords',         # frozenset of lowercase keywords present anywhere
+    'claim_counts',     # {keyword: case-sensitive count} for REPEATED_CLAIM_KEYWORDS
+])
+
+
+class DescriptionFeatureExtractor:
+    """Build the DescriptionFeatures record that all scoring components read"""
+
+    def __init__(self):
+        self.keywords = tuple(sorted(GENERIC_PHRASES | URGENCY_CONTEXT_KEYWORDS | STUFFING_KEYWORDS))
+
+    def extract(self, description):
+        """
+        Analyze a description once: lowercase it once, look up every keyword,
+        and run each detail regex only when its literal trigger is present.
+
+        Returns: DescriptionFeatures
+        """
+        description = description or ''
+        stripped_length = len(description.strip())
+        lowered = description.lower()
+
+        keywords = frozenset(kw for kw in self.keywords if kw in lowered)
+        claim_counts = {kw: description.count(kw) for kw in REPEATED_CLAIM_KEYWORDS}
+
+        # Descriptions this short earn no detail points, so skip the regexes
+        detail_matches = frozenset()
+        if stripped_length >= 20:
+            has_digit = _DIGIT.search(lowered) is not None
+            detail_matches = frozenset(
+                name for name, pattern in DETAIL_PATTERNS.items()
+                if self._triggered(name, lowered, has_digit) and pattern.search(lowered)
+            )
+
+        return DescriptionFeatures(stripped_length, detail_matches, keywords, claim_counts)
+
+    @staticmethod
+    def _triggered(name, lowered, has_digit):
+        words, digit_companions = DETAIL_TRIGGERS[name]
+        if any(word in lowered for word in words):
+            return True
+        if not has_digit:
+            return False
+        return digit_companions is None or any(c in lowered for c in digit_companions)
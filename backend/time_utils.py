@@ -0,0 +1,59 @@
+from datetime import date, datetime, timedelta
+
+EPOCH = date(1970, 1, 1)
+
+# Clock windows for the named sessions used by timetables and the UI
+SESSION_WINDOWS = {
+    'morning': ('08:00', '13:00'),
+    'afternoon': ('13:00', '17:00'),
+    'evening': ('17:00', '21:00'),
+}
+
+
+def time_to_minutes(value):
+    """'HH:MM' (or 'HH:MM:SS') -> minutes since midnight"""
+    parts = str(value).strip().split(':')
+    if len(parts) < 2:
+        raise ValueError(f"Invalid time: {value!r}")
+    hours, minutes = int(parts[0]), int(parts[1])
+    if not (0 <= hours <= 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time: {value!r}")
+    return hours * 60 + minutes
+
+
+def minutes_to_time(minutes):
+    """Minutes since midnight -> 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def date_to_day(value):
+    """ISO date string (or date) -> days since 1970-01-01"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_to_date(day):
+    """Days since 1970-01-01 -> ISO date string"""
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+def day_minutes_to_datetime(day, minutes):
+    """(days since 1970-01-01, minutes since midnight) -> naive datetime"""
+    return datetime(EPOCH.year, EPOCH.month, EPOCH.day) + timedelta(days=day, minutes=minutes)
+
+
+def session_for(start_minutes):
+    """Name of the session a start time falls in"""
+    for session, (start, end) in SESSION_WINDOWS.items():
+        if time_to_minutes(start) <= start_minutes < time_to_minutes(end):
+            return session
+    return 'morning' if start_minutes < time_to_minutes(SESSION_WINDOWS['morning'][0]) else 'evening'
+
+
+def session_window(session):
+    """(start, end) minutes of a named session, or None if unknown"""
+    window = SESSION_WINDOWS.get(session)
+    return (time_to_minutes(window[0]), time_to_minutes(window[1])) if window else None
@@ -0,0 +1,136 @@
+import sqlite3
+from datetime import datetime
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of most recent bookings kept for the rolling utilization average
+UTILIZATION_WINDOW = 5
+
+# Bookings above this many participants count as "high participant" bookings
+HIGH_PARTICIPANT_THRESHOLD = 50
+
+
+class UserHistoryStore:
+    """
+    Running per-user booking aggregates kept in the user_stats table.
+
+    Each write is a single-row upsert done on the caller's connection, so it
+    commits together with the reservation change that caused it. Reads are a
+    primary-key lookup, shared by every worker process using the database.
+    """
+
+    def __init__(self, db_path, connect=None):
+        self.db_path = db_path
+        self._connect_fn = connect  # e.g. a ConnectionPool's connect
+
+    def _connect(self):
+        if self._connect_fn:
+            return self._connect_fn()
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get(self, user_email):
+        """
+        Return aggregates for a user, or None if they have no history.
+
+        Returns: Dict with total_bookings, cancellations, approvals,
+                 high_participant_bookings and recent_utilization (list)
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT * FROM user_stats WHERE user_email = ?', (user_email,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            row = None  # Table not created yet
+        conn.close()
+
+        if not row:
+            return None
+
+        stats = dict(row)
+        stats['recent_utilization'] = self._parse_window(row['recent_utilization'])
+        return stats
+
+    def record_booking(self, conn, user_email, num_participants, lab_capacity):
+        """Count a new reservation and push its utilization into the rolling window"""
+        row = conn.execute(
+            'SELECT recent_utilization FROM user_stats WHERE user_email = ?', (user_email,)
+        ).fetchone()
+        window = self._parse_window(row[0]) if row else []
+        window.append(num_participants / lab_capacity)
+        window = window[-UTILIZATION_WINDOW:]
+
+        conn.execute(
+            '''INSERT INTO user_stats
+               (user_email, total_bookings, high_participant_bookings, recent_utilization, updated_at)
+               VALUES (?, 1, ?, ?, ?)
+               ON CONFLICT(user_email) DO UPDATE SET
+                   total_bookings = total_bookings + 1,
+                   high_participant_bookings = high_participant_bookings + excluded.high_participant_bookings,
+                   recent_utilization = excluded.recent_utilization,
+                   updated_at = excluded.updated_at''',
+            (user_email, 1 if num_participants > HIGH_PARTICIPANT_THRESHOLD else 0,
+             self._format_window(window), datetime.now().isoformat())
+        )
+
+    def record_cancellation(self, conn, user_email):
+        """Count a cancelled reservation"""
+        self._increment(conn, user_email, 'cancellations')
+
+    def record_approval(self, conn, user_email):
+        """Count an approved reservation"""
+        self._increment(conn, user_email, 'approvals')
+
+    def _increment(self, conn, user_email, column):
+        conn.execute(
+            f'''INSERT INTO user_stats (user_email, {column}, updated_at) VALUES (?, 1, ?)
+                ON CONFLICT(user_email) DO UPDATE SET
+                    {column} = {column} + 1,
+                    updated_at = excluded.updated_at''',
+            (user_email, datetime.now().isoformat())
+        )
+
+    def rebuild(self, conn):
+        """Recompute every user's aggregates from the reservations table (caller commits)"""
+        conn.execute('DELETE FROM user_stats')
+        rows = conn.execute(
+            '''SELECT r.user_email, r.num_participants, r.status, l.capacity
+               FROM reservations r LEFT JOIN labs l ON l.lab_number = r.lab_number
+               ORDER BY r.created_at, r.id'''
+        ).fetchall()
+
+        stats = {}
+        for user_email, num_participants, status, capacity in rows:
+            user = stats.setdefault(user_email, {
+                'total_bookings': 0, 'cancellations': 0, 'approvals': 0,
+                'high_participant_bookings': 0, 'recent_utilization': []
+            })
+            user['total_bookings'] += 1
+            user['cancellations'] += status == 'cancelled'
+            user['approvals'] += status == 'approved'
+            user['high_participant_bookings'] += num_participants > HIGH_PARTICIPANT_THRESHOLD
+            if capacity:
+                user['recent_utilization'] = (user['recent_utilization'] + [num_participants / capacity])[-UTILIZATION_WINDOW:]
+
+        now = datetime.now().isoformat()
+        conn.executemany(
+            '''INSERT INTO user_stats
+               (user_email, total_bookings, cancellations, approvals,
+                high_participant_bookings, recent_utilization, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)''',
+            [(email, s['total_bookings'], s['cancellations'], s['approvals'],
+              s['high_participant_bookings'], self._format_window(s['recent_utilization']), now)
+             for email, s in stats.items()]
+        )
+
+    @staticmethod
+    def _parse_window(text):
+        return [float(v) for v in text.split(',')] if text else []
+
+    @staticmethod
+    def _format_window(values):
+        return ','.join(repr(v) for v in values)
@@ -0,0 +1,146 @@
+import heapq
+import threading
+import logging
+
+from time_utils import date_to_day, time_to_minutes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WAITLIST_STATUS = 'waitlisted'
+
+
+class Waitlist:
+    """
+    Priority waitlist per (lab, date).
+
+    Requests that conflict with active bookings and cannot preempt them are
+    stored with status 'waitlisted' (the reservations table is the persistent
+    copy) and kept here in one heap per lab-day, best priority score first,
+    then oldest. Removal is lazy: entries whose id is no longer live are
+    skipped when popped.
+
+    Like IntervalIndex, it is loaded at startup and verify() compares a
+    lab-day with SQL, rebuilding it on mismatch.
+    """
+
+    def __init__(self):
+        self._heaps = {}  # (lab, date) -> [(-priority_score, id, start, end)]
+        self._keys = {}   # live reservation id -> (lab, date)
+        self._lock = threading.RLock()
+
+    def load(self, conn):
+        """(Re)build every heap from the database"""
+        heaps, keys = {}, {}
+        for row in conn.execute('SELECT * FROM reservations WHERE status = ?', (WAITLIST_STATUS,)):
+            entry = self._entry(row)
+            if entry:
+                key = (row['lab_number'], row['date'])
+                heaps.setdefault(key, []).append(entry)
+                keys[row['id']] = key
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        with self._lock:
+            self._heaps = heaps
+            self._keys = keys
+
+        logger.info(f"Waitlist loaded: {len(keys)} requests over {len(heaps)} lab-days")
+
+    def add(self, row):
+        """Queue a waitlisted reservation row"""
+        entry = self._entry(row)
+        if entry:
+            key = (row['lab_number'], row['date'])
+            with self._lock:
+                heapq.heappush(self._heaps.setdefault(key, []), entry)
+                self._keys[row['id']] = key
+
+    def remove(self, reservation_id):
+        with self._lock:
+            self._keys.pop(reservation_id, None)
+
+    def pop_fitting(self, lab_number, date, fits):
+        """
+        Remove and return the id of the best entry whose (start, end) minutes
+        satisfy fits(start, end), or None. O(log n) when the best entry fits;
+        entries passed over are pushed back.
+        """
+        key = (lab_number, date)
+        with self._lock:
+            heap = self._heaps.get(key)
+            skipped = []
+            found = None
+            while heap:
+                entry = heapq.heappop(heap)
+                if self._keys.get(entry[1]) != key:
+                    continue
+                if fits(entry[2], entry[3]):
+                    found = entry[1]
+                    del self._keys[found]
+                    break
+                skipped.append(entry)
+            for entry in skipped:
+                heapq.heappush(heap, entry)
+            return found
+
+    def ranked(self, lab_number, date):
+        """Live reservation ids of a lab-day, best first"""
+        key = (lab_number, date)
+        with self._lock:
+            entries = [e for e in self._heaps.get(key, []) if self._keys.get(e[1]) == key]
+        return [entry[1] for entry in sorted(entries)]
+
+    def verify(self, conn, lab_number, date):
+        """Check a lab-day against SQL (count, id sum and start/end minute sums), rebuilding it if they differ"""
+        key = (lab_number, date)
+        expected = tuple(conn.execute(
+            '''SELECT COUNT(*), COALESCE(SUM(id), 0), COALESCE(SUM(start_min), 0), COALESCE(SUM(end_min), 0)
+               FROM reservations
+               WHERE lab_number = ? AND day_num = ? AND status = ?''',
+            (lab_number, date_to_day(date), WAITLIST_STATUS)
+        ).fetchone())
+
+        with self._lock:
+            entries = [e for e in self._heaps.get(key, []) if self._keys.get(e[1]) == key]
+            # An id can sit in the heap twice (re-added after a lazy removal); count it once
+            entries = list({e[1]: e for e in entries}.values())
+            actual = (len(entries), sum(e[1] for e in entries),
+                      sum(e[2] for e in entries), sum(e[3] for e in entries))
+            if actual == expected:
+                return True
+
+        logger.warning(f"Waitlist out of sync for {lab_number} on {date}; rebuilding from SQL")
+        self.rebuild(conn, lab_number, date)
+        return False
+
+    def rebuild(self, conn, lab_number, date):
+        """Reload one (lab, date) from SQL"""
+        key = (lab_number, date)
+        rows = conn.execute(
+            'SELECT * FROM reservations WHERE lab_number = ? AND day_num = ? AND status = ?',
+            (lab_number, date_to_day(date), WAITLIST_STATUS)
+        ).fetchall()
+        heap = [entry for entry in map(self._entry, rows) if entry]
+        heapq.heapify(heap)
+
+        with self._lock:
+            for reservation_id, entry_key in list(self._keys.items()):
+                if entry_key == key:
+                    del self._keys[reservation_id]
+            for entry in heap:
+                self._keys[entry[1]] = key
+            self._heaps[key] = heap
+
+    def info(self):
+        with self._lock:
+            return {"waitlisted": len(self._keys), "lab_days": sum(1 for heap in self._heaps.values() if heap)}
+
+    @staticmethod
+    def _entry(row):
+        try:
+            start, end = time_to_minutes(row['start_time']), time_to_minutes(row['end_time'])
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping waitlisted reservation {row['id']} with unparsable times")
+            return None
+        return (-row['priority_score'], row['id'], start, end)
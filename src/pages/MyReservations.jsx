@@ -55,6 +55,7 @@ function MyReservations() {
     switch (status) {
       case "approved": return "#10b981";
       case "pending": return "#f59e0b";
+      case "waitlisted": return "#8b5cf6";
       case "rejected": return "#ef4444";
       case "cancelled": return "#6b7280";
       default: return "#6b7280";
@@ -65,6 +66,7 @@ function MyReservations() {
     switch (status) {
       case "approved": return "✅";
       case "pending": return "⏳";
+      case "waitlisted": return "🕒";
       case "rejected": return "❌";
       case "cancelled": return "🚫";
       default: return "ℹ️";
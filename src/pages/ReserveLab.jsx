@@ -57,8 +57,8 @@ function ReserveLab() {
           priority_score: response.data.priority_score
         });
 
-        // If pending, fetch alternatives
-        if (response.data.status === 'pending') {
+        // If pending or waitlisted, fetch alternatives
+        if (response.data.status !== 'approved') {
           const altResponse = await axios.post(`${API_URL}/suggest-alternatives`, {
             lab_number: formData.lab_number,
             date: formData.date,